@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 COLORED_LOGS_STYLES = {
     'info': {'color': 'green'},
     'error': {'color': 'red'},
@@ -8,6 +10,69 @@ NODE_COMMUNICATION_TIMEOUT = 2 * 60
 TRANSACTION_BROADCASTING_MAX_ATTEMPTS = 10
 
 SIGNATURE_SIZE = 110
+# Biggest DER encoded signature (72 bytes) with the sighash type byte
+MAX_SIGNATURE_SIZE = 73
+
+# Sequence numbers of the transaction inputs (BIP 125).
+# SEQUENCE_FINAL disables nLockTime, other values keep it enabled, which is required to refund the contracts.
+SEQUENCE_FINAL = 0xffffffff
+SEQUENCE_NO_RBF = 0xfffffffe
+SEQUENCE_RBF = 0xfffffffd
+# Minimal fee increase (in satoshis per kB) of the replacement transaction required by the nodes (BIP 125, rule 4).
+INCREMENTAL_RELAY_FEE_PER_KB = 1000
+
+# Default relay policy of the Bitcoin Core 0.16 nodes (can be changed per network)
+# DUST_RELAY_TX_FEE in src/policy/policy.h, output is dust if spending it costs more than its value at this fee rate
+DUST_RELAY_FEE_PER_KB = 3000
+# DEFAULT_MIN_RELAY_TX_FEE in src/validation.h
+MIN_RELAY_FEE_PER_KB = 1000
+# MAX_STANDARD_TX_WEIGHT (400000) in src/policy/policy.h divided by WITNESS_SCALE_FACTOR for non-witness transactions
+MAX_STANDARD_TX_SIZE = 100000
+# IsStandardTx in src/policy/policy.cpp
+MAX_STANDARD_SCRIPTSIG_SIZE = 1650
+# MAX_OP_RETURN_RELAY in src/script/standard.h
+MAX_OP_RETURN_RELAY = 83
+# Sizes (in bytes) of the inputs spending the outputs, used to compute the dust threshold (GetDustThreshold
+# in src/policy/policy.cpp): outpoint, scriptSig length, scriptSig with signature and public key and sequence
+SPENDING_INPUT_SIZE = 32 + 4 + 1 + 107 + 4
+# witness data is discounted for the witness program outputs
+SPENDING_WITNESS_INPUT_SIZE = 32 + 4 + 1 + 107 // 4 + 4
+# nLockTime values below this threshold are block heights, above are UNIX timestamps
+LOCKTIME_THRESHOLD = 500000000
+
+# Number of threads used to audit multiple contracts at once
+AUDIT_MAX_WORKERS = 8
+
+# Number of threads dispatching scheduled refunds and redeems
+SCHEDULER_MAX_WORKERS = 4
+# How long before the contract locktime the scheduled redeem should be made
+REDEEM_SAFETY_MARGIN = timedelta(hours=1)
+# How long after the contract locktime the scheduled refund should be made
+# (Bitcoin nodes accept the refund only after the median time of the past 11 blocks passes the locktime)
+REFUND_MTP_MARGIN = timedelta(hours=1)
+# Failed refunds and redeems are retried after SCHEDULER_RETRY_DELAY (doubled after every failure)
+SCHEDULER_RETRY_DELAY = timedelta(minutes=10)
+SCHEDULER_MAX_ATTEMPTS = 5
+# Maximal number of seconds the scheduler sleeps without checking the clock
+SCHEDULER_MAX_WAIT = 60
+
+# Seconds between the block height refreshes made by the height oracle
+BLOCK_HEIGHT_REFRESH_INTERVAL = 30
+# Seconds after which the block height known by the height oracle is fetched again on access
+BLOCK_HEIGHT_MAX_AGE = 120
+# Seconds between the polls of the node's new block filter made by the height oracle
+BLOCK_HEIGHT_NEW_BLOCKS_POLL_INTERVAL = 2
+# Attempts to read the block height shared by the processes before it's fetched from the network
+SHARED_HEIGHT_MAX_READ_ATTEMPTS = 1000
+
+# Polling intervals of the secret watcher
+SECRET_WATCHER_MIN_INTERVAL = timedelta(seconds=15)
+SECRET_WATCHER_MAX_INTERVAL = timedelta(minutes=10)
+SECRET_WATCHER_BACKOFF = 2
+# Number of networks polled by the secret watcher at the same time
+SECRET_WATCHER_MAX_WORKERS = 4
+# How long after the contract locktime the secret watcher stops watching the contract without the secret
+SECRET_WATCHER_EXPIRE_MARGIN = timedelta(hours=6)
 
 # How many seconds should we wait for the reject message to appear
 # after publishing transaction
@@ -18,6 +83,8 @@ CLOVE_API_URL = 'https://clove-api.lamden.io'
 BLOCKCYPHER_SUPPORTED_NETWORKS = (
     'btc', 'doge', 'dash'
 )
+# Number of the transaction inputs requested from blockcypher at once
+BLOCKCYPHER_INPUTS_PAGE_SIZE = 100
 
 CRYPTOID_SUPPORTED_NETWORKS = (
     '1337', '2give', '42', '8bit', 'abc', 'ac', 'adc', 'aeg', 'anc', 'arco',
@@ -57,6 +124,38 @@ ETH_REFUND_GAS_LIMIT = 100000
 
 ETH_FILTER_MAX_ATTEMPTS = 10
 
+# Seconds after which the Ethereum nonce reserved for a transaction which was not published is released
+NONCE_RESERVATION_TTL = 600
+
+# Seconds for which responses of the Ethereum JSON-RPC methods are cached by the batching provider
+ETH_RPC_CACHE_TTL = {
+    'eth_gasPrice': 15,
+    'eth_blockNumber': 5,
+    'net_version': 3600,
+}
+# Methods fetched together with the other requests (values used to build every transaction)
+ETH_RPC_PREFETCH_METHODS = ('eth_gasPrice', 'net_version')
+# Failures in a row after which the Ethereum node is skipped for ETH_ENDPOINT_COOLDOWN seconds
+ETH_ENDPOINT_MAX_FAILURES = 3
+ETH_ENDPOINT_COOLDOWN = 30
+# Number of the Ethereum nodes receiving every published transaction
+ETH_ENDPOINT_WRITE_FANOUT = 2
+# Number of the contract calls aggregated into one Multicall call
+MULTICALL_MAX_CALLS = 100
+# Number of the blocks in the eth_getLogs requests made by the event indexer (chunk is adjusted to the node limits)
+ETH_LOGS_CHUNK_SIZE = 1000
+ETH_LOGS_MAX_CHUNK_SIZE = 100000
+# Number of the newest scanned blocks which are scanned again by the event indexer (events of reorganized blocks)
+ETH_LOGS_REORG_DEPTH = 12
+# Events of the swap contract stored by the event indexer
+SWAP_EVENTS = ('InitiateSwap', 'RedeemSwap', 'RefundSwap')
+# States of the swap read from the swap contract
+SWAP_OPEN = 'open'
+SWAP_REFUNDABLE = 'refundable'
+SWAP_CLOSED = 'closed'
+# Types of the values returned by the swaps() getter of the swap contract
+SWAP_STATE_OUTPUT_TYPES = ('uint256', 'address', 'address', 'uint256', 'bool', 'address', 'bool')
+
 ERC20_BASIC_ABI = [{
     "constant": True,
     "inputs": [],
@@ -12,6 +12,10 @@ class TransactionRejected(CloveException):
     pass
 
 
+class NonStandardTransaction(TransactionRejected):
+    pass
+
+
 class UnexpectedResponseFromNode(CloveException):
     pass
 
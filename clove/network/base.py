@@ -1,6 +1,8 @@
+import os
 from typing import Optional
 
 from clove.constants import CRYPTOID_SUPPORTED_NETWORKS
+from clove.utils.height import HeightOracle
 
 
 class BaseNetwork(object):
@@ -12,6 +14,10 @@ class BaseNetwork(object):
     '''Tuple with network symbols (some networks may have multiple symbols, eg. Bitcoin).'''
     networks = {}
     '''Placeholder for symbol-network mapping.'''
+    network_instances = {}
+    '''Network objects shared by `get_network_by_symbol` (by symbol).'''
+    shared = True
+    '''Flag for networks which instances can be shared between threads (see `get_network_by_symbol`).'''
     bitcoin_based = None
     '''Flag for Bitcoin-based networks.'''
     ethereum_based = None
@@ -20,6 +26,8 @@ class BaseNetwork(object):
     '''Flag for test networks.'''
     blockexplorer_tx = None
     '''Url of the transaction in block explorer (format string)'''
+    height_oracles = {}
+    '''Height oracles of the networks (by network name), see `use_height_oracle`.'''
 
     @property
     def default_symbol(self) -> str:
@@ -50,6 +58,9 @@ class BaseNetwork(object):
         '''
         Returns network instance by its symbol.
 
+        Instances are created once and shared by all of the callers. Networks keeping the state
+        of the connection in the instance (not `shared`, e.g. Bitcoin-based networks) are created on every call.
+
         Args:
             symbol (str): network symbol
 
@@ -73,7 +84,13 @@ class BaseNetwork(object):
         if symbol not in cls.networks:
             raise RuntimeError(f'{symbol} network is not supported.')
 
-        return cls.networks[symbol]()
+        if not cls.networks[symbol].shared:
+            return cls.networks[symbol]()
+
+        network = cls.network_instances.get(symbol)
+        if network is None:
+            network = BaseNetwork.network_instances.setdefault(symbol, cls.networks[symbol]())
+        return network
 
     @classmethod
     def set_symbol_mapping(cls):
@@ -87,9 +104,58 @@ class BaseNetwork(object):
                     cls.networks[f'{symbol.upper()}'] = network
 
     @property
-    def latest_block(self):
+    def latest_block(self) -> Optional[int]:
+        '''Number of the latest block (served from memory if the network uses the height oracle).'''
+        oracle = self.height_oracles.get(self.name)
+        if oracle is not None:
+            return oracle.height
+        return self.get_latest_block()
+
+    def get_latest_block(self) -> Optional[int]:
+        '''Fetches number of the latest block from the network.'''
         raise NotImplementedError
 
+    def use_height_oracle(self, shared: bool=False, start: bool=True, **kwargs) -> HeightOracle:
+        '''
+        Serves `latest_block` of this network from the height oracle refreshed in the background.
+
+        Args:
+            shared (bool): share the height with the other processes of the user
+                (through the file in the `~/.clove` directory, POSIX systems only)
+            start (bool): start the refreshing thread
+            kwargs: other `HeightOracle` arguments (e.g. `new_blocks` source of the block announcements)
+
+        Returns:
+            HeightOracle: oracle used by all of the objects of this network
+        '''
+        oracle = self.height_oracles.get(self.name)
+        if oracle is None:
+            if shared and 'shared_path' not in kwargs:
+                # directory accessible only by the user, so other users cannot write fake heights
+                directory = os.path.join(os.path.expanduser('~'), '.clove')
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+                kwargs['shared_path'] = os.path.join(directory, f'height-{self.name}')
+            oracle = HeightOracle(self.get_latest_block, **kwargs)
+            BaseNetwork.height_oracles[self.name] = oracle
+        if start:
+            oracle.start()
+        return oracle
+
+    def notify_new_block(self, height: Optional[int]=None):
+        '''
+        Tells the height oracle of this network (if used) about the new block.
+
+        Args:
+            height (int): number of the new block, if known (otherwise the oracle refreshes the height)
+        '''
+        oracle = self.height_oracles.get(self.name)
+        if oracle is None:
+            return
+        if height is not None:
+            oracle.update(height)
+        else:
+            oracle.notify()
+
     def get_transaction(self):
         raise NotImplementedError
 
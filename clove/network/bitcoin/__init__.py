@@ -26,6 +26,7 @@ class Bitcoin(BitcoinBaseNetwork):
     }
     source_code_url = 'https://github.com/bitcoin/bitcoin/blob/master/src/chainparams.cpp'
     blockexplorer_tx = 'https://live.blockcypher.com/btc/tx/{0}/'
+    relay_policy_source = 'https://github.com/bitcoin/bitcoin/blob/0.16/src/policy/policy.h'
 
 
 class BitcoinTestNet(Bitcoin):
@@ -50,3 +51,5 @@ class BitcoinTestNet(Bitcoin):
     }
     testnet = True
     blockexplorer_tx = 'https://live.blockcypher.com/btc-testnet/tx/{0}/'
+    # fRequireStandard is disabled for the testnet in src/chainparams.cpp
+    require_standard = False
@@ -1,18 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import os
 from random import shuffle
 import socket
 from time import sleep, time
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 import bitcoin
 from bitcoin import SelectParams
 from bitcoin.base58 import Base58ChecksumError, InvalidBase58Error
-from bitcoin.core import CTransaction, b2lx, b2x, script, x
+from bitcoin.core import CTransaction, b2lx, x
 from bitcoin.core.serialize import Hash, SerializationError, SerializationTruncationError
 from bitcoin.messages import (
+    MSG_BLOCK,
     MSG_TX,
     MsgSerializable,
     msg_getdata,
+    msg_headers,
     msg_inv,
     msg_ping,
     msg_pong,
@@ -25,7 +29,11 @@ from bitcoin.net import CInv
 from bitcoin.wallet import CBitcoinAddress, CBitcoinAddressError
 
 from clove.constants import (
+    AUDIT_MAX_WORKERS,
     CRYPTOID_SUPPORTED_NETWORKS,
+    DUST_RELAY_FEE_PER_KB,
+    MAX_STANDARD_TX_SIZE,
+    MIN_RELAY_FEE_PER_KB,
     NODE_COMMUNICATION_TIMEOUT,
     REJECT_TIMEOUT,
     TRANSACTION_BROADCASTING_MAX_ATTEMPTS,
@@ -38,7 +46,13 @@ from clove.exceptions import (
 )
 from clove.network.base import BaseNetwork
 from clove.network.bitcoin.contract import BitcoinContract
-from clove.network.bitcoin.transaction import BitcoinAtomicSwapTransaction
+from clove.network.bitcoin.htlc import extract_secret_from_script_sig
+from clove.network.bitcoin.policy import check_policy
+from clove.network.bitcoin.transaction import (
+    BitcoinAtomicSwapBatchTransaction,
+    BitcoinAtomicSwapTransaction,
+    BitcoinTransaction,
+)
 from clove.network.bitcoin.wallet import BitcoinWallet
 from clove.utils.bitcoin import auto_switch_params
 from clove.utils.external_source import (
@@ -65,6 +79,20 @@ class BitcoinBaseNetwork(BaseNetwork):
     message_start = b''
     base58_prefixes = {}
     bitcoin_based = True
+    shared = False
+    '''Connection to the node is kept in the instance, so instances are not shared between threads.'''
+    relay_policy_source = None
+    '''
+    Source of the relay policy values below (the network nodes use them by default).
+    Transactions of networks without known policy are checked only for the problems rejected by the consensus.
+    '''
+    require_standard = True
+    '''Nodes reject the non-standard transactions (only the relay fee is checked otherwise).'''
+    dust_relay_fee_per_kb = DUST_RELAY_FEE_PER_KB
+    '''Fee per kB (in satoshis) used by the nodes to compute the minimal value of the relayed outputs.'''
+    min_relay_fee_per_kb = MIN_RELAY_FEE_PER_KB
+    '''Minimal fee per kB (in satoshis) relayed by the nodes.'''
+    max_standard_transaction_size = MAX_STANDARD_TX_SIZE
 
     @classmethod
     def switch_params(cls):
@@ -82,9 +110,37 @@ class BitcoinBaseNetwork(BaseNetwork):
                 )
             )
 
-    def publish(self, raw_transaction: str):
+    def publish(
+        self,
+        transaction: Union[str, bytes, CTransaction],
+        fee: Optional[int]=None,
+        serialized_transaction: Optional[bytes]=None,
+        transaction_hash: Optional[bytes]=None,
+    ):
+        '''
+        Broadcasts the transaction (retrying on failure).
+
+        Transaction is checked against the relay policy of the nodes first,
+        so transactions which would be rejected anyway are not sent at all.
+
+        Args:
+            transaction (str, bytes, CTransaction): transaction object, serialized transaction or its hex
+            fee (int): transaction fee in satoshis, used to check the minimal relay fee
+            serialized_transaction (bytes): already serialized transaction object (not serialized again)
+            transaction_hash (bytes): already computed hash of the transaction (not computed again)
+
+        Returns:
+            str, None: transaction address or None if all of the attempts failed
+
+        Raises:
+            NonStandardTransaction: if the transaction doesn't meet the relay policy
+        '''
+        transaction, serialized_transaction = self.prepare_transaction(transaction, serialized_transaction)
+        check_policy(self, transaction, len(serialized_transaction), fee)
+        transaction_hash = transaction_hash or Hash(serialized_transaction)
+
         for attempt in range(1, TRANSACTION_BROADCASTING_MAX_ATTEMPTS + 1):
-            transaction_address = self.broadcast_transaction(raw_transaction)
+            transaction_address = self.broadcast_transaction(transaction, serialized_transaction, transaction_hash)
 
             if transaction_address is None:
                 logger.warning('Transaction broadcast attempt no. %s failed. Retrying...', attempt)
@@ -150,6 +206,11 @@ class BitcoinBaseNetwork(BaseNetwork):
                 elif msg_type is msg_version:
                     logger.debug('Saving version')
                     self.protocol_version = message
+                elif msg_type is msg_headers or (
+                    msg_type is msg_inv and any(inv.type == MSG_BLOCK for inv in message.inv)
+                ):
+                    # node announced the new block
+                    self.notify_new_block()
 
                 if msg_type in expected_message_types:
                     found.append(message)
@@ -292,12 +353,33 @@ class BitcoinBaseNetwork(BaseNetwork):
             self.version_packet(), timeout
         )
 
+    @staticmethod
+    def prepare_transaction(
+        transaction: Union[str, bytes, CTransaction], serialized_transaction: Optional[bytes]=None
+    ) -> Tuple[CTransaction, bytes]:
+        '''Returns transaction object together with its serialized form, converting only what is missing.'''
+        if isinstance(transaction, CTransaction):
+            return transaction, serialized_transaction or transaction.serialize()
+        try:
+            if isinstance(transaction, str):
+                transaction = x(transaction)
+            return CTransaction.deserialize(transaction), transaction
+        except Exception:
+            raise ImpossibleDeserialization()
+
     @auto_switch_params()
-    def broadcast_transaction(self, raw_transaction: str):
-        deserialized_transaction = self.deserialize_raw_transaction(raw_transaction)
-        serialized_transaction = deserialized_transaction.serialize()
+    def broadcast_transaction(
+        self,
+        transaction: Union[str, bytes, CTransaction],
+        serialized_transaction: Optional[bytes]=None,
+        transaction_hash: Optional[bytes]=None,
+    ):
+        deserialized_transaction, serialized_transaction = self.prepare_transaction(
+            transaction, serialized_transaction
+        )
+        transaction_hash = transaction_hash or Hash(serialized_transaction)
 
-        get_data = self.send_inventory(serialized_transaction)
+        get_data = self.send_inventory(serialized_transaction, transaction_hash)
         if not get_data:
             logger.debug(
                 ConnectionProblem('Clove could not get connected with any of the nodes for too long.')
@@ -306,7 +388,7 @@ class BitcoinBaseNetwork(BaseNetwork):
 
         node = self.get_current_node()
 
-        if all(el.hash != Hash(serialized_transaction) for el in get_data.inv):
+        if all(el.hash != transaction_hash for el in get_data.inv):
             logger.debug(UnexpectedResponseFromNode('Node did not ask for our transaction', node))
             return self.reset_connection()
 
@@ -323,17 +405,16 @@ class BitcoinBaseNetwork(BaseNetwork):
             return self.reset_connection()
         logger.info('[%s] Reject message not found.', node)
 
-        transaction_address = b2lx(deserialized_transaction.GetHash())
+        transaction_address = b2lx(transaction_hash)
         logger.info('[%s] Transaction %s has just been sent.', node, transaction_address)
         return transaction_address
 
     @auto_switch_params()
-    def send_inventory(self, serialized_transaction) -> msg_getdata:
+    def send_inventory(self, serialized_transaction: bytes, transaction_hash: bytes=None) -> msg_getdata:
         message = msg_inv()
         inventory = CInv()
         inventory.type = MSG_TX
-        hash_transaction = Hash(serialized_transaction)
-        inventory.hash = hash_transaction
+        inventory.hash = transaction_hash or Hash(serialized_transaction)
         message.inv.append(inventory)
 
         timeout = time() + NODE_COMMUNICATION_TIMEOUT
@@ -402,21 +483,246 @@ class BitcoinBaseNetwork(BaseNetwork):
         value: float,
         solvable_utxo: list,
         secret_hash: str=None,
+        rbf: bool=False,
+        presign_refund: bool=False,
     ) -> BitcoinAtomicSwapTransaction:
         transaction = BitcoinAtomicSwapTransaction(
-            self, sender_address, recipient_address, value, solvable_utxo, secret_hash
+            self,
+            sender_address,
+            recipient_address,
+            value,
+            solvable_utxo,
+            secret_hash,
+            rbf=rbf,
+            presign_refund=presign_refund,
         )
         transaction.create_unsigned_transaction()
         return transaction
 
+    @auto_switch_params()
+    def atomic_swap_batch(
+        self,
+        sender_address: str,
+        legs: list,
+        solvable_utxo: list,
+        rbf: bool=False,
+    ) -> BitcoinAtomicSwapBatchTransaction:
+        '''
+        Creates one transaction funding multiple atomic swap contracts.
+
+        Args:
+            sender_address (str): address of the sender
+            legs (list): list of dictionaries with `recipient_address`, `value` and optional `secret_hash` and
+                `locktime` keys, one for every contract
+            solvable_utxo (list): list of UTXO objects used to fund all of the contracts
+            rbf (bool): signal replaceability of the transaction (BIP 125)
+
+        Returns:
+            BitcoinAtomicSwapBatchTransaction: unsigned transaction object
+
+        Example:
+            >>> from clove.network import BitcoinTestNet
+            >>> network = BitcoinTestNet()
+            >>> transaction = network.atomic_swap_batch(
+            ...     'msJ2ucZ2NDhpVzsiNE5mGUFzqFDggjBVTM',
+            ...     [
+            ...         {'recipient_address': 'mmJtKA92Mxqfi3XdyGReza69GjhkwAcBN1', 'value': 0.01},
+            ...         {'recipient_address': 'mmJtKA92Mxqfi3XdyGReza69GjhkwAcBN1', 'value': 0.02},
+            ...     ],
+            ...     utxo,
+            ... )
+            >>> len(transaction.show_details()['contracts'])
+            2
+        '''
+        transaction = BitcoinAtomicSwapBatchTransaction(self, sender_address, legs, solvable_utxo, rbf=rbf)
+        transaction.create_unsigned_transaction()
+        return transaction
+
+    @auto_switch_params()
+    def bump_fee(
+        self,
+        transaction: BitcoinTransaction,
+        new_fee_per_kb: float,
+        default_wallet: BitcoinWallet=None,
+    ) -> BitcoinTransaction:
+        '''
+        Increases fee of the stuck transaction by replacing it (the transaction has to be created with `rbf=True`).
+
+        Args:
+            transaction (BitcoinTransaction): signed transaction
+            new_fee_per_kb (float): new fee per kB
+            default_wallet (BitcoinWallet): wallet used for UTXO's without wallet
+
+        Returns:
+            BitcoinTransaction: the same transaction object signed again with the higher fee
+        '''
+        transaction.bump_fee(new_fee_per_kb, default_wallet)
+        return transaction
+
+    @auto_switch_params()
+    def child_pays_for_parent(
+        self,
+        transaction: BitcoinTransaction,
+        fee_per_kb: float,
+        wallet: BitcoinWallet=None,
+    ) -> BitcoinTransaction:
+        '''
+        Creates transaction spending the change of the stuck transaction with a fee paying for both of them.
+
+        Args:
+            transaction (BitcoinTransaction): signed transaction with change output
+            fee_per_kb (float): expected fee per kB of both transactions
+            wallet (BitcoinWallet): wallet of the change owner
+
+        Returns:
+            BitcoinTransaction: signed child transaction
+        '''
+        return transaction.build_cpfp_transaction(fee_per_kb, wallet)
+
     @auto_switch_params()
     def audit_contract(
         self,
         contract: str,
         raw_transaction: Optional[str]=None,
         transaction_address: Optional[str]=None,
+        latest_block: Optional[int]=None,
     ) -> BitcoinContract:
-        return BitcoinContract(self, contract, raw_transaction, transaction_address)
+        return BitcoinContract(self, contract, raw_transaction, transaction_address, latest_block)
+
+    @auto_switch_params()
+    def audit_contracts(self, items: list, max_workers: int=AUDIT_MAX_WORKERS, fetch_balance: bool=True) -> list:
+        '''
+        Audits multiple contracts concurrently.
+
+        Latest block number is fetched only once for all of the contracts. Error in one of the contracts
+        doesn't stop auditing the others, it's returned together with the results.
+
+        Args:
+            items (list): list of dictionaries with `audit_contract` arguments (`contract` and `raw_transaction`
+                or `transaction_address` keys)
+            max_workers (int): maximal number of contracts audited at the same time
+            fetch_balance (bool): fetch balances of the contracts (they are fetched lazily otherwise)
+
+        Returns:
+            list: list of (BitcoinContract, None) or (None, exception) tuples in the order of given items
+
+        Example:
+            >>> from clove.network import BitcoinTestNet
+            >>> network = BitcoinTestNet()
+            >>> results = network.audit_contracts([
+            ...     {'contract': contract, 'transaction_address': transaction_address},
+            ...     {'contract': contract, 'raw_transaction': 'invalid'},
+            ... ])
+            >>> [error for contract, error in results]
+            [None, ImpossibleDeserialization()]
+        '''
+        if not items:
+            return []
+
+        latest_block = None
+        if any(not item.get('raw_transaction') for item in items):
+            try:
+                latest_block = self.latest_block
+            except Exception as e:
+                logger.debug('Could not get latest block number: %s', e)
+
+        def audit(item):
+            try:
+                contract = self.audit_contract(latest_block=latest_block, **item)
+                if fetch_balance:
+                    # balance is cached in the contract, so it's fetched in the worker thread
+                    contract.balance
+                return contract, None
+            except Exception as e:
+                logger.debug('Could not audit contract %s: %r', item.get('contract'), e)
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(audit, items))
+
+    @staticmethod
+    def get_common_address(contracts: list, address_attribute: str) -> str:
+        '''Returns address shared by all of the contracts (raises ValueError if contracts have different addresses).'''
+        if not contracts:
+            raise ValueError('At least one contract is required.')
+
+        addresses = {getattr(contract, address_attribute) for contract in contracts}
+        if len(addresses) > 1:
+            raise ValueError(f'All contracts have to use the same {address_attribute.replace("_", " ")}.')
+
+        for contract in contracts:
+            if contract.balance == 0:
+                raise ValueError(f'Balance of contract {contract.address} is 0.')
+
+        return addresses.pop()
+
+    @auto_switch_params()
+    def redeem_many(self, contracts_with_secrets: list, wallet) -> BitcoinTransaction:
+        '''
+        Creates one transaction redeeming multiple contracts.
+
+        Args:
+            contracts_with_secrets (list): list of (BitcoinContract, secret) tuples
+            wallet (BitcoinWallet): wallet of the contracts recipient
+
+        Returns:
+            BitcoinTransaction: unsigned transaction object spending all of the contracts
+
+        Raises:
+            ValueError: if contracts have different recipients or one of them has a zero balance
+        '''
+        contracts = [contract for contract, _ in contracts_with_secrets]
+        recipient_address = self.get_common_address(contracts, 'recipient_address')
+
+        transaction = BitcoinTransaction(
+            network=self,
+            recipient_address=recipient_address,
+            value_satoshi=sum(contract.value_satoshi for contract in contracts),
+            solvable_utxo=[
+                contract.get_contract_utxo(wallet, secret, contract=contract.contract)
+                for contract, secret in contracts_with_secrets
+            ],
+        )
+        transaction.create_unsigned_transaction()
+        return transaction
+
+    @auto_switch_params()
+    def refund_many(self, contracts: list, wallet) -> BitcoinTransaction:
+        '''
+        Creates one transaction refunding multiple expired contracts.
+        Transaction locktime is set to the latest locktime of the given contracts.
+
+        Args:
+            contracts (list): list of BitcoinContract objects
+            wallet (BitcoinWallet): wallet of the contracts sender
+
+        Returns:
+            BitcoinTransaction: unsigned transaction object spending all of the contracts
+
+        Raises:
+            RuntimeError: if any of the contracts is still valid
+            ValueError: if contracts have different refund addresses or one of them has a zero balance
+        '''
+        refund_address = self.get_common_address(contracts, 'refund_address')
+
+        locktime = max(contract.locktime for contract in contracts)
+        if locktime > datetime.utcnow():
+            locktime_string = locktime.strftime('%Y-%m-%d %H:%M:%S')
+            raise RuntimeError(
+                f"Some of the contracts are still valid! They can't be refunded until {locktime_string} UTC."
+            )
+
+        transaction = BitcoinTransaction(
+            network=self,
+            recipient_address=refund_address,
+            value_satoshi=sum(contract.value_satoshi for contract in contracts),
+            solvable_utxo=[
+                contract.get_contract_utxo(wallet, refund=True, contract=contract.contract) for contract in contracts
+            ],
+            tx_locktime=max(contract.locktime_timestamp for contract in contracts),
+        )
+        transaction.create_unsigned_transaction()
+        return transaction
 
     @classmethod
     @auto_switch_params()
@@ -435,28 +741,45 @@ class BitcoinBaseNetwork(BaseNetwork):
             if not tx.vin:
                 raise ValueError('Given transaction has no inputs.')
 
-            secret_tx_in = tx.vin[0]
-            script_ops = list(secret_tx_in.scriptSig)
+            script_sig = tx.vin[0].scriptSig
         else:
-            script_ops = list(script.CScript.fromhex(scriptsig))
+            script_sig = x(scriptsig)
 
-        if script_ops[-2] == 1:
-            return b2x(script_ops[-3])
-
-        raise ValueError('Unable to extract secret.')
+        secret = extract_secret_from_script_sig(script_sig)
+        if secret is None:
+            raise ValueError('Unable to extract secret.')
+        return secret.hex()
 
     @classmethod
-    def extract_secret_from_redeem_transaction(cls, contract_address: str) -> Optional[str]:
-
+    def get_spending_script_sig(
+        cls,
+        contract_address: str,
+        transaction_address: Optional[str]=None,
+        vout: Optional[int]=None,
+    ) -> Optional[str]:
+        '''
+        Returns scriptSig (hex) of the input spending the contract output (None if the output was not spent yet).
+
+        Args:
+            contract_address (str): P2SH address of the contract
+            transaction_address (str): address of the transaction with the contract output (if it's known,
+                the transaction spending this output is requested directly)
+            vout (int): index of the contract output
+
+        Raises:
+            ValueError: if the block explorer didn't return the spending transaction
+        '''
         if cls.is_test_network() and cls.name != 'test-bitcoin':
             raise NotImplementedError
 
         try:
-            scriptsig = extract_scriptsig_from_redeem_transaction(
+            return extract_scriptsig_from_redeem_transaction(
                 network=cls.symbols[0],
                 contract_address=contract_address,
                 testnet=cls.is_test_network(),
                 cryptoid_api_key=os.getenv('CRYPTOID_API_KEY'),
+                transaction_address=transaction_address,
+                vout=vout,
             )
         except NotImplementedError:
             logger.debug('%s: network is not supported', cls.name)
@@ -465,6 +788,24 @@ class BitcoinBaseNetwork(BaseNetwork):
             logger.debug(e)
             raise
 
+    @classmethod
+    def extract_secret_from_redeem_transaction(
+        cls,
+        contract_address: str,
+        transaction_address: Optional[str]=None,
+        vout: Optional[int]=None,
+    ) -> Optional[str]:
+        '''
+        Returns secret from the transaction redeeming the contract.
+
+        Args:
+            contract_address (str): P2SH address of the contract
+            transaction_address (str): address of the transaction with the contract output (if it's known,
+                the transaction spending this output is requested directly)
+            vout (int): index of the contract output
+        '''
+        scriptsig = cls.get_spending_script_sig(contract_address, transaction_address, vout)
+
         try:
             return cls.extract_secret(scriptsig=scriptsig)
         except ValueError as e:
@@ -488,8 +829,7 @@ class BitcoinBaseNetwork(BaseNetwork):
         except Exception:
             raise ImpossibleDeserialization()
 
-    @property
-    def latest_block(self):
+    def get_latest_block(self) -> Optional[int]:
         return get_latest_block_number(self.default_symbol, self.testnet)
 
     def get_transaction(self, tx_address: str) -> dict:
@@ -1,9 +1,10 @@
 from datetime import datetime
 from typing import Optional
 
-from bitcoin.core import CTxOut, b2lx, b2x, script
+from bitcoin.core import CTxOut, b2lx, script
 from bitcoin.wallet import CBitcoinAddress, P2PKHBitcoinAddress
 
+from clove.network.bitcoin.htlc import match_htlc
 from clove.network.bitcoin.transaction import BitcoinTransaction
 from clove.network.bitcoin.utxo import Utxo
 from clove.utils.bitcoin import auto_switch_params, from_base_units, to_base_units
@@ -11,6 +12,13 @@ from clove.utils.external_source import get_balance
 
 
 class BitcoinContract(object):
+    '''
+    Atomic swap contract found in the transaction.
+
+    Contract details are parsed from the transaction without any network calls (unless the transaction has to be
+    fetched by its address). `balance` and `confirmations` are fetched on the first access and cached,
+    use `refresh` to fetch them again.
+    '''
 
     @auto_switch_params(1)
     def __init__(
@@ -18,7 +26,8 @@ class BitcoinContract(object):
         network,
         contract: str,
         raw_transaction: Optional[str]=None,
-        transaction_address: Optional[str]=None
+        transaction_address: Optional[str]=None,
+        latest_block: Optional[int]=None,
     ):
 
         if not raw_transaction and not transaction_address:
@@ -29,14 +38,26 @@ class BitcoinContract(object):
         self.contract = contract
         self.tx = None
         self.vout = None
-        self.confirmations = None
+        self.vout_index = 0
         self.tx_address = transaction_address
+        self.block_height = None
+        '''Number of the block with the contract transaction (if it's known, negative for unconfirmed transaction).'''
+        self.latest_block = latest_block
+        self._confirmations = None
+        self._explorer_confirmations = False
+        '''True if the number of confirmations is taken from the explorer (it's fetched again on refresh).'''
+        self._transaction_stale = False
+        self._balance = None
+        self._balance_fetched = False
+
+        contract_script = script.CScript.fromhex(self.contract)
+        script_pub_key = contract_script.to_p2sh_scriptPubKey()
+
         if raw_transaction:
             self.tx = self.network.deserialize_raw_transaction(raw_transaction)
-            try:
-                self.vout = self.tx.vout[0]
-            except IndexError:
+            if not self.tx.vout:
                 raise ValueError('Given transaction has no outputs.')
+            self.vout_index, self.vout = self.find_contract_output(self.tx.vout, script_pub_key)
         else:
             tx_json = self.network.get_transaction(transaction_address)
             if not tx_json:
@@ -44,77 +65,144 @@ class BitcoinContract(object):
             if 'hex' in tx_json:
                 # transaction from blockcypher or raven explorer
                 self.tx = self.network.deserialize_raw_transaction(tx_json['hex'])
-                self.vout = self.tx.vout[0]
+                self.vout_index, self.vout = self.find_contract_output(self.tx.vout, script_pub_key)
             else:
                 # transaction from cryptoid
-                incorrect_cscript = script.CScript.fromhex(tx_json['outputs'][0]['script'])
-                correct_cscript = script.CScript([script.OP_HASH160, list(incorrect_cscript)[2], script.OP_EQUAL])
-                nValue = to_base_units(tx_json['outputs'][0]['amount'])
-                self.vout = CTxOut(nValue, correct_cscript)
-
-            if 'confirmations' in tx_json:
-                self.confirmations = tx_json['confirmations']
-            elif 'block_height' in tx_json:
-                self.confirmations = self.network.latest_block - tx_json['block_height']
-            elif 'block' in tx_json:
-                self.confirmations = self.network.latest_block - tx_json['block']
+                outputs = []
+                for output in tx_json['outputs']:
+                    incorrect_cscript = script.CScript.fromhex(output['script'])
+                    try:
+                        correct_cscript = script.CScript(
+                            [script.OP_HASH160, list(incorrect_cscript)[2], script.OP_EQUAL]
+                        )
+                    except IndexError:
+                        correct_cscript = incorrect_cscript
+                    outputs.append(CTxOut(to_base_units(output['amount']), correct_cscript))
+                self.vout_index, self.vout = self.find_contract_output(outputs, script_pub_key)
+
+            self.set_block_details(tx_json)
 
         if not self.vout:
             raise ValueError('Given transaction has no outputs.')
 
         contract_tx_out = self.vout
-        contract_script = script.CScript.fromhex(self.contract)
-        script_pub_key = contract_script.to_p2sh_scriptPubKey()
         valid_p2sh = script_pub_key == contract_tx_out.scriptPubKey
         self.address = str(CBitcoinAddress.from_scriptPubKey(script_pub_key))
-        try:
-            if hasattr(self.network, 'get_balance'):
-                self.balance = self.network.get_balance(self.address)
-            else:
-                self.balance = get_balance(self.network, self.address)
-        except NotImplementedError:
-            self.balance = None
 
-        script_ops = list(contract_script)
-        if valid_p2sh and self.is_valid_contract_script(script_ops):
-            self.recipient_address = str(P2PKHBitcoinAddress.from_bytes(script_ops[6]))
-            self.refund_address = str(P2PKHBitcoinAddress.from_bytes(script_ops[13]))
-            self.locktime_timestamp = int.from_bytes(script_ops[8], byteorder='little')
+        htlc = match_htlc(contract_script)
+        if valid_p2sh and htlc:
+            self.recipient_address = str(P2PKHBitcoinAddress.from_bytes(bytes(htlc.recipient_hash)))
+            self.refund_address = str(P2PKHBitcoinAddress.from_bytes(bytes(htlc.refund_hash)))
+            self.locktime_timestamp = htlc.locktime
             self.locktime = datetime.utcfromtimestamp(self.locktime_timestamp)
-            self.secret_hash = b2x(script_ops[2])
-            self.value = from_base_units(contract_tx_out.nValue)
+            self.secret_hash = htlc.secret_hash.hex()
+            self.value_satoshi = contract_tx_out.nValue
+            self.value = from_base_units(self.value_satoshi)
         else:
             raise ValueError('Given transaction is not a valid contract.')
 
     @property
-    def transaction_address(self):
-        return self.tx_address or b2lx(self.tx.GetHash())
+    def balance(self) -> Optional[float]:
+        '''Contract balance fetched from the network on the first access (None if it's not available).'''
+        if not self._balance_fetched:
+            self.balance = self.get_balance()
+        return self._balance
+
+    @balance.setter
+    def balance(self, balance: Optional[float]):
+        self._balance = balance
+        self._balance_fetched = True
+
+    def get_balance(self) -> Optional[float]:
+        try:
+            if hasattr(self.network, 'get_balance'):
+                return self.network.get_balance(self.address)
+            return get_balance(self.network, self.address)
+        except NotImplementedError:
+            return None
+
+    def set_block_details(self, tx_json: dict):
+        '''Takes confirmations and block height of the contract transaction from the explorer response.'''
+        self.block_height = tx_json.get('block_height', tx_json.get('block'))
+        self._explorer_confirmations = tx_json.get('confirmations') is not None
+        if self._explorer_confirmations:
+            self._confirmations = tx_json['confirmations']
+
+    @property
+    def confirmations(self) -> Optional[int]:
+        '''
+        Number of confirmations of the contract transaction
+        (None for the contract audited from the raw transaction).
+
+        Number given by the explorer is preferred, otherwise it's counted from the block of the transaction.
+        '''
+        if self._transaction_stale:
+            self._transaction_stale = False
+            tx_json = self.network.get_transaction(self.tx_address)
+            if tx_json:
+                self.set_block_details(tx_json)
+        if self._confirmations is None and self.block_height is not None:
+            if self.block_height < 0:
+                # transaction is not mined yet
+                return 0
+            if self.latest_block is None:
+                self.latest_block = self.network.latest_block
+            self._confirmations = self.latest_block - self.block_height
+        return self._confirmations
+
+    @confirmations.setter
+    def confirmations(self, confirmations: Optional[int]):
+        self._confirmations = confirmations
+
+    def refresh(self):
+        '''Clears cached balance and confirmations, so they will be fetched again on the next access.'''
+        self._balance = None
+        self._balance_fetched = False
+        if self._explorer_confirmations or (self.block_height is not None and self.block_height < 0):
+            self._transaction_stale = True
+            self._confirmations = None
+        elif self.block_height is not None:
+            self.latest_block = None
+            self._confirmations = None
 
     @staticmethod
-    def is_valid_contract_script(script_ops):
+    def is_valid_contract_script(script_ops) -> bool:
+        '''
+        Checks if the script is the atomic swap contract (see `clove.network.bitcoin.htlc.match_htlc`).
+
+        Args:
+            script_ops: contract script or list of its operations (e.g. `list(contract_script)`)
+        '''
+        if not isinstance(script_ops, (bytes, bytearray, memoryview)):
+            try:
+                script_ops = script.CScript(script_ops)
+            except (TypeError, ValueError):
+                return False
+        return match_htlc(script_ops) is not None
+
+    @staticmethod
+    def find_contract_output(outputs: list, script_pub_key: script.CScript) -> tuple:
+        '''
+        Returns index and output paying to the contract (transaction can fund multiple contracts at once).
+        First output is returned if none of the outputs is matching the contract.
+        '''
+        for index, tx_out in enumerate(outputs):
+            if tx_out.scriptPubKey == script_pub_key:
+                return index, tx_out
         try:
-            is_valid = (
-                script_ops[0] == script.OP_IF
-                and script_ops[1] == script.OP_RIPEMD160
-                and script_ops[3] == script_ops[15] == script.OP_EQUALVERIFY
-                and script_ops[4] == script_ops[11] == script.OP_DUP
-                and script_ops[5] == script_ops[12] == script.OP_HASH160
-                and script_ops[7] == script.OP_ELSE
-                and script_ops[9] == script.OP_CHECKLOCKTIMEVERIFY
-                and script_ops[10] == script.OP_DROP
-                and script_ops[14] == script.OP_ENDIF
-                and script_ops[16] == script.OP_CHECKSIG
-            )
+            return 0, outputs[0]
         except IndexError:
-            is_valid = False
+            return 0, None
 
-        return is_valid
+    @property
+    def transaction_address(self):
+        return self.tx_address or b2lx(self.tx.GetHash())
 
     def get_contract_utxo(self, wallet=None, secret=None, refund=False, contract=None):
         return Utxo(
             tx_id=self.transaction_address,
-            vout=0,
-            value=self.value,
+            vout=self.vout_index,
+            satoshis=self.value_satoshi,
             tx_script=self.vout.scriptPubKey.hex(),
             wallet=wallet,
             secret=secret,
@@ -128,7 +216,7 @@ class BitcoinContract(object):
         transaction = BitcoinTransaction(
             network=self.network,
             recipient_address=self.recipient_address,
-            value=self.value,
+            value_satoshi=self.value_satoshi,
             solvable_utxo=[self.get_contract_utxo(wallet, secret, contract=self.contract)]
         )
         transaction.create_unsigned_transaction()
@@ -143,7 +231,7 @@ class BitcoinContract(object):
         transaction = BitcoinTransaction(
             network=self.network,
             recipient_address=self.refund_address,
-            value=self.value,
+            value_satoshi=self.value_satoshi,
             solvable_utxo=[self.get_contract_utxo(wallet, refund=True, contract=self.contract)],
             tx_locktime=self.locktime_timestamp,
         )
@@ -0,0 +1,159 @@
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from bitcoin.core import script
+
+# Atomic swap contract layout (see `BitcoinAtomicSwapTransaction.build_atomic_swap_contract`):
+#   OP_IF OP_RIPEMD160 <20 bytes secret hash> OP_EQUALVERIFY OP_DUP OP_HASH160 <20 bytes recipient hash>
+#   OP_ELSE <1-5 bytes locktime> OP_CHECKLOCKTIMEVERIFY OP_DROP OP_DUP OP_HASH160 <20 bytes refund hash>
+#   OP_ENDIF OP_EQUALVERIFY OP_CHECKSIG
+HTLC_HEAD = bytes([script.OP_IF, script.OP_RIPEMD160, 20])
+HTLC_RECIPIENT = bytes([script.OP_EQUALVERIFY, script.OP_DUP, script.OP_HASH160, 20])
+HTLC_ELSE = script.OP_ELSE
+HTLC_REFUND = bytes([script.OP_CHECKLOCKTIMEVERIFY, script.OP_DROP, script.OP_DUP, script.OP_HASH160, 20])
+HTLC_TAIL = bytes([script.OP_ENDIF, script.OP_EQUALVERIFY, script.OP_CHECKSIG])
+
+SECRET_HASH_OFFSET = len(HTLC_HEAD)
+RECIPIENT_OFFSET = SECRET_HASH_OFFSET + 20 + len(HTLC_RECIPIENT)
+ELSE_OFFSET = RECIPIENT_OFFSET + 20
+LOCKTIME_OFFSET = ELSE_OFFSET + 2
+'''Offset of the locktime data (after OP_ELSE and the push length).'''
+HTLC_BASE_SIZE = LOCKTIME_OFFSET + len(HTLC_REFUND) + 20 + len(HTLC_TAIL)
+'''Size of the contract without the locktime data.'''
+HTLC_MIN_SIZE = HTLC_BASE_SIZE + 1
+HTLC_MAX_SIZE = HTLC_BASE_SIZE + 5
+
+
+class HtlcMatch(NamedTuple):
+    '''Fields sliced out of the contract script (memoryviews of the original script bytes).'''
+    secret_hash: memoryview
+    recipient_hash: memoryview
+    locktime: int
+    refund_hash: memoryview
+
+
+def match_htlc(contract: Union[bytes, memoryview]) -> Optional[HtlcMatch]:
+    '''
+    Matches the contract script against the atomic swap contract template.
+
+    Only the fixed opcode positions are compared, the script is not parsed.
+
+    Args:
+        contract (bytes): contract script
+
+    Returns:
+        HtlcMatch, None: contract fields or None if the script is not an atomic swap contract
+
+    Example:
+        >>> from bitcoin.core import x
+        >>> match = match_htlc(x(
+        ...     '63a614977afed2fcdfea9d27fd3032b4a1bc20219007f18876a9143f8870a5633e4fdac612fba4752'
+        ...     '5fef082bbe96167049b02d25ab17576a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b6888ac'
+        ... ))
+        >>> match.locktime
+        1523712667
+        >>> match.secret_hash.hex()
+        '977afed2fcdfea9d27fd3032b4a1bc20219007f1'
+    '''
+    view = memoryview(contract)
+    size = len(view)
+    if size < HTLC_MIN_SIZE or size > HTLC_MAX_SIZE:
+        return None
+
+    locktime_size = size - HTLC_BASE_SIZE
+    refund_offset = LOCKTIME_OFFSET + locktime_size
+    tail_offset = refund_offset + len(HTLC_REFUND) + 20
+    if (
+        view[:SECRET_HASH_OFFSET] != HTLC_HEAD
+        or view[SECRET_HASH_OFFSET + 20:RECIPIENT_OFFSET] != HTLC_RECIPIENT
+        or view[ELSE_OFFSET] != HTLC_ELSE
+        or view[ELSE_OFFSET + 1] != locktime_size
+        or view[refund_offset:refund_offset + len(HTLC_REFUND)] != HTLC_REFUND
+        or view[tail_offset:] != HTLC_TAIL
+    ):
+        return None
+
+    return HtlcMatch(
+        view[SECRET_HASH_OFFSET:SECRET_HASH_OFFSET + 20],
+        view[RECIPIENT_OFFSET:ELSE_OFFSET],
+        int.from_bytes(view[LOCKTIME_OFFSET:refund_offset], byteorder='little'),
+        view[tail_offset - 20:tail_offset],
+    )
+
+
+def match_htlc_batch(scripts: Iterable[Union[bytes, memoryview]]) -> Iterator[Tuple[int, HtlcMatch]]:
+    '''
+    Yields (index, HtlcMatch) for every script matching the atomic swap contract template.
+
+    Example:
+        >>> contracts = [(index, match) for index, match in match_htlc_batch(scripts)]
+    '''
+    for index, contract in enumerate(scripts):
+        # cheapest check first, most of the scanned scripts are standard outputs of 23-25 bytes
+        if HTLC_MIN_SIZE <= len(contract) <= HTLC_MAX_SIZE and contract[0] == script.OP_IF:
+            match = match_htlc(contract)
+            if match is not None:
+                yield index, match
+
+
+def extract_secret_from_script_sig(script_sig: Union[bytes, memoryview]) -> Optional[memoryview]:
+    '''
+    Returns the secret from the scriptSig redeeming the atomic swap contract.
+
+    Redeem scriptSig has the following layout: <signature> <public key> <secret> OP_TRUE <contract>.
+    Pushes are walked over without parsing the script into objects.
+
+    Returns:
+        memoryview, None: secret or None if it's not a scriptSig redeeming the contract
+    '''
+    view = memoryview(script_sig)
+    size = len(view)
+    # positions of the last three elements, end is -1 for opcodes without data (start is the opcode then)
+    start_3 = end_3 = start_2 = end_2 = start_1 = end_1 = -1
+    position = 0
+    while position < size:
+        opcode = view[position]
+        position += 1
+        if opcode < script.OP_PUSHDATA1:
+            data_size = opcode
+        elif opcode == script.OP_PUSHDATA1:
+            if position == size:
+                return None
+            data_size = view[position]
+            position += 1
+        elif opcode == script.OP_PUSHDATA2:
+            data_size = int.from_bytes(view[position:position + 2], byteorder='little')
+            position += 2
+        elif opcode == script.OP_PUSHDATA4:
+            data_size = int.from_bytes(view[position:position + 4], byteorder='little')
+            position += 4
+        else:
+            start_3, end_3, start_2, end_2, start_1, end_1 = start_2, end_2, start_1, end_1, opcode, -1
+            continue
+
+        if position + data_size > size:
+            return None
+        start_3, end_3, start_2, end_2 = start_2, end_2, start_1, end_1
+        start_1, end_1 = position, position + data_size
+        position += data_size
+
+    if end_3 == -1 or end_2 != -1 or start_2 != script.OP_TRUE or end_1 == -1:
+        return None
+    return view[start_3:end_3]
+
+
+def is_refund_script_sig(script_sig: Union[bytes, memoryview]) -> bool:
+    '''
+    Checks if the scriptSig spends the atomic swap contract with the refund branch.
+
+    Refund scriptSig has the following layout: <signature> <public key> OP_FALSE <contract>.
+    '''
+    try:
+        elements = list(script.CScript(bytes(script_sig)))
+    except script.CScriptInvalidError:
+        return False
+    return (
+        len(elements) == 4
+        and elements[2] == script.OP_FALSE
+        and isinstance(elements[3], bytes)
+        and match_htlc(elements[3]) is not None
+    )
@@ -0,0 +1,175 @@
+from time import time
+from typing import Optional
+
+from bitcoin.core import CTransaction, CTxOut, script
+
+from clove.constants import (
+    LOCKTIME_THRESHOLD,
+    MAX_OP_RETURN_RELAY,
+    MAX_STANDARD_SCRIPTSIG_SIZE,
+    REFUND_MTP_MARGIN,
+    SEQUENCE_FINAL,
+    SPENDING_INPUT_SIZE,
+    SPENDING_WITNESS_INPUT_SIZE,
+)
+from clove.exceptions import NonStandardTransaction
+from clove.utils.logging import logger
+
+
+def is_p2pkh(script_pub_key: script.CScript) -> bool:
+    return (
+        len(script_pub_key) == 25
+        and script_pub_key[0] == script.OP_DUP
+        and script_pub_key[1] == script.OP_HASH160
+        and script_pub_key[2] == 20
+        and script_pub_key[23] == script.OP_EQUALVERIFY
+        and script_pub_key[24] == script.OP_CHECKSIG
+    )
+
+
+def is_p2pk(script_pub_key: script.CScript) -> bool:
+    return (
+        len(script_pub_key) in (35, 67)
+        and script_pub_key[0] == len(script_pub_key) - 2
+        and script_pub_key[-1] == script.OP_CHECKSIG
+    )
+
+
+def is_null_data(script_pub_key: script.CScript) -> bool:
+    return (
+        len(script_pub_key) <= MAX_OP_RETURN_RELAY
+        and script_pub_key[0:1] == bytes([script.OP_RETURN])
+        and script.CScript(script_pub_key[1:]).is_push_only()
+    )
+
+
+def is_standard_output_script(script_pub_key: script.CScript) -> bool:
+    return (
+        is_p2pkh(script_pub_key)
+        or script_pub_key.is_p2sh()
+        or script_pub_key.is_witness_v0_keyhash()
+        or script_pub_key.is_witness_v0_scripthash()
+        or is_p2pk(script_pub_key)
+        or is_null_data(script_pub_key)
+    )
+
+
+def get_dust_threshold(network, script_pub_key: script.CScript) -> int:
+    '''
+    Returns minimal value of the output relayed by the nodes (in satoshis).
+
+    Output is dust if spending it would cost more than its value at the dust relay fee of the network
+    (546 satoshis for P2PKH and 540 for P2SH outputs with the default Bitcoin Core fee).
+    '''
+    output_size = len(CTxOut(0, script_pub_key).serialize())
+    if script_pub_key.is_witness_scriptpubkey():
+        output_size += SPENDING_WITNESS_INPUT_SIZE
+    else:
+        output_size += SPENDING_INPUT_SIZE
+    return network.dust_relay_fee_per_kb * output_size // 1000
+
+
+def get_standardness_violations(network, tx: CTransaction, size: int) -> list:
+    violations = []
+
+    if tx.nVersion not in (1, 2):
+        violations.append(f'Transaction version {tx.nVersion} is not standard.')
+
+    if size > network.max_standard_transaction_size:
+        violations.append(
+            f'Transaction size {size} bytes exceeds the limit of {network.max_standard_transaction_size} bytes.'
+        )
+
+    for index, tx_in in enumerate(tx.vin):
+        if len(tx_in.scriptSig) > MAX_STANDARD_SCRIPTSIG_SIZE:
+            violations.append(f'Input {index} scriptSig is too big ({len(tx_in.scriptSig)} bytes).')
+        if not tx_in.scriptSig.is_push_only():
+            violations.append(f'Input {index} scriptSig is not push only.')
+
+    for index, tx_out in enumerate(tx.vout):
+        if not is_standard_output_script(tx_out.scriptPubKey):
+            violations.append(f'Output {index} script is not standard.')
+            continue
+        if is_null_data(tx_out.scriptPubKey):
+            continue
+        dust_threshold = get_dust_threshold(network, tx_out.scriptPubKey)
+        if tx_out.nValue < dust_threshold:
+            violations.append(f'Output {index} value {tx_out.nValue} is below the dust threshold of {dust_threshold}.')
+
+    return violations
+
+
+def get_locktime_violations(network, tx: CTransaction) -> list:
+    if not tx.nLockTime:
+        return []
+
+    if all(tx_in.nSequence == SEQUENCE_FINAL for tx_in in tx.vin):
+        return ['Transaction locktime is ignored, because all of the inputs have final sequence.']
+
+    if tx.nLockTime >= LOCKTIME_THRESHOLD:
+        if tx.nLockTime >= time() - REFUND_MTP_MARGIN.total_seconds():
+            # nodes compare the locktime with the median time of the past 11 blocks, which lags behind the clock
+            return [f'Transaction is locked until {tx.nLockTime} timestamp.']
+        return []
+
+    try:
+        latest_block = network.latest_block
+    except Exception as e:
+        # locktime is checked by the nodes anyway
+        logger.warning('Unable to check the transaction locktime against the block height: %r', e)
+        return []
+    # transaction can be included in the next block if its locktime is lower than the block number
+    if latest_block is not None and tx.nLockTime > latest_block:
+        return [f'Transaction is locked until block {tx.nLockTime} (latest block is {latest_block}).']
+    return []
+
+
+def get_policy_violations(network, tx: CTransaction, size: int, fee: Optional[int]=None) -> list:
+    '''
+    Checks transaction against the relay policy of the network nodes.
+
+    Standardness rules and the relay fee are checked only for the networks with known policy
+    (see `relay_policy_source`), transactions of other networks are checked only for the problems
+    rejected by the consensus (e.g. locktime or outputs bigger than inputs).
+
+    Args:
+        network: network object with `relay_policy_source`, `require_standard`, `dust_relay_fee_per_kb`,
+            `min_relay_fee_per_kb`, `max_standard_transaction_size` and `latest_block`
+        tx (CTransaction): transaction to check
+        size (int): size of the serialized transaction in bytes
+        fee (int): transaction fee in satoshis (fee checks are skipped if it's not known)
+
+    Returns:
+        list: descriptions of the problems, empty list for the standard transaction
+    '''
+    violations = []
+    policy_known = network.relay_policy_source is not None
+
+    if not tx.vin:
+        violations.append('Transaction has no inputs.')
+    if not tx.vout:
+        violations.append('Transaction has no outputs.')
+
+    if policy_known and network.require_standard:
+        violations += get_standardness_violations(network, tx, size)
+
+    violations += get_locktime_violations(network, tx)
+
+    if fee is not None:
+        if fee < 0:
+            violations.append('Transaction outputs are bigger than inputs.')
+        elif policy_known:
+            min_fee = network.min_relay_fee_per_kb * size // 1000
+            if fee < min_fee:
+                violations.append(f'Transaction fee {fee} is below the minimal relay fee of {min_fee}.')
+
+    return violations
+
+
+def check_policy(network, tx: CTransaction, size: int, fee: Optional[int]=None):
+    '''
+    Raises NonStandardTransaction if the transaction would be rejected by the nodes (see `get_policy_violations`).
+    '''
+    violations = get_policy_violations(network, tx, size, fee)
+    if violations:
+        raise NonStandardTransaction(' '.join(violations))
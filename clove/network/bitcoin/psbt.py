@@ -0,0 +1,414 @@
+from base64 import b64decode, b64encode
+from io import BytesIO
+import json
+import struct
+from typing import Optional, Union
+
+from bitcoin.core import CMutableTransaction, CTransaction, Hash160, ValidationError, b2x, script, x
+from bitcoin.core.scripteval import SCRIPT_VERIFY_P2SH, VerifyScript
+from bitcoin.core.serialize import BytesSerializer, SerializationTruncationError, VarIntSerializer
+
+from clove.network.bitcoin.transaction import (
+    BitcoinAtomicSwapBatchTransaction,
+    BitcoinAtomicSwapTransaction,
+    BitcoinTransaction,
+)
+from clove.network.bitcoin.utxo import Utxo
+from clove.network.bitcoin.wallet import BitcoinWallet
+
+PSBT_MAGIC = b'psbt\xff'
+
+PSBT_GLOBAL_UNSIGNED_TX = 0x00
+PSBT_IN_NON_WITNESS_UTXO = 0x00
+PSBT_IN_PARTIAL_SIG = 0x02
+PSBT_IN_SIGHASH_TYPE = 0x03
+PSBT_IN_REDEEM_SCRIPT = 0x04
+PSBT_IN_FINAL_SCRIPTSIG = 0x07
+PSBT_PROPRIETARY = 0xfc
+
+PROPRIETARY_PREFIX = b'clove'
+'''Identifier of the proprietary PSBT fields used by clove.'''
+
+PROPRIETARY_GLOBAL_STATE = 0x00
+PROPRIETARY_IN_SECRET = 0x01
+PROPRIETARY_IN_REFUND = 0x02
+
+TRANSACTION_TYPES = {
+    transaction_class.__name__: transaction_class
+    for transaction_class in (BitcoinTransaction, BitcoinAtomicSwapTransaction, BitcoinAtomicSwapBatchTransaction)
+}
+
+
+def proprietary_key(subtype: int) -> bytes:
+    return (
+        bytes([PSBT_PROPRIETARY])
+        + BytesSerializer.serialize(PROPRIETARY_PREFIX)
+        + VarIntSerializer.serialize(subtype)
+    )
+
+
+def get_previous_transaction(network, tx_id: str) -> CTransaction:
+    '''Fetches the transaction with the spent output from the block explorer.'''
+    tx_json = network.get_transaction(tx_id)
+    if not tx_json or 'hex' not in tx_json:
+        raise ValueError(f'Unable to get transaction {tx_id}, pass it in previous_transactions.')
+    return CTransaction.deserialize(x(tx_json['hex']))
+
+
+def read_map(stream) -> list:
+    '''Reads key-value pairs from the stream until the map separator.'''
+    pairs = []
+    while True:
+        key = BytesSerializer.stream_deserialize(stream)
+        if not key:
+            return pairs
+        pairs.append((key, BytesSerializer.stream_deserialize(stream)))
+
+
+def write_map(stream, pairs: list):
+    for key, value in pairs:
+        BytesSerializer.stream_serialize(key, stream)
+        BytesSerializer.stream_serialize(value, stream)
+    stream.write(b'\x00')
+
+
+class PsbtInput(object):
+    '''Input of the partially signed transaction.'''
+
+    def __init__(
+        self,
+        utxo: Utxo,
+        previous_transaction: CTransaction,
+        partial_sigs: dict=None,
+        final_script_sig: bytes=None,
+        unknown: list=None,
+    ):
+        self.utxo = utxo
+        self.previous_transaction = previous_transaction
+        '''Transaction with the spent output.'''
+        self.partial_sigs = partial_sigs or {}
+        '''Signatures (with sighash byte) indexed by public keys.'''
+        self.final_script_sig = final_script_sig
+        self.unknown = unknown or []
+        '''Key-value pairs not recognized by clove, kept untouched.'''
+
+    @property
+    def script_code(self) -> script.CScript:
+        '''Script used for the signature hash (contract for the P2SH outputs).'''
+        return self.utxo.parsed_contract or self.utxo.parsed_script
+
+    @property
+    def is_finalized(self) -> bool:
+        return self.final_script_sig is not None
+
+    def get_script_sig(self, public_key: bytes) -> script.CScript:
+        return script.CScript([self.partial_sigs[public_key], public_key] + self.utxo.unsigned_script_sig)
+
+    def serialize_pairs(self) -> list:
+        pairs = [(bytes([PSBT_IN_NON_WITNESS_UTXO]), self.previous_transaction.serialize())]
+        if self.is_finalized:
+            pairs.append((bytes([PSBT_IN_FINAL_SCRIPTSIG]), self.final_script_sig))
+        else:
+            pairs.append((bytes([PSBT_IN_SIGHASH_TYPE]), struct.pack('<I', script.SIGHASH_ALL)))
+            pairs.extend(
+                (bytes([PSBT_IN_PARTIAL_SIG]) + public_key, signature)
+                for public_key, signature in sorted(self.partial_sigs.items())
+            )
+        if self.utxo.contract:
+            pairs.append((bytes([PSBT_IN_REDEEM_SCRIPT]), bytes(self.utxo.parsed_contract)))
+        if self.utxo.secret:
+            pairs.append((proprietary_key(PROPRIETARY_IN_SECRET), bytes.fromhex(self.utxo.secret)))
+        if self.utxo.refund:
+            pairs.append((proprietary_key(PROPRIETARY_IN_REFUND), b'\x01'))
+        return pairs + self.unknown
+
+    @classmethod
+    def from_pairs(cls, pairs: list, tx_in) -> 'PsbtInput':
+        utxo = Utxo(tx_id=b2x(tx_in.prevout.hash[::-1]), vout=tx_in.prevout.n, tx_script='', satoshis=0)
+        psbt_input = cls(utxo, None)
+        for key, value in pairs:
+            key_type = key[0]
+            if key == bytes([PSBT_IN_NON_WITNESS_UTXO]):
+                previous_transaction = CTransaction.deserialize(value)
+                if previous_transaction.GetTxid() != tx_in.prevout.hash:
+                    raise ValueError(f'Previous transaction of the input {tx_in.prevout.n} of {utxo.tx_id} '
+                                     'does not match the spent output.')
+                try:
+                    tx_out = previous_transaction.vout[tx_in.prevout.n]
+                except IndexError:
+                    raise ValueError(f'Transaction {utxo.tx_id} has no output {tx_in.prevout.n}.')
+                psbt_input.previous_transaction = previous_transaction
+                utxo.satoshis = tx_out.nValue
+                utxo.tx_script = b2x(tx_out.scriptPubKey)
+            elif key == proprietary_key(PROPRIETARY_IN_SECRET):
+                utxo.secret = b2x(value)
+            elif key == proprietary_key(PROPRIETARY_IN_REFUND):
+                utxo.refund = value == b'\x01'
+            elif key_type == PSBT_IN_PARTIAL_SIG:
+                psbt_input.partial_sigs[key[1:]] = value
+            elif key_type == PSBT_IN_REDEEM_SCRIPT:
+                utxo.contract = b2x(value)
+            elif key_type == PSBT_IN_FINAL_SCRIPTSIG:
+                psbt_input.final_script_sig = value
+            elif key_type == PSBT_IN_SIGHASH_TYPE:
+                if struct.unpack('<I', value)[0] != script.SIGHASH_ALL:
+                    raise ValueError('Only SIGHASH_ALL signatures are supported.')
+            else:
+                psbt_input.unknown.append((key, value))
+        if psbt_input.previous_transaction is None:
+            raise ValueError(f'Missing previous transaction for input {tx_in.prevout.n} of {utxo.tx_id}.')
+        return psbt_input
+
+
+class PartiallySignedTransaction(object):
+    '''
+    Partially Signed Bitcoin Transaction (BIP 174).
+
+    Allows to build the transaction in one place and sign it somewhere else (e.g. by a number of signing workers).
+    Every input keeps the transaction with the spent output (standard non-witness UTXO field) and the contract
+    (as the redeem script), so signers don't need to fetch anything. Secret and refund flag of the contract inputs
+    and details of the clove transaction object (contract, locktime, fee) are kept in the proprietary fields,
+    so the transaction object can be recreated after signing.
+
+    Example:
+        >>> psbt = transaction.to_psbt()
+        >>> data = psbt.to_base64()
+        >>> # on the signing machine
+        >>> signer_psbt = PartiallySignedTransaction.from_base64(data)
+        >>> signer_psbt.sign(wallet)
+        1
+        >>> signed_data = signer_psbt.to_base64()
+        >>> # back on the building machine
+        >>> psbt = PartiallySignedTransaction.combine(psbt, PartiallySignedTransaction.from_base64(signed_data))
+        >>> psbt.finalize()
+        >>> transaction = psbt.to_transaction(network)
+        >>> transaction.publish()
+    '''
+
+    def __init__(self, tx: CMutableTransaction, inputs: list, state: dict=None, unknown: list=None):
+        self.tx = tx
+        '''Unsigned transaction (with empty scriptSigs).'''
+        self.inputs = inputs
+        self.state = state
+        '''Details of the clove transaction object (see `BitcoinTransaction.get_state`).'''
+        self.unknown = unknown or []
+
+    @classmethod
+    def from_transaction(
+        cls, transaction: BitcoinTransaction, previous_transactions: Optional[dict]=None
+    ) -> 'PartiallySignedTransaction':
+        '''
+        Creates PSBT of the transaction.
+
+        Args:
+            transaction (BitcoinTransaction): transaction object
+            previous_transactions (dict): transactions with the spent outputs (CTransaction, serialized transaction
+                or its hex) by their hashes, transactions which are not given are fetched from the block explorer
+
+        Returns:
+            PartiallySignedTransaction: PSBT object
+
+        Raises:
+            ValueError: if any of the previous transactions is not available
+        '''
+        previous_transactions = {
+            tx_id: cls.load_transaction(previous_transaction)
+            for tx_id, previous_transaction in (previous_transactions or {}).items()
+        }
+        tx = CMutableTransaction.from_tx(transaction.tx)
+        for tx_in in tx.vin:
+            tx_in.scriptSig = script.CScript()
+        inputs = []
+        for utxo in transaction.solvable_utxo:
+            if utxo.tx_id not in previous_transactions:
+                previous_transactions[utxo.tx_id] = get_previous_transaction(transaction.network, utxo.tx_id)
+            inputs.append(PsbtInput(
+                Utxo(
+                    tx_id=utxo.tx_id,
+                    vout=utxo.vout,
+                    satoshis=utxo.satoshis,
+                    tx_script=utxo.tx_script,
+                    secret=utxo.secret,
+                    refund=utxo.refund,
+                    contract=utxo.contract,
+                ),
+                previous_transactions[utxo.tx_id],
+            ))
+        return cls(tx, inputs, transaction.get_state())
+
+    @staticmethod
+    def load_transaction(transaction: Union[str, bytes, CTransaction]) -> CTransaction:
+        if isinstance(transaction, CTransaction):
+            return transaction
+        if isinstance(transaction, str):
+            transaction = x(transaction)
+        return CTransaction.deserialize(transaction)
+
+    def serialize(self) -> bytes:
+        stream = BytesIO()
+        stream.write(PSBT_MAGIC)
+
+        global_pairs = [(bytes([PSBT_GLOBAL_UNSIGNED_TX]), self.tx.serialize())]
+        if self.state:
+            global_pairs.append(
+                (proprietary_key(PROPRIETARY_GLOBAL_STATE), json.dumps(self.state, sort_keys=True).encode())
+            )
+        write_map(stream, global_pairs + self.unknown)
+
+        for psbt_input in self.inputs:
+            write_map(stream, psbt_input.serialize_pairs())
+        for _ in self.tx.vout:
+            write_map(stream, [])
+        return stream.getvalue()
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> 'PartiallySignedTransaction':
+        if not data.startswith(PSBT_MAGIC):
+            raise ValueError('Given data is not a PSBT.')
+        stream = BytesIO(data[len(PSBT_MAGIC):])
+
+        try:
+            tx = None
+            state = None
+            unknown = []
+            for key, value in read_map(stream):
+                if key == bytes([PSBT_GLOBAL_UNSIGNED_TX]):
+                    tx = CMutableTransaction.deserialize(value)
+                elif key == proprietary_key(PROPRIETARY_GLOBAL_STATE):
+                    state = json.loads(value.decode())
+                else:
+                    unknown.append((key, value))
+            if tx is None:
+                raise ValueError('PSBT has no unsigned transaction.')
+
+            inputs = [PsbtInput.from_pairs(read_map(stream), tx_in) for tx_in in tx.vin]
+            for _ in tx.vout:
+                read_map(stream)
+        except SerializationTruncationError:
+            raise ValueError('PSBT data is truncated.')
+
+        return cls(tx, inputs, state, unknown)
+
+    def to_base64(self) -> str:
+        return b64encode(self.serialize()).decode()
+
+    @classmethod
+    def from_base64(cls, data: str) -> 'PartiallySignedTransaction':
+        return cls.deserialize(b64decode(data))
+
+    def __eq__(self, other):
+        if not isinstance(other, PartiallySignedTransaction):
+            return NotImplemented
+        return self.serialize() == other.serialize()
+
+    def sign(self, wallet: BitcoinWallet, input_indexes: Optional[list]=None) -> int:
+        '''
+        Adds signatures of the given wallet to the inputs that can be spent with it.
+
+        Args:
+            wallet (BitcoinWallet): wallet used for signing
+            input_indexes (list): indexes of the inputs to sign (all inputs by default)
+
+        Returns:
+            int: number of signed inputs
+        '''
+        public_key = wallet.private_key.pub
+        public_key_hash = Hash160(public_key)
+        signed = 0
+        for index in (range(len(self.inputs)) if input_indexes is None else input_indexes):
+            psbt_input = self.inputs[index]
+            if psbt_input.is_finalized or public_key_hash not in list(psbt_input.script_code):
+                continue
+
+            sig_hash = script.SignatureHash(psbt_input.script_code, self.tx, index, script.SIGHASH_ALL)
+            signature = wallet.private_key.sign(sig_hash) + struct.pack('<B', script.SIGHASH_ALL)
+            psbt_input.partial_sigs[public_key] = signature
+            if not self.verify_input(index, public_key):
+                # the key is used in the other branch of the contract
+                del psbt_input.partial_sigs[public_key]
+                continue
+            signed += 1
+        return signed
+
+    def verify_input(self, index: int, public_key: bytes) -> bool:
+        psbt_input = self.inputs[index]
+        try:
+            VerifyScript(
+                psbt_input.get_script_sig(public_key),
+                psbt_input.utxo.parsed_script,
+                self.tx,
+                index,
+                (SCRIPT_VERIFY_P2SH,)
+            )
+        except ValidationError:
+            return False
+        return True
+
+    @classmethod
+    def combine(cls, *psbts) -> 'PartiallySignedTransaction':
+        '''
+        Merges signatures from many PSBTs of the same transaction (e.g. signed by different workers).
+
+        Raises:
+            ValueError: if PSBTs are built for different transactions
+        '''
+        if not psbts:
+            raise ValueError('At least one PSBT is required.')
+
+        combined = cls.deserialize(psbts[0].serialize())
+        tx_hash = combined.tx.GetTxid()
+        for psbt in psbts[1:]:
+            if psbt.tx.GetTxid() != tx_hash:
+                raise ValueError('Cannot combine PSBTs of different transactions.')
+            combined.state = combined.state or psbt.state
+            for combined_input, psbt_input in zip(combined.inputs, psbt.inputs):
+                combined_input.partial_sigs.update(psbt_input.partial_sigs)
+                if combined_input.final_script_sig is None:
+                    combined_input.final_script_sig = psbt_input.final_script_sig
+        return combined
+
+    @property
+    def is_finalized(self) -> bool:
+        return all(psbt_input.is_finalized for psbt_input in self.inputs)
+
+    def finalize(self):
+        '''
+        Builds final scriptSigs from the collected signatures.
+
+        Raises:
+            RuntimeError: if any of the inputs has no valid signature
+        '''
+        for index, psbt_input in enumerate(self.inputs):
+            if psbt_input.is_finalized:
+                continue
+            for public_key in psbt_input.partial_sigs:
+                if self.verify_input(index, public_key):
+                    psbt_input.final_script_sig = bytes(psbt_input.get_script_sig(public_key))
+                    psbt_input.partial_sigs = {}
+                    break
+            else:
+                raise RuntimeError(f'Input {index} has no valid signature.')
+
+    def to_transaction(self, network) -> BitcoinTransaction:
+        '''
+        Recreates transaction object (signed when all of the inputs are finalized).
+
+        Args:
+            network: network object
+
+        Returns:
+            BitcoinTransaction: transaction object of the same type as the exported one
+        '''
+        if not self.state:
+            raise ValueError('PSBT was not created by clove, transaction details are missing.')
+
+        tx = CMutableTransaction.from_tx(self.tx)
+        for tx_in, psbt_input in zip(tx.vin, self.inputs):
+            if psbt_input.is_finalized:
+                tx_in.scriptSig = script.CScript(psbt_input.final_script_sig)
+
+        solvable_utxo = [psbt_input.utxo for psbt_input in self.inputs]
+        transaction_class = TRANSACTION_TYPES[self.state['type']]
+        transaction = transaction_class.from_state(network, self.state, solvable_utxo, tx)
+        transaction.signed = self.is_finalized
+        return transaction
@@ -2,46 +2,100 @@ from datetime import datetime, timedelta, timezone
 import struct
 from typing import Optional
 
-from bitcoin.core import CMutableTransaction, CMutableTxOut, b2lx, b2x, script, x
+from bitcoin.core import CMutableTransaction, CMutableTxOut, Hash, b2lx, b2x, script, x
 from bitcoin.core.scripteval import SCRIPT_VERIFY_P2SH, VerifyScript
 from bitcoin.wallet import CBitcoinAddress
 
-from clove.constants import SIGNATURE_SIZE
+from clove.constants import INCREMENTAL_RELAY_FEE_PER_KB, MAX_SIGNATURE_SIZE, SEQUENCE_RBF, SIGNATURE_SIZE
+from clove.network.bitcoin.utxo import Utxo
 from clove.network.bitcoin.wallet import BitcoinWallet
-from clove.utils.bitcoin import auto_switch_params, to_base_units
+from clove.utils.bitcoin import auto_switch_params, from_base_units, to_base_units
 from clove.utils.hashing import generate_secret_with_hash
 
 
 class BitcoinTransaction(object):
-    '''Bitcoin transaction object.'''
+    '''
+    Bitcoin transaction object.
+
+    All amounts are kept in satoshis (`value_satoshi`, `utxo_value_satoshi`, `fee_satoshi`),
+    values in main units (`value`, `utxo_value`, `fee`) are computed from them.
+
+    Serialized transaction and its hash are cached, `clear_cache` has to be called after changing `tx` directly
+    (methods of this class are doing that on their own).
+
+    Transactions created with `rbf=True` signal replaceability (BIP 125), so their fee can be bumped
+    with `bump_fee` after publishing. Fee of any transaction with a change output can be also increased
+    by spending the change with a child transaction (`build_cpfp_transaction`).
+    '''
 
     @auto_switch_params(1)
-    def __init__(self, network, recipient_address: str, value: float, solvable_utxo: list, tx_locktime: int=0):
+    def __init__(
+        self,
+        network,
+        recipient_address: str,
+        value: Optional[float]=None,
+        solvable_utxo: Optional[list]=None,
+        tx_locktime: int=0,
+        value_satoshi: int=None,
+        rbf: bool=False,
+    ):
+        if (value is None) == (value_satoshi is None):
+            raise ValueError('Exactly one of value and value_satoshi has to be given.')
+        if solvable_utxo is None:
+            raise ValueError('Outputs to spend (solvable_utxo) are required.')
         self.recipient_address = recipient_address
-        self.value = value
+        self.value_satoshi = value_satoshi if value_satoshi is not None else to_base_units(value)
         self.network = network
         self.symbol = network.default_symbol
 
         self.validate_address()
 
         self.solvable_utxo = solvable_utxo
-        self.utxo_value = sum(utxo.value for utxo in self.solvable_utxo)
+        self.utxo_value_satoshi = sum(utxo.satoshis for utxo in self.solvable_utxo)
         self.tx_in_list = [utxo.tx_in for utxo in self.solvable_utxo]
         self.tx_out_list = []
 
+        self.rbf = rbf
+        if rbf:
+            for tx_in in self.tx_in_list:
+                tx_in.nSequence = SEQUENCE_RBF
+
         self.tx = None
         self.tx_locktime = tx_locktime
-        self.fee = 0.0
+        self.fee_satoshi = 0
         self.fee_per_kb = 0.0
         self.signed = False
 
+        self._serialized_transaction = None
+        self._transaction_hash = None
+
+    @property
+    def value(self) -> float:
+        return from_base_units(self.value_satoshi)
+
+    @value.setter
+    def value(self, value: float):
+        self.value_satoshi = to_base_units(value)
+
+    @property
+    def utxo_value(self) -> float:
+        return from_base_units(self.utxo_value_satoshi)
+
+    @property
+    def fee(self) -> float:
+        return from_base_units(self.fee_satoshi)
+
+    @fee.setter
+    def fee(self, fee: float):
+        self.fee_satoshi = to_base_units(fee)
+
     def validate_address(self):
         if not self.network.is_valid_address(self.recipient_address):
             raise ValueError('Given recipient address is invalid.')
 
     def build_outputs(self):
         self.tx_out_list = [
-            CMutableTxOut(to_base_units(self.value), CBitcoinAddress(self.recipient_address).to_scriptPubKey())
+            CMutableTxOut(self.value_satoshi, CBitcoinAddress(self.recipient_address).to_scriptPubKey())
         ]
 
     def add_fee_and_sign(self, default_wallet=None):
@@ -58,6 +112,7 @@ class BitcoinTransaction(object):
 
     def sign(self, default_wallet: BitcoinWallet =None):
         """Signing transaction using the wallet object."""
+        self.clear_cache()
 
         for tx_index, tx_in in enumerate(self.tx.vin):
             utxo = self.solvable_utxo[tx_index]
@@ -69,7 +124,7 @@ class BitcoinTransaction(object):
             tx_script = utxo.parsed_script
             if utxo.contract:
                 sig_hash = script.SignatureHash(
-                    script.CScript.fromhex(utxo.contract),
+                    utxo.parsed_contract,
                     self.tx,
                     tx_index,
                     script.SIGHASH_ALL
@@ -95,17 +150,36 @@ class BitcoinTransaction(object):
         self.signed = True
 
     def create_unsigned_transaction(self):
-        assert self.utxo_value >= self.value, 'You want to spend more than you\'ve got. Add more UTXO\'s.'
+        assert self.utxo_value_satoshi >= self.value_satoshi, \
+            'You want to spend more than you\'ve got. Add more UTXO\'s.'
         self.build_outputs()
         self.tx = CMutableTransaction(self.tx_in_list, self.tx_out_list, nLockTime=self.tx_locktime)
+        self.clear_cache()
 
     def publish(self):
-        return self.network.publish(self.raw_transaction)
+        fee = self.utxo_value_satoshi - sum(tx_out.nValue for tx_out in self.tx.vout)
+        return self.network.publish(self.tx, fee, self.serialized_transaction, self.transaction_hash)
+
+    def clear_cache(self):
+        self._serialized_transaction = None
+        self._transaction_hash = None
+
+    @property
+    def serialized_transaction(self) -> bytes:
+        if self._serialized_transaction is None:
+            self._serialized_transaction = self.tx.serialize()
+        return self._serialized_transaction
+
+    @property
+    def transaction_hash(self) -> bytes:
+        if self._transaction_hash is None:
+            self._transaction_hash = Hash(self.serialized_transaction)
+        return self._transaction_hash
 
     @property
     def size(self) -> int:
         """Returns the size of a transaction represented in bytes."""
-        return len(self.tx.serialize())
+        return len(self.serialized_transaction)
 
     def calculate_fee(self, add_sig_size=False):
         """Calculating fee for given transaction based on transaction size and estimated fee per kb."""
@@ -114,24 +188,135 @@ class BitcoinTransaction(object):
         size = self.size
         if add_sig_size:
             size += len(self.tx_in_list) * SIGNATURE_SIZE
-        self.fee = round((self.fee_per_kb / 1000) * size, 8)
+        self.fee_satoshi = to_base_units((self.fee_per_kb / 1000) * size)
 
     def add_fee(self):
         """Adding fee to the transaction by decreasing 'change' transaction."""
-        if not self.fee:
+        if not self.fee_satoshi:
             self.calculate_fee()
-        fee_in_satoshi = to_base_units(self.fee)
-        if self.tx.vout[0].nValue < fee_in_satoshi:
+        if self.tx.vout[0].nValue < self.fee_satoshi:
             raise RuntimeError('Cannot subtract fee from transaction. You need to add more input transactions.')
-        self.tx.vout[0].nValue -= fee_in_satoshi
+        self.tx.vout[0].nValue -= self.fee_satoshi
+        self.clear_cache()
+
+    @property
+    def fee_output_index(self) -> Optional[int]:
+        '''Index of the output from which the fee is subtracted (`None` if there is no such output).'''
+        return 0
+
+    @property
+    def change_output_index(self) -> Optional[int]:
+        '''Index of the output returning change to the sender (`None` if there is no change).'''
+        return None
+
+    def bump_fee(self, fee_per_kb: float, default_wallet: BitcoinWallet =None):
+        '''
+        Replaces the fee of the signed transaction with a higher one and signs it again (BIP 125).
+
+        The transaction is rebuilt from the same UTXO's, so the new version conflicts with the published one
+        and replaces it in the nodes mempools. Fee is always increased at least by the incremental relay fee.
+
+        Args:
+            fee_per_kb (float): new fee per kB in main units
+            default_wallet (BitcoinWallet): wallet used for UTXO's without wallet
+
+        Raises:
+            RuntimeError: if transaction is not signed or doesn't signal replaceability
+            ValueError: if the new fee per kB is not higher than the current one or there is no change output
+                to pay the fee from
+
+        Example:
+            >>> transaction = network.atomic_swap(sender, recipient, 0.01, utxo, rbf=True)
+            >>> transaction.add_fee_and_sign()
+            >>> transaction.publish()
+            >>> transaction.bump_fee(0.002)
+            >>> transaction.publish()
+        '''
+        if not self.rbf:
+            raise RuntimeError('Transaction does not signal replaceability. Use child pays for parent instead.')
+        if not self.signed:
+            raise RuntimeError('Only signed transactions can have their fee bumped.')
+        if fee_per_kb <= self.fee_per_kb:
+            raise ValueError('New fee per kB has to be higher than the current one.')
+
+        fee_output_index = self.fee_output_index
+        if fee_output_index is None or fee_output_index >= len(self.tx.vout):
+            raise ValueError('Transaction has no change output to pay the higher fee from.')
+        fee_output = self.tx.vout[fee_output_index]
+        previous_fee, previous_fee_per_kb = self.fee_satoshi, self.fee_per_kb
+
+        fee_output.nValue += previous_fee
+        self.clear_cache()
+        self.fee_per_kb = fee_per_kb
+        self.calculate_fee()
+        min_fee = previous_fee + INCREMENTAL_RELAY_FEE_PER_KB * self.size // 1000
+        self.fee_satoshi = max(self.fee_satoshi, min_fee)
+        try:
+            self.add_fee()
+        except RuntimeError:
+            fee_output.nValue -= previous_fee
+            self.fee_satoshi, self.fee_per_kb = previous_fee, previous_fee_per_kb
+            self.clear_cache()
+            raise
+        self.sign(default_wallet)
+
+    def build_cpfp_transaction(self, fee_per_kb: float, wallet: BitcoinWallet =None) -> 'BitcoinTransaction':
+        '''
+        Creates a child transaction spending the change output with a fee high enough to pay for both
+        transactions (child pays for parent).
+
+        Args:
+            fee_per_kb (float): expected fee per kB of the parent and child transactions together
+            wallet (BitcoinWallet): wallet of the change output owner
+
+        Returns:
+            BitcoinTransaction: signed child transaction sending the change back to the same address
+
+        Raises:
+            RuntimeError: if transaction is not signed, has no change output or change can't cover the fee
+        '''
+        if not self.signed:
+            raise RuntimeError('Only signed transactions can be accelerated.')
+        change_index = self.change_output_index
+        if change_index is None:
+            raise RuntimeError('Transaction has no change output to spend.')
+
+        change_output = self.tx.vout[change_index]
+        utxo = Utxo(
+            tx_id=self.address,
+            vout=change_index,
+            satoshis=change_output.nValue,
+            tx_script=b2x(change_output.scriptPubKey),
+            wallet=wallet,
+        )
+        child = BitcoinTransaction(
+            self.network,
+            str(CBitcoinAddress.from_scriptPubKey(change_output.scriptPubKey)),
+            solvable_utxo=[utxo],
+            value_satoshi=change_output.nValue,
+            rbf=self.rbf,
+        )
+        child.create_unsigned_transaction()
+        child.fee_per_kb = fee_per_kb
+        child.sign(wallet)
+
+        # child fee covers the missing part of the fee for both transactions, but not less than its own fee;
+        # signature can get longer after signing again, so the biggest one is reserved
+        child.calculate_fee()
+        child_size = child.size + sum(MAX_SIGNATURE_SIZE - len(list(tx_in.scriptSig)[0]) for tx_in in child.tx.vin)
+        package_fee = to_base_units((fee_per_kb / 1000) * (self.size + child_size))
+        child.fee_satoshi = max(child.fee_satoshi, package_fee - self.fee_satoshi)
+        child.add_fee()
+        child.sign(wallet)
+        return child
 
     @property
     def raw_transaction(self):
-        return b2x(self.tx.serialize())
+        return b2x(self.serialized_transaction)
 
     @property
     def address(self):
-        return b2lx(self.tx.GetHash())
+        return b2lx(self.transaction_hash)
 
     def show_details(self):
         details = {
@@ -157,9 +342,90 @@ class BitcoinTransaction(object):
             return
         return self.network.get_transaction_url(self.address)
 
+    def get_state(self) -> dict:
+        '''Returns JSON serializable details needed to recreate the transaction object (see `from_state`).'''
+        return {
+            'type': type(self).__name__,
+            'recipient_address': self.recipient_address,
+            'value_satoshi': self.value_satoshi,
+            'fee_satoshi': self.fee_satoshi,
+            'fee_per_kb': self.fee_per_kb,
+            'tx_locktime': self.tx_locktime,
+            'rbf': self.rbf,
+        }
+
+    @classmethod
+    def from_state(cls, network, state: dict, solvable_utxo: list, tx: CMutableTransaction) -> 'BitcoinTransaction':
+        '''Recreates transaction object from the `get_state` result and already built transaction.'''
+        transaction = cls(
+            network,
+            state['recipient_address'],
+            solvable_utxo=solvable_utxo,
+            tx_locktime=state['tx_locktime'],
+            value_satoshi=state['value_satoshi'],
+            rbf=state['rbf'],
+        )
+        transaction.restore_state(state, tx)
+        return transaction
+
+    def restore_state(self, state: dict, tx: CMutableTransaction):
+        self.tx = tx
+        self.tx_in_list = tx.vin
+        self.tx_out_list = tx.vout
+        self.clear_cache()
+        self.fee_satoshi = state['fee_satoshi']
+        self.fee_per_kb = state['fee_per_kb']
+
+    def to_psbt(self, previous_transactions: Optional[dict]=None):
+        '''
+        Exports the unsigned transaction to the Partially Signed Bitcoin Transaction (BIP 174).
+
+        Signatures already added to the transaction are not exported,
+        the PSBT has to be signed with `PartiallySignedTransaction.sign`.
+
+        Args:
+            previous_transactions (dict): transactions with the spent outputs (CTransaction, serialized transaction
+                or its hex) by their hashes, transactions which are not given are fetched from the block explorer
+
+        Returns:
+            PartiallySignedTransaction: PSBT object
+
+        Example:
+            >>> psbt = transaction.to_psbt()
+            >>> psbt.to_base64()
+            'cHNidP8BAHUBAAAAAbiK4tsFOOokcLm4+c+A28XenpDxvutw3myXGovYZs1u...'
+        '''
+        from clove.network.bitcoin.psbt import PartiallySignedTransaction
+        return PartiallySignedTransaction.from_transaction(self, previous_transactions)
+
+    @staticmethod
+    def from_psbt(network, psbt) -> 'BitcoinTransaction':
+        '''
+        Creates transaction object from the PSBT.
+
+        Args:
+            network: network object
+            psbt (PartiallySignedTransaction, str, bytes): PSBT object, base64 string or serialized bytes
+
+        Returns:
+            BitcoinTransaction: transaction object (signed if all of the PSBT inputs were finalized)
+        '''
+        from clove.network.bitcoin.psbt import PartiallySignedTransaction
+        if isinstance(psbt, bytes):
+            psbt = PartiallySignedTransaction.deserialize(psbt)
+        elif isinstance(psbt, str):
+            psbt = PartiallySignedTransaction.from_base64(psbt)
+        return psbt.to_transaction(network)
+
 
 class BitcoinAtomicSwapTransaction(BitcoinTransaction):
-    '''Bitcoin atomic swap object.'''
+    '''
+    Bitcoin atomic swap object.
+
+    With `presign_refund=True` a signed refund transaction (locked until the contract expiration) is created
+    together with the signed contract transaction. It can be stored and published with `publish_refund`
+    without auditing the contract again.
+    '''
     init_hours = 48
     participate_hours = 24
 
@@ -168,17 +434,22 @@ class BitcoinAtomicSwapTransaction(BitcoinTransaction):
         network,
         sender_address: str,
         recipient_address: str,
-        value: float,
-        solvable_utxo: list,
+        value: Optional[float]=None,
+        solvable_utxo: Optional[list]=None,
         secret_hash: str=None,
-        tx_locktime: int=0
+        tx_locktime: int=0,
+        value_satoshi: int=None,
+        rbf: bool=False,
+        presign_refund: bool=False,
     ):
         self.sender_address = sender_address
-        super().__init__(network, recipient_address, value, solvable_utxo, tx_locktime)
+        super().__init__(network, recipient_address, value, solvable_utxo, tx_locktime, value_satoshi, rbf)
         self.secret = None
         self.secret_hash = x(secret_hash) if secret_hash else None
         self.locktime = None
         self.contract = None
+        self.presign_refund = presign_refund
+        self.refund_transaction = None
 
     def validate_address(self):
         invalid_recipient = not self.network.is_valid_address(self.recipient_address)
@@ -200,7 +471,7 @@ class BitcoinAtomicSwapTransaction(BitcoinTransaction):
             script.OP_HASH160,
             CBitcoinAddress(self.recipient_address),
             script.OP_ELSE,
-            int(self.locktime.replace(tzinfo=timezone.utc).timestamp()),
+            self.locktime_timestamp,
             script.OP_CHECKLOCKTIMEVERIFY,
             script.OP_DROP,
             script.OP_DUP,
@@ -211,38 +482,125 @@ class BitcoinAtomicSwapTransaction(BitcoinTransaction):
             script.OP_CHECKSIG,
         ])
 
+    @property
+    def locktime_timestamp(self) -> int:
+        return int(self.locktime.replace(tzinfo=timezone.utc).timestamp())
+
     def set_locktime(self, number_of_hours):
         self.locktime = datetime.utcnow() + timedelta(hours=number_of_hours)
 
     def generate_hash(self):
         self.secret, self.secret_hash = generate_secret_with_hash()
 
-    def build_outputs(self):
+    def build_contract(self):
+        """Generating secret (for the initial transaction), setting locktime and building the contract script."""
         if not self.secret_hash:
             self.generate_hash()
-            self.set_locktime(number_of_hours=self.init_hours)
+            number_of_hours = self.init_hours
         else:
-            self.set_locktime(number_of_hours=self.participate_hours)
+            number_of_hours = self.participate_hours
+
+        if not self.locktime:
+            self.set_locktime(number_of_hours=number_of_hours)
 
         self.build_atomic_swap_contract()
 
-        contract_p2sh = self.contract.to_p2sh_scriptPubKey()
+    def build_contract_output(self) -> CMutableTxOut:
+        return CMutableTxOut(self.value_satoshi, self.contract.to_p2sh_scriptPubKey())
+
+    def build_outputs(self):
+        self.build_contract()
 
-        self.tx_out_list = [CMutableTxOut(to_base_units(self.value), contract_p2sh), ]
-        if self.utxo_value > self.value:
-            change = self.utxo_value - self.value
+        self.tx_out_list = [self.build_contract_output(), ]
+        if self.utxo_value_satoshi > self.value_satoshi:
+            change = self.utxo_value_satoshi - self.value_satoshi
             self.tx_out_list.append(
-                CMutableTxOut(to_base_units(change), CBitcoinAddress(self.sender_address).to_scriptPubKey())
+                CMutableTxOut(change, CBitcoinAddress(self.sender_address).to_scriptPubKey())
             )
 
     def add_fee(self):
         """Adding fee to the transaction by decreasing 'change' transaction."""
-        if not self.fee:
+        if not self.fee_satoshi:
             self.calculate_fee()
-        fee_in_satoshi = to_base_units(self.fee)
-        if len(self.tx.vout) == 1 or self.tx.vout[1].nValue < fee_in_satoshi:
+        if len(self.tx.vout) == 1 or self.tx.vout[1].nValue < self.fee_satoshi:
             raise RuntimeError('Cannot subtract fee from change transaction. You need to add more input transactions.')
-        self.tx.vout[1].nValue -= fee_in_satoshi
+        self.tx.vout[1].nValue -= self.fee_satoshi
+        self.clear_cache()
+
+    def add_fee_and_sign(self, default_wallet=None):
+        super().add_fee_and_sign(default_wallet)
+        if self.presign_refund:
+            self.build_refund_transaction(default_wallet)
+
+    def bump_fee(self, fee_per_kb: float, default_wallet: BitcoinWallet =None):
+        super().bump_fee(fee_per_kb, default_wallet)
+        # replacement has a different hash, so the old refund transaction is spending a non-existing output
+        if self.refund_transaction is not None:
+            self.build_refund_transaction(default_wallet, self.refund_transaction.fee_per_kb)
+
+    def build_refund_transaction(self, wallet: BitcoinWallet =None, fee_per_kb: float=None) -> BitcoinTransaction:
+        '''
+        Creates signed transaction refunding the contract, which can be published after the contract expiration.
+
+        Args:
+            wallet (BitcoinWallet): sender wallet (wallet of the first UTXO is used by default)
+            fee_per_kb (float): fee per kB of the refund transaction (the contract transaction rate by default)
+
+        Returns:
+            BitcoinTransaction: signed refund transaction (also stored in `refund_transaction` attribute)
+
+        Raises:
+            RuntimeError: if the contract transaction is not signed yet
+        '''
+        if not self.signed:
+            raise RuntimeError('Contract transaction has to be signed before creating the refund transaction.')
+
+        wallet = wallet or next((utxo.wallet for utxo in self.solvable_utxo if utxo.wallet), None)
+        contract_output = self.tx.vout[0]
+        utxo = Utxo(
+            tx_id=self.address,
+            vout=0,
+            satoshis=contract_output.nValue,
+            tx_script=b2x(contract_output.scriptPubKey),
+            wallet=wallet,
+            refund=True,
+            contract=self.contract.hex(),
+        )
+        refund_transaction = BitcoinTransaction(
+            self.network,
+            self.sender_address,
+            solvable_utxo=[utxo],
+            tx_locktime=self.locktime_timestamp,
+            value_satoshi=contract_output.nValue,
+            rbf=self.rbf,
+        )
+        refund_transaction.create_unsigned_transaction()
+        refund_transaction.fee_per_kb = fee_per_kb or self.fee_per_kb
+        refund_transaction.add_fee_and_sign()
+        self.refund_transaction = refund_transaction
+        return refund_transaction
+
+    def publish_refund(self):
+        '''
+        Publishes the pre-signed refund transaction.
+
+        Raises:
+            RuntimeError: if the refund transaction wasn't created or the contract is still valid
+        '''
+        if self.refund_transaction is None:
+            raise RuntimeError('Refund transaction was not created.')
+        if self.locktime > datetime.utcnow():
+            locktime_string = self.locktime.strftime('%Y-%m-%d %H:%M:%S')
+            raise RuntimeError(f"This contract is still valid! It can't be refunded until {locktime_string} UTC.")
+        return self.refund_transaction.publish()
+
+    @property
+    def fee_output_index(self) -> Optional[int]:
+        return self.change_output_index
+
+    @property
+    def change_output_index(self) -> Optional[int]:
+        return 1 if len(self.tx.vout) > 1 else None
 
     def show_details(self):
         details = {
@@ -266,4 +624,198 @@ class BitcoinAtomicSwapTransaction(BitcoinTransaction):
         }
         if self.signed:
             details['transaction_link'] = self.network.get_transaction_url(self.address)
+        if self.refund_transaction is not None:
+            details['refund_transaction'] = self.refund_transaction.raw_transaction
+            details['refund_transaction_address'] = self.refund_transaction.address
         return details
+
+    def get_state(self) -> dict:
+        '''Returns transaction details without the secret, it's never exported with the transaction.'''
+        state = super().get_state()
+        state.update({
+            'sender_address': self.sender_address,
+            'secret_hash': self.secret_hash.hex(),
+            'locktime': self.locktime.replace(tzinfo=timezone.utc).timestamp(),
+            'contract': self.contract.hex(),
+        })
+        return state
+
+    @classmethod
+    def from_state(cls, network, state: dict, solvable_utxo: list, tx: CMutableTransaction) -> 'BitcoinTransaction':
+        transaction = cls(
+            network,
+            state['sender_address'],
+            state['recipient_address'],
+            solvable_utxo=solvable_utxo,
+            secret_hash=state['secret_hash'],
+            tx_locktime=state['tx_locktime'],
+            value_satoshi=state['value_satoshi'],
+            rbf=state['rbf'],
+        )
+        transaction.locktime = datetime.utcfromtimestamp(state['locktime'])
+        transaction.contract = script.CScript(x(state['contract']))
+        transaction.restore_state(state, tx)
+        return transaction
+
+
+class BitcoinAtomicSwapBatchTransaction(BitcoinTransaction):
+    '''Bitcoin transaction funding many atomic swap contracts at once.
+
+    Every leg of the batch gets its own contract output, the change goes back to the sender in the last output.
+    '''
+
+    def __init__(
+        self,
+        network,
+        sender_address: str,
+        legs: list,
+        solvable_utxo: list,
+        tx_locktime: int=0,
+        rbf: bool=False,
+    ):
+        '''
+        Args:
+            network: network object
+            sender_address (str): address of the sender (also used as a refund and change address)
+            legs (list): list of dictionaries with `recipient_address` and `value` keys and optional `secret_hash`
+                and `locktime` (datetime in UTC) keys
+            solvable_utxo (list): list of UTXO objects used to fund all of the contracts
+            tx_locktime (int): transaction locktime
+            rbf (bool): signal replaceability of the transaction (BIP 125)
+        '''
+        if not legs:
+            raise ValueError('At least one atomic swap leg is required.')
+
+        self.sender_address = sender_address
+        self.legs = [self.build_leg(network, sender_address, leg) for leg in legs]
+        super().__init__(
+            network,
+            None,
+            solvable_utxo=solvable_utxo,
+            tx_locktime=tx_locktime,
+            value_satoshi=sum(leg.value_satoshi for leg in self.legs),
+            rbf=rbf,
+        )
+
+    @staticmethod
+    def build_leg(network, sender_address: str, leg: dict) -> BitcoinAtomicSwapTransaction:
+        '''Creates atomic swap object holding contract details of the single leg.'''
+        try:
+            swap = BitcoinAtomicSwapTransaction(
+                network,
+                sender_address,
+                leg['recipient_address'],
+                leg['value'],
+                solvable_utxo=[],
+                secret_hash=leg.get('secret_hash'),
+            )
+        except KeyError as e:
+            raise ValueError(f'Atomic swap leg is missing {e} key.')
+        swap.locktime = leg.get('locktime')
+        return swap
+
+    def validate_address(self):
+        if not self.network.is_valid_address(self.sender_address):
+            raise ValueError('Given sender address is invalid.')
+
+    def build_outputs(self):
+        self.tx_out_list = []
+        for leg in self.legs:
+            leg.build_contract()
+            self.tx_out_list.append(leg.build_contract_output())
+
+        # outputs with the same script can't be told apart when the contract is audited
+        if len({tx_out.scriptPubKey for tx_out in self.tx_out_list}) < len(self.tx_out_list):
+            raise ValueError('Atomic swap legs have to differ in recipient address, secret hash or locktime.')
+
+        if self.utxo_value_satoshi > self.value_satoshi:
+            change = self.utxo_value_satoshi - self.value_satoshi
+            self.tx_out_list.append(
+                CMutableTxOut(change, CBitcoinAddress(self.sender_address).to_scriptPubKey())
+            )
+
+    def add_fee(self):
+        """Adding fee to the transaction by decreasing 'change' transaction."""
+        if not self.fee_satoshi:
+            self.calculate_fee()
+        if len(self.tx.vout) == len(self.legs) or self.tx.vout[-1].nValue < self.fee_satoshi:
+            raise RuntimeError('Cannot subtract fee from change transaction. You need to add more input transactions.')
+        self.tx.vout[-1].nValue -= self.fee_satoshi
+        self.clear_cache()
+
+    @property
+    def fee_output_index(self) -> Optional[int]:
+        return self.change_output_index
+
+    @property
+    def change_output_index(self) -> Optional[int]:
+        return len(self.tx.vout) - 1 if len(self.tx.vout) > len(self.legs) else None
+
+    def get_contracts_details(self) -> list:
+        '''Returns details of every contract in the same format as `BitcoinAtomicSwapTransaction.show_details`.'''
+        raw_transaction = self.raw_transaction
+        transaction_address = self.address
+        contracts = []
+        for index, leg in enumerate(self.legs):
+            details = {
+                'contract': leg.contract.hex(),
+                'contract_address': str(CBitcoinAddress.from_scriptPubKey(leg.contract.to_p2sh_scriptPubKey())),
+                'contract_transaction': raw_transaction,
+                'contract_vout': index,
+                'transaction_address': transaction_address,
+                'locktime': leg.locktime,
+                'recipient_address': leg.recipient_address,
+                'refund_address': self.sender_address,
+                'secret': leg.secret.hex() if leg.secret else '',
+                'secret_hash': leg.secret_hash.hex(),
+                'value': leg.value,
+                'value_text': f'{leg.value:.8f} {self.symbol}',
+            }
+            if self.signed:
+                details['transaction_link'] = self.network.get_transaction_url(transaction_address)
+            contracts.append(details)
+        return contracts
+
+    def show_details(self):
+        details = {
+            'contracts': self.get_contracts_details(),
+            'contract_transaction': self.raw_transaction,
+            'transaction_address': self.address,
+            'fee': self.fee,
+            'fee_per_kb': self.fee_per_kb,
+            'fee_per_kb_text': f'{self.fee_per_kb:.8f} {self.symbol} / 1 kB',
+            'fee_text': f'{self.fee:.8f} {self.symbol}',
+            'refund_address': self.sender_address,
+            'size': self.size,
+            'size_text': f'{self.size} bytes',
+            'value': self.value,
+            'value_text': f'{self.value:.8f} {self.symbol}',
+        }
+        if self.signed:
+            details['transaction_link'] = self.network.get_transaction_url(self.address)
+        return details
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state.update({
+            'sender_address': self.sender_address,
+            'legs': [
+                {
+                    'recipient_address': leg.recipient_address,
+                    'value': leg.value,
+                    'secret_hash': leg.secret_hash.hex(),
+                    'locktime': leg.locktime.replace(tzinfo=timezone.utc).timestamp(),
+                    'contract': leg.contract.hex(),
+                } for leg in self.legs
+            ],
+        })
+        return state
+
+    @classmethod
+    def from_state(cls, network, state: dict, solvable_utxo: list, tx: CMutableTransaction) -> 'BitcoinTransaction':
+        legs = [dict(leg, locktime=datetime.utcfromtimestamp(leg['locktime'])) for leg in state['legs']]
+        transaction = cls(network, state['sender_address'], legs, solvable_utxo, state['tx_locktime'], state['rbf'])
+        for leg, leg_state in zip(transaction.legs, state['legs']):
+            leg.contract = script.CScript(x(leg_state['contract']))
+        transaction.restore_state(state, tx)
+        return transaction
@@ -1,38 +1,132 @@
+from array import array
+import heapq
+from typing import Optional
+
 from bitcoin.core import CMutableTxIn, COutPoint, lx, script, x
 
+from clove.constants import SEQUENCE_NO_RBF
+from clove.utils.bitcoin import from_base_units, to_base_units
+
 
 class Utxo(object):
+    '''
+    Unspent transaction output.
+
+    Output value is kept in satoshis (`satoshis`), `value` in main units is available for convenience.
+    Exactly one of them has to be given.
+    Script objects derived from the UTXO fields are built on the first access and cached until
+    the fields they depend on are changed.
+
+    Raises:
+        ValueError: if neither or both of `value` and `satoshis` are given or the output script is missing
+    '''
+
+    __slots__ = (
+        'tx_id', 'vout', 'satoshis', 'tx_script', 'wallet', 'secret', 'refund', 'contract', 'sequence',
+        '_outpoint', '_parsed_script', '_parsed_contract', '_unsigned_script_sig',
+    )
 
-    def __init__(self, tx_id, vout, value, tx_script, wallet=None, secret=None, refund=False, contract=None):
+    cached_fields = {
+        'tx_id': ('_outpoint', ),
+        'vout': ('_outpoint', ),
+        'tx_script': ('_parsed_script', ),
+        'contract': ('_parsed_contract', '_unsigned_script_sig'),
+        'secret': ('_unsigned_script_sig', ),
+        'refund': ('_unsigned_script_sig', ),
+    }
+    '''Mapping of the UTXO fields to the cached values built from them.'''
+
+    def __init__(
+        self,
+        tx_id,
+        vout,
+        value: Optional[float]=None,
+        tx_script=None,
+        wallet=None,
+        secret=None,
+        refund=False,
+        contract=None,
+        satoshis: Optional[int]=None,
+        sequence=SEQUENCE_NO_RBF,
+    ):
+        if (value is None) == (satoshis is None):
+            raise ValueError('Exactly one of value and satoshis has to be given.')
+        if tx_script is None:
+            raise ValueError('Output script is required.')
         self.tx_id = tx_id
         self.vout = vout
-        self.value = value
+        self.satoshis = satoshis if satoshis is not None else to_base_units(value)
         self.tx_script = tx_script
         self.wallet = wallet
         self.secret = secret
         self.refund = refund
         self.contract = contract
+        self.sequence = sequence
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        for cached_field in self.cached_fields.get(name, ()):
+            object.__setattr__(self, cached_field, None)
 
     @property
-    def outpoint(self):
-        return COutPoint(lx(self.tx_id), self.vout)
+    def value(self) -> float:
+        return from_base_units(self.satoshis)
+
+    @value.setter
+    def value(self, value: float):
+        self.satoshis = to_base_units(value)
 
     @property
-    def tx_in(self):
-        return CMutableTxIn(self.outpoint, scriptSig=script.CScript(self.unsigned_script_sig), nSequence=0)
+    def outpoint(self) -> COutPoint:
+        if self._outpoint is None:
+            self._outpoint = COutPoint(lx(self.tx_id), self.vout)
+        return self._outpoint
 
     @property
-    def parsed_script(self):
-        return script.CScript.fromhex(self.tx_script)
+    def tx_in(self) -> CMutableTxIn:
+        # transaction input is mutable (it's signed in place), so it cannot be cached
+        return CMutableTxIn(
+            self.outpoint,
+            scriptSig=script.CScript(self.unsigned_script_sig),
+            nSequence=self.sequence,
+        )
 
     @property
-    def unsigned_script_sig(self):
-        if self.contract:
-            if self.refund:
-                return [script.OP_FALSE, x(self.contract)]
-            elif self.secret:
-                return [x(self.secret), script.OP_TRUE, x(self.contract)]
-        return []
+    def parsed_script(self) -> script.CScript:
+        if self._parsed_script is None:
+            self._parsed_script = script.CScript.fromhex(self.tx_script)
+        return self._parsed_script
+
+    @property
+    def parsed_contract(self) -> Optional[script.CScript]:
+        if self._parsed_contract is None and self.contract:
+            self._parsed_contract = script.CScript.fromhex(self.contract)
+        return self._parsed_contract
+
+    @property
+    def unsigned_script_sig(self) -> list:
+        if self._unsigned_script_sig is None:
+            script_sig = ()
+            if self.contract:
+                if self.refund:
+                    script_sig = (script.OP_FALSE, x(self.contract))
+                elif self.secret:
+                    script_sig = (x(self.secret), script.OP_TRUE, x(self.contract))
+            self._unsigned_script_sig = script_sig
+        return list(self._unsigned_script_sig)
+
+    def get_fields(self) -> tuple:
+        '''Returns values of the UTXO fields (without the cached values).'''
+        return tuple(getattr(self, field) for field in self.__slots__ if field[0] != '_')
+
+    def __eq__(self, other):
+        if not isinstance(other, Utxo):
+            return NotImplemented
+        return self.get_fields() == other.get_fields()
+
+    def __hash__(self):
+        # only the outpoint is hashed, other fields can be changed while the object is kept in a set
+        return hash((self.tx_id, self.vout))
 
     def __repr__(self):
         return "Utxo(tx_id='{}', vout='{}', value='{}', tx_script='{}', wallet={}, secret={}, refund={})".format(
@@ -44,3 +138,92 @@ class Utxo(object):
             str(self.secret),
             self.refund,
         )
+
+
+class UtxoSet(object):
+    '''
+    Columnar storage for a large number of unspent outputs.
+
+    Values (in satoshis), output indexes and transaction hashes are kept in flat arrays, `Utxo` objects
+    are created only for the outputs returned from `select` (or when accessed directly).
+    Scripts are deduplicated, because most of the outputs of a wallet are paying to the same script.
+    '''
+
+    def __init__(self):
+        self.values = array('q')
+        '''Output values in satoshis.'''
+        self.vouts = array('L')
+        self.tx_ids = bytearray()
+        '''Transaction hashes, 32 bytes per output.'''
+        self.script_indexes = array('L')
+        self.scripts = []
+        self.script_positions = {}
+
+    def add(self, tx_id: str, vout: int, value: int, tx_script: str):
+        '''
+        Adds unspent output to the set.
+
+        Args:
+            tx_id (str): transaction hash
+            vout (int): output index
+            value (int): output value in satoshis
+            tx_script (str): output script (hex)
+        '''
+        script_position = self.script_positions.get(tx_script)
+        if script_position is None:
+            script_position = self.script_positions[tx_script] = len(self.scripts)
+            self.scripts.append(tx_script)
+
+        self.values.append(value)
+        self.vouts.append(vout)
+        self.tx_ids += bytes.fromhex(tx_id)
+        self.script_indexes.append(script_position)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get(index)
+
+    @property
+    def total(self) -> int:
+        '''Sum of all output values in satoshis.'''
+        return sum(self.values)
+
+    def get(self, index: int, wallet=None) -> Utxo:
+        '''Returns `Utxo` object for the output under given index.'''
+        return Utxo(
+            tx_id=self.tx_ids[index * 32:(index + 1) * 32].hex(),
+            vout=self.vouts[index],
+            satoshis=self.values[index],
+            tx_script=self.scripts[self.script_indexes[index]],
+            wallet=wallet,
+        )
+
+    def select(self, amount: int, wallet=None) -> Optional[list]:
+        '''
+        Selects the biggest outputs until their sum exceeds the given amount.
+
+        Args:
+            amount (int): amount in satoshis
+            wallet (BitcoinWallet): wallet attached to the selected UTXO objects
+
+        Returns:
+            list, None: list of `Utxo` objects or `None` if there are not enough funds in the set
+        '''
+        values = self.values
+        if sum(values) <= amount:
+            return None
+
+        # usually a few of the biggest outputs are enough, so only the top of the set is ordered
+        # (the bound is doubled until the selected outputs cover the amount)
+        count = 1
+        while True:
+            selected = heapq.nlargest(count, range(len(values)), key=values.__getitem__)
+            total = 0
+            for position, index in enumerate(selected):
+                total += values[index]
+                if total > amount:
+                    return [self.get(selected_index, wallet) for selected_index in selected[:position + 1]]
+            count *= 2
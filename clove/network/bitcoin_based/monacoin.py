@@ -3,8 +3,8 @@ from typing import Optional
 from bitcoin.wallet import CBitcoinSecretError
 
 from clove.network.bitcoin.base import BitcoinBaseNetwork
-from clove.network.bitcoin.utxo import Utxo
-from clove.utils.bitcoin import auto_switch_params, from_base_units
+from clove.network.bitcoin.utxo import UtxoSet
+from clove.utils.bitcoin import auto_switch_params, from_base_units, to_base_units
 from clove.utils.external_source import clove_req_json
 from clove.utils.logging import logger
 
@@ -41,8 +41,7 @@ class Monacoin(BitcoinBaseNetwork):
                 cls.alternative_secret_key, cls.base58_prefixes['SECRET_KEY']
             return super().get_wallet(*args, **kwargs)
 
-    @property
-    def latest_block(self):
+    def get_latest_block(self):
         return clove_req_json('https://mona.chainseeker.info/api/v1/status')['blocks']
 
     @staticmethod
@@ -52,35 +51,43 @@ class Monacoin(BitcoinBaseNetwork):
     @classmethod
     def get_utxo(cls, address, amount):
         data = clove_req_json(f'https://mona.chainseeker.info/api/v1/utxos/{address}')
-        unspent = sorted(data, key=lambda k: k['value'], reverse=True)
-
-        utxo = []
-        total = 0
-
-        for output in unspent:
-            value = from_base_units(output['value'])
-            utxo.append(
-                Utxo(
-                    tx_id=output['txid'],
-                    vout=output['vout'],
-                    value=value,
-                    tx_script=output['scriptPubKey']['hex'],
-                )
+        utxo_set = UtxoSet()
+        for output in data:
+            utxo_set.add(output['txid'], output['vout'], output['value'], output['scriptPubKey']['hex'])
+
+        utxo = utxo_set.select(to_base_units(amount))
+        if utxo is None:
+            logger.debug(
+                f'Cannot find enough UTXO\'s. Found %.8f from %.8f.', from_base_units(utxo_set.total), amount
             )
-            total += value
-            if total > amount:
-                return utxo
-
-        logger.debug(f'Cannot find enough UTXO\'s. Found %.8f from %.8f.', total, amount)
+        return utxo
 
     @classmethod
-    def extract_secret_from_redeem_transaction(cls, contract_address: str) -> Optional[str]:
+    def get_spending_script_sig(
+        cls,
+        contract_address: str,
+        transaction_address: Optional[str]=None,
+        vout: Optional[int]=None,
+    ) -> Optional[str]:
         contract_transactions = clove_req_json(f'https://mona.chainseeker.info/api/v1/txids/{contract_address}')
+        if contract_transactions is None:
+            raise ValueError('Unexpected response from chainseeker')
         if len(contract_transactions) < 2:
             logger.debug('There is no redeem transaction on this contract yet.')
             return
         redeem_transaction = cls.get_transaction(contract_transactions[1])
-        return cls.extract_secret(redeem_transaction['hex'])
+        if not redeem_transaction or not redeem_transaction.get('vin'):
+            raise ValueError('Unexpected response from chainseeker')
+        for tx_in in redeem_transaction['vin']:
+            if transaction_address is None or (tx_in['txid'], tx_in['vout']) == (transaction_address, vout):
+                return tx_in['scriptSig']['hex']
+
+    @classmethod
+    def extract_secret_from_redeem_transaction(cls, contract_address: str, *args, **kwargs) -> Optional[str]:
+        scriptsig = cls.get_spending_script_sig(contract_address, *args, **kwargs)
+        if scriptsig is None:
+            return
+        return cls.extract_secret(scriptsig=scriptsig)
 
     @staticmethod
     def get_balance(wallet_address: str) -> float:
@@ -109,8 +116,7 @@ class MonacoinTestNet(Monacoin):
     }
     testnet = True
 
-    @property
-    def latest_block(self):
+    def get_latest_block(self):
         raise NotImplementedError
 
     @staticmethod
@@ -122,7 +128,11 @@ class MonacoinTestNet(Monacoin):
         raise NotImplementedError
 
     @classmethod
-    def extract_secret_from_redeem_transaction(cls, contract_address: str) -> Optional[str]:
+    def get_spending_script_sig(cls, contract_address: str, *args, **kwargs) -> Optional[str]:
+        raise NotImplementedError
+
+    @classmethod
+    def extract_secret_from_redeem_transaction(cls, contract_address: str, *args, **kwargs) -> Optional[str]:
         raise NotImplementedError
 
     @staticmethod
@@ -17,6 +17,7 @@ class Ethereum(EthereumBaseNetwork):
     blockexplorer_tx = 'https://etherscan.io/tx/{0}'
 
     contract_address = '0x0ff1C3dD4b262a0324910A6E30CaA182204d9163'
+    multicall_address = '0xeefBa1e63905eF1D7ACbA5a8513c70307C1f4441'
 
     @property
     def web3_provider_address(self) -> str:
@@ -53,3 +54,4 @@ class EthereumTestnet(Ethereum):
     blockexplorer_tx = 'https://kovan.etherscan.io/tx/{0}'
 
     contract_address = '0xce07aB9477BC20790B88B398A2A9e0F626c7D263'
+    multicall_address = '0x2cc8688C5f75E365aaEEb4ea8D6a480405A48D2A'
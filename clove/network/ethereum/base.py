@@ -1,25 +1,40 @@
+from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
+import os
+import threading
 from typing import Optional, Union
 
 from eth_abi import decode_abi, encode_single
 from ethereum.transactions import Transaction
 import rlp
 from rlp import RLPException
-from web3 import HTTPProvider, Web3
-from web3.contract import ConciseContract
-from web3.exceptions import BadFunctionCallOutput
+from web3 import Web3
 from web3.utils.abi import get_abi_input_types
 from web3.utils.contracts import find_matching_fn_abi
 from web3.utils.datastructures import AttributeDict
 
-from clove.constants import ERC20_BASIC_ABI, ETH_FILTER_MAX_ATTEMPTS, ETHEREUM_CONTRACT_ABI
+from clove.constants import (
+    ETH_FILTER_MAX_ATTEMPTS,
+    ETHEREUM_CONTRACT_ABI,
+    SWAP_CLOSED,
+    SWAP_OPEN,
+    SWAP_REFUNDABLE,
+    SWAP_STATE_OUTPUT_TYPES,
+)
 from clove.exceptions import ImpossibleDeserialization, UnsupportedTransactionType
 from clove.network.base import BaseNetwork
 from clove.network.ethereum.contract import EthereumContract
+from clove.network.ethereum.indexer import EventIndexer, EventStore
+from clove.network.ethereum.multicall import Multicall
+from clove.network.ethereum.nonce import NonceManager
+from clove.network.ethereum.provider import FILTERING, BatchingHTTPProvider, MultiEndpointProvider
 from clove.network.ethereum.token import EthToken
+from clove.network.ethereum.token_registry import TokenCache, TokenRegistry
 from clove.network.ethereum.transaction import EthereumAtomicSwapTransaction, EthereumTokenApprovalTransaction
 from clove.network.ethereum.wallet import EthereumWallet
 from clove.network.ethereum_based import Token
+from clove.utils.height import HeightOracle
 from clove.utils.logging import logger
 
 
@@ -32,22 +47,94 @@ class EthereumBaseNetwork(BaseNetwork):
     web3_provider_address = None
     ethereum_based = True
     contract_address = None
+    multicall_address = None
+    '''Address of the Multicall contract (calls are sent in JSON-RPC batches on networks without it).'''
     tokens = []
     blockexplorer_tx = None
     filtering_supported = False
+    nonce_managers = {}
+    '''Nonce managers shared by all of the objects of the network (by network name).'''
+    web3_instances = {}
+    '''Web3 objects shared by all of the networks (by provider address or endpoints).'''
+    web3_instances_lock = threading.Lock()
+    token_registries = {}
+    '''Token registries of the networks (by network name), built on the first lookup.'''
+    token_cache = None
+    '''Persistent cache of the tokens discovered on chain, see `use_token_cache`.'''
+    event_indexers = {}
+    '''Swap event indexers of the networks (by network name), see `use_event_indexer`.'''
 
     abi = ETHEREUM_CONTRACT_ABI
 
+    block_filter = None
+    '''Filter of the new blocks on the node, see `get_new_blocks`.'''
+
     def __init__(self):
 
-        self.web3 = Web3(HTTPProvider(self.web3_provider_address))
+        endpoints = self.web3_endpoints
+        self.web3 = self.get_web3(endpoints[0][0] if len(endpoints) == 1 else endpoints)
+        self.provider = self.web3.providers[0]
 
         # Method IDs for transaction building. Built on the fly for developer reference (keeping away from magics)
         self.initiate = self.method_id('initiate(uint256,bytes20,address,address,bool,uint256)')
         self.redeem = self.method_id('redeem(bytes32)')
         self.refund = self.method_id('refund(bytes20, address)')
 
+    @property
+    def nonce_manager(self) -> NonceManager:
+        '''Nonce manager used to build transactions of this network.'''
+        manager = self.nonce_managers.get(self.name)
+        if manager is None:
+            manager = EthereumBaseNetwork.nonce_managers.setdefault(self.name, NonceManager(self.web3))
+        return manager
+
+    @property
+    def web3_endpoints(self) -> tuple:
+        '''
+        Nodes of the network as (address, capabilities) tuples.
+
+        Networks with multiple nodes use `MultiEndpointProvider` which routes the requests between them.
+        '''
+        return ((self.web3_provider_address, (FILTERING, ) if self.filtering_supported else ()), )
+
+    @property
+    def event_indexer(self) -> Optional[EventIndexer]:
+        return self.event_indexers.get(self.name)
+
+    def use_event_indexer(self, path: Optional[str]=None, **kwargs) -> EventIndexer:
+        '''
+        Looks up redeem transactions and secrets of this network in the local index of the swap contract events.
+
+        Args:
+            path (str): path of the sqlite database with the events (kept in memory if not given)
+            kwargs: other `EventIndexer` arguments
+
+        Returns:
+            EventIndexer: indexer used by all of the objects of this network
+        '''
+        indexer = self.event_indexers.get(self.name)
+        if indexer is None:
+            indexer = EventIndexer(self, EventStore(path), **kwargs)
+            EthereumBaseNetwork.event_indexers[self.name] = indexer
+        return indexer
+
+    @classmethod
+    def get_web3(cls, provider: Union[str, tuple]) -> Web3:
+        '''
+        Returns Web3 object for the given provider address or endpoints (shared by all of the networks and threads).
+        '''
+        with cls.web3_instances_lock:
+            web3 = cls.web3_instances.get(provider)
+            if web3 is None:
+                if isinstance(provider, str):
+                    web3 = Web3(BatchingHTTPProvider(provider))
+                else:
+                    web3 = Web3(MultiEndpointProvider(provider))
+                EthereumBaseNetwork.web3_instances[provider] = web3
+            return web3
+
     @staticmethod
+    @lru_cache(maxsize=None)
     def method_id(method) -> str:
         return Web3.sha3(text=method)[0:4].hex()
 
@@ -156,6 +243,28 @@ class EthereumBaseNetwork(BaseNetwork):
         tx_dict = self.get_transaction(tx_address)
         return EthereumContract(self, tx_dict)
 
+    def audit_contracts(self, tx_addresses: list) -> list:
+        '''
+        Audits multiple contracts, transactions and the latest block number are fetched in one batch request.
+
+        Args:
+            tx_addresses (list): addresses of the transactions with the contracts
+
+        Returns:
+            list: list of (contract, None) or (None, exception) tuples in the order of the addresses
+        '''
+        self.provider.prefetch(
+            [('eth_getTransactionByHash', [tx_address]) for tx_address in tx_addresses] + [('eth_blockNumber', [])]
+        )
+        results = []
+        for tx_address in tx_addresses:
+            try:
+                results.append((self.audit_contract(tx_address), None))
+            except Exception as e:
+                logger.debug('Unable to audit contract %s: %r', tx_address, e)
+                results.append((None, e))
+        return results
+
     def extract_secret_from_redeem_transaction(self, tx_address: str) -> str:
         tx_dict = self.get_transaction(tx_address)
         method_id = self.extract_method_id(tx_dict['input'])
@@ -170,25 +279,162 @@ class EthereumBaseNetwork(BaseNetwork):
     @classmethod
     def get_token_by_attribute(cls, name: str, value: str) -> Optional[Token]:
         """ Get a token by provided attribute and its value """
-        for token in cls.tokens:
-            if getattr(token, name).lower() == value.lower():
-                return token
+        return cls.get_token_registry().get(name, value)
+
+    @classmethod
+    def get_token_registry(cls) -> TokenRegistry:
+        '''Returns registry of the listed tokens and tokens discovered on chain (shared by all of the objects).'''
+        registry = cls.token_registries.get(cls.name)
+        if registry is None:
+            registry = TokenRegistry(cls.tokens)
+            if cls.token_cache is not None:
+                registry.discover(*cls.token_cache.get_tokens(cls.name))
+            registry = EthereumBaseNetwork.token_registries.setdefault(cls.name, registry)
+        return registry
+
+    @classmethod
+    def use_token_cache(cls, path: Optional[str]=None) -> TokenCache:
+        '''
+        Keeps the tokens discovered on chain in the sqlite database, so they are not fetched again after restart.
+
+        Args:
+            path (str): path of the database file (shared by all of the networks),
+                `tokens.db` in the `~/.clove` directory by default
+
+        Returns:
+            TokenCache: cache used by all of the networks
+        '''
+        if path is None:
+            # directory accessible only by the user, so other users cannot inject fake tokens
+            directory = os.path.join(os.path.expanduser('~'), '.clove')
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            path = os.path.join(directory, 'tokens.db')
+        EthereumBaseNetwork.token_cache = TokenCache(path)
+        # registries are rebuilt with the cached tokens
+        EthereumBaseNetwork.token_registries.clear()
+        return EthereumBaseNetwork.token_cache
 
     def get_token_from_token_contract(self, token_address: str) -> Optional[Token]:
         """ Getting information from token contract and creating Token.
             Smart contract is taken based on provided address """
-        token_address = self.unify_address(token_address)
-        token_contract = self.web3.eth.contract(address=token_address, abi=ERC20_BASIC_ABI)
-        concise = ConciseContract(token_contract)
-        try:
-            name = concise.name()
-            symbol = concise.symbol()
-            decimals = concise.decimals()
-            logger.debug(f'Token get from contract with success')
-        except (OverflowError, BadFunctionCallOutput):
-            logger.warning(f'Unable to take token from address: {token_address}')
-            return
-        return Token(name, symbol, token_address, decimals)
+        return self.get_tokens_from_token_contracts([token_address])[0]
+
+    def get_tokens_from_token_contracts(self, token_addresses: list) -> list:
+        '''
+        Reads name, symbol and decimals of the tokens from their contracts (all of the calls in one request).
+
+        Args:
+            token_addresses (list): addresses of the token contracts
+
+        Returns:
+            list: `Token` objects (or None for addresses without the token) in the order of the addresses
+        '''
+        token_addresses = [self.unify_address(token_address) for token_address in token_addresses]
+        multicall = self.multicall()
+        for token_address in token_addresses:
+            multicall.add(token_address, 'name()', output_types=('string', ))
+            multicall.add(token_address, 'symbol()', output_types=('string', ))
+            multicall.add(token_address, 'decimals()', output_types=('uint8', ))
+        results = multicall.execute()
+
+        tokens = []
+        for index, token_address in enumerate(token_addresses):
+            name, symbol, decimals = results[index * 3:index * 3 + 3]
+            if name is None or symbol is None or decimals is None:
+                logger.warning(f'Unable to take token from address: {token_address}')
+                tokens.append(None)
+                continue
+            tokens.append(Token(name, symbol, token_address, decimals))
+
+        discovered = [token for token in tokens if token]
+        self.get_token_registry().discover(*discovered)
+        if self.token_cache is not None and discovered:
+            self.token_cache.add(self.name, *discovered)
+        return tokens
+
+    def multicall(self) -> Multicall:
+        '''Returns aggregator of the read-only contract calls (see `Multicall`).'''
+        return Multicall(self)
+
+    def get_token_balances(self, address: str, token_addresses: list) -> list:
+        '''Returns balances (in base units) of the address in the given tokens, fetched in one request.'''
+        multicall = self.multicall()
+        for token_address in token_addresses:
+            multicall.add(token_address, 'balanceOf(address)', (address, ), ('uint256', ))
+        return multicall.execute()
+
+    def get_token_allowances(self, address: str, token_addresses: list) -> list:
+        '''Returns amounts (in base units) of the given tokens which the swap contract is allowed to spend.'''
+        multicall = self.multicall()
+        for token_address in token_addresses:
+            multicall.add(token_address, 'allowance(address,address)', (address, self.contract_address), ('uint256', ))
+        return multicall.execute()
+
+    def get_swap_state(self, recipient_address: str, secret_hash: str) -> dict:
+        '''
+        Reads the swap from the swap contract (one `eth_call`).
+
+        Args:
+            recipient_address (str): address of the swap recipient
+            secret_hash (str): secret hash of the swap
+
+        Returns:
+            dict: swap details with the `state`: `open`, `refundable` (after the expiration)
+            or `closed` (swap was redeemed, refunded or never initiated)
+
+        Example:
+            >>> from clove.network import EthereumTestnet
+            >>> network = EthereumTestnet()
+            >>> recipient_address = '0xd867f293Ba129629a9f9355fa285B8D3711a9092'
+            >>> network.get_swap_state(recipient_address, '10ff972f3d8181f603aa7f6b4bc43aff6f8f0b7b')
+            {'state': 'closed', 'exists': False, 'expiration': None, 'initiator': None, 'participant': None,
+            'value': 0, 'is_token': False, 'token_address': None}
+        '''
+        return self.get_swap_states([(recipient_address, secret_hash)])[0]
+
+    def get_swap_states(self, swaps: list) -> list:
+        '''
+        Reads multiple swaps from the swap contract in one request (see `get_swap_state`).
+
+        Args:
+            swaps (list): (recipient address, secret hash) tuples
+
+        Returns:
+            list: swap details in the order of the swaps (None if the swap could not be read)
+        '''
+        multicall = self.multicall()
+        for recipient_address, secret_hash in swaps:
+            multicall.add(
+                self.contract_address,
+                'swaps(address,bytes20)',
+                (recipient_address, bytes.fromhex(secret_hash)),
+                SWAP_STATE_OUTPUT_TYPES,
+            )
+        now = datetime.utcnow()
+        states = []
+        for result in multicall.execute():
+            if result is None:
+                states.append(None)
+                continue
+            expiration, initiator, participant, value, is_token, token_address, exists = result
+            if not exists:
+                states.append({
+                    'state': SWAP_CLOSED, 'exists': False, 'expiration': None, 'initiator': None,
+                    'participant': None, 'value': 0, 'is_token': False, 'token_address': None,
+                })
+                continue
+            expiration = datetime.utcfromtimestamp(expiration)
+            states.append({
+                'state': SWAP_OPEN if expiration > now else SWAP_REFUNDABLE,
+                'exists': True,
+                'expiration': expiration,
+                'initiator': initiator,
+                'participant': participant,
+                'value': value,
+                'is_token': is_token,
+                'token_address': token_address if is_token else None,
+            })
+        return states
 
     def get_token_by_address(self, address: str):
         token = self.get_token_by_attribute('address', address) or self.get_token_from_token_contract(address)
@@ -257,17 +503,41 @@ class EthereumBaseNetwork(BaseNetwork):
         """ Returns Ethereum wallter object, which allows to keep address and priv key """
         return EthereumWallet(private_key)
 
-    @property
-    def latest_block(self):
+    def get_latest_block(self) -> int:
         return self.web3.eth.blockNumber
 
+    def use_height_oracle(self, shared: bool=False, start: bool=True, **kwargs) -> HeightOracle:
+        '''
+        Serves `latest_block` of this network from the height oracle refreshed in the background.
+
+        On networks with filtering support the oracle refreshes the height as soon as the node's block filter
+        reports the new block (see `get_new_blocks`).
+        '''
+        if self.filtering_supported:
+            kwargs.setdefault('new_blocks', self.get_new_blocks)
+        return super().use_height_oracle(shared, start, **kwargs)
+
+    def get_new_blocks(self) -> list:
+        '''
+        Returns hashes of the blocks mined since the last call (block filter is created on the node on the first call).
+        '''
+        if self.block_filter is None:
+            self.block_filter = self.web3.eth.filter('latest')
+            return []
+        return self.block_filter.get_new_entries()
+
     def find_redeem_transaction(self, recipient_address: str, contract_address: str, value: int):
         raise NotImplementedError
 
     def find_redeem_token_transaction(self, recipient_address: str, token_address: str, value: int):
         raise NotImplementedError
 
-    def find_transaction_details_in_redeem_event(self, recipient_address: str, secret_hash: str, block_number: int):
+    def create_redeem_event_filter(self, recipient_address: str, secret_hash: str, block_number: int):
+        '''
+        Creates filter of the redeem events of the contract on the node.
+
+        Filter can be polled with `get_new_entries()` to receive only the events emitted since the last poll.
+        '''
         if not self.filtering_supported:
             raise NotImplementedError
 
@@ -282,12 +552,22 @@ class EthereumBaseNetwork(BaseNetwork):
             ]
         }
 
-        event_filter = self.web3.eth.filter(filter_options)
+        return self.web3.eth.filter(filter_options)
+
+    @staticmethod
+    def get_redeem_event_details(event: AttributeDict) -> dict:
+        return {
+            'secret': event['data'][2:],
+            'transaction_hash': event['transactionHash'].hex()
+        }
+
+    def find_transaction_details_in_redeem_event(self, recipient_address: str, secret_hash: str, block_number: int):
+        if self.event_indexer is not None:
+            return self.event_indexer.find_redeem_details(recipient_address, secret_hash, block_number)
+
+        event_filter = self.create_redeem_event_filter(recipient_address, secret_hash, block_number)
 
         for _ in range(ETH_FILTER_MAX_ATTEMPTS):
             events = event_filter.get_all_entries()
             if events:
-                return {
-                    'secret': events[0]['data'][2:],
-                    'transaction_hash': events[0]['transactionHash'].hex()
-                }
+                return self.get_redeem_event_details(events[0])
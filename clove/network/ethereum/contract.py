@@ -83,30 +83,36 @@ class EthereumContract(object):
     def redeem(self, secret: str) -> EthereumTokenTransaction:
         contract = self.network.web3.eth.contract(address=self.contract_address, abi=self.network.abi)
         redeem_func = contract.functions.redeem(secret)
-        tx_dict = {
-            'nonce': self.network.web3.eth.getTransactionCount(self.recipient_address),
-            'value': 0,
-            'gas': ETH_REDEEM_GAS_LIMIT,
-        }
-
-        tx_dict = redeem_func.buildTransaction(tx_dict)
-
-        transaction = EthereumTokenTransaction(network=self.network)
-        transaction.tx = Transaction(
-            nonce=tx_dict['nonce'],
-            gasprice=tx_dict['gasPrice'],
-            startgas=tx_dict['gas'],
-            to=tx_dict['to'],
-            value=tx_dict['value'],
-            data=Web3.toBytes(hexstr=tx_dict['data']),
-        )
+        with self.network.nonce_manager.reservation(self.recipient_address) as nonce:
+            tx_dict = {
+                'nonce': nonce,
+                'value': 0,
+                'gas': ETH_REDEEM_GAS_LIMIT,
+            }
+
+            tx_dict = redeem_func.buildTransaction(tx_dict)
+
+            transaction = EthereumTokenTransaction(network=self.network)
+            transaction.tx = Transaction(
+                nonce=tx_dict['nonce'],
+                gasprice=tx_dict['gasPrice'],
+                startgas=tx_dict['gas'],
+                to=tx_dict['to'],
+                value=tx_dict['value'],
+                data=Web3.toBytes(hexstr=tx_dict['data']),
+            )
         transaction.value = self.value
         transaction.token = self.token
         transaction.recipient_address = self.recipient_address
+        transaction.sender_address = self.recipient_address
         return transaction
 
+    def get_state(self) -> dict:
+        '''Reads the swap state from the swap contract (see `EthereumBaseNetwork.get_swap_state`).'''
+        return self.network.get_swap_state(self.recipient_address, self.secret_hash)
+
     def find_redeem_transaction(self):
-        if self.network.filtering_supported:
+        if self.network.filtering_supported or self.network.event_indexer is not None:
             tx_details = self.network.find_transaction_details_in_redeem_event(
                 block_number=self.block_number,
                 recipient_address=self.recipient_address,
@@ -160,26 +166,28 @@ class EthereumContract(object):
             raise RuntimeError(f"This contract is still valid! It can't be refunded until {locktime_string} UTC.")
 
         refund_func = contract.functions.refund(self.secret_hash, self.recipient_address)
-        tx_dict = {
-            'nonce': self.network.web3.eth.getTransactionCount(self.refund_address),
-            'value': 0,
-            'gas': ETH_REFUND_GAS_LIMIT,
-        }
-
-        tx_dict = refund_func.buildTransaction(tx_dict)
-
-        transaction = EthereumTokenTransaction(network=self.network)
-        transaction.tx = Transaction(
-            nonce=tx_dict['nonce'],
-            gasprice=tx_dict['gasPrice'],
-            startgas=tx_dict['gas'],
-            to=tx_dict['to'],
-            value=tx_dict['value'],
-            data=Web3.toBytes(hexstr=tx_dict['data']),
-        )
+        with self.network.nonce_manager.reservation(self.refund_address) as nonce:
+            tx_dict = {
+                'nonce': nonce,
+                'value': 0,
+                'gas': ETH_REFUND_GAS_LIMIT,
+            }
+
+            tx_dict = refund_func.buildTransaction(tx_dict)
+
+            transaction = EthereumTokenTransaction(network=self.network)
+            transaction.tx = Transaction(
+                nonce=tx_dict['nonce'],
+                gasprice=tx_dict['gasPrice'],
+                startgas=tx_dict['gas'],
+                to=tx_dict['to'],
+                value=tx_dict['value'],
+                data=Web3.toBytes(hexstr=tx_dict['data']),
+            )
         transaction.value = self.value
         transaction.token = self.token
         transaction.recipient_address = self.refund_address
+        transaction.sender_address = self.refund_address
         logger.debug('Transaction refunded')
         return transaction
 
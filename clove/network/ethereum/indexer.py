@@ -0,0 +1,293 @@
+import threading
+from typing import Optional
+
+from eth_abi import decode_abi, decode_single
+from eth_abi.exceptions import DecodingError
+from hexbytes import HexBytes
+from requests import RequestException
+from web3 import Web3
+
+from clove.constants import (
+    ETH_LOGS_CHUNK_SIZE,
+    ETH_LOGS_MAX_CHUNK_SIZE,
+    ETH_LOGS_REORG_DEPTH,
+    ETHEREUM_CONTRACT_ABI,
+    SWAP_EVENTS,
+)
+from clove.utils.logging import logger
+from clove.utils.storage import SqliteStore
+
+EVENT_FIELDS = {'_hash': 'secret_hash', '_token': 'token_address', '_isToken': 'is_token'}
+'''Names of the stored fields for the event arguments (other arguments are stored without the leading underscore).'''
+
+
+def get_swap_events(abi: list=ETHEREUM_CONTRACT_ABI) -> dict:
+    '''Returns swap events of the contract ABI: name and argument types by the event signature hash.'''
+    events = {}
+    for item in abi:
+        if item.get('type') != 'event' or item['name'] not in SWAP_EVENTS:
+            continue
+        inputs = [(EVENT_FIELDS.get(argument['name'], argument['name'].lstrip('_')), argument['type'])
+                  for argument in item['inputs']]
+        signature = f'{item["name"]}({",".join(argument_type for _, argument_type in inputs)})'
+        events[Web3.sha3(text=signature).hex()] = item['name'], inputs
+    return events
+
+
+class EventStore(SqliteStore):
+    '''
+    Swap contract events indexed by the `EventIndexer`.
+
+    Every network has a cursor: range of the blocks which were already scanned.
+    Events are saved together with the cursor, so the range never covers blocks which were not stored.
+    '''
+
+    schema = '''
+        CREATE TABLE IF NOT EXISTS swap_events (
+            network TEXT NOT NULL,
+            event TEXT NOT NULL,
+            block_number INTEGER NOT NULL,
+            transaction_hash TEXT NOT NULL,
+            log_index INTEGER NOT NULL,
+            initiator TEXT,
+            participant TEXT,
+            secret_hash TEXT NOT NULL,
+            secret TEXT,
+            expiration INTEGER,
+            token_address TEXT,
+            is_token INTEGER,
+            value TEXT,
+            UNIQUE (network, transaction_hash, log_index)
+        );
+        CREATE INDEX IF NOT EXISTS swap_events_secret_hash ON swap_events (network, secret_hash);
+        CREATE TABLE IF NOT EXISTS cursors (
+            network TEXT PRIMARY KEY,
+            first_block INTEGER NOT NULL,
+            last_block INTEGER NOT NULL
+        );
+    '''
+
+    fields = (
+        'network', 'event', 'block_number', 'transaction_hash', 'log_index', 'initiator', 'participant',
+        'secret_hash', 'secret', 'expiration', 'token_address', 'is_token', 'value',
+    )
+
+    def get_range(self, network: str) -> Optional[tuple]:
+        '''Returns the first and the last scanned block of the network (None if nothing was scanned yet).'''
+        rows = self.query('SELECT first_block, last_block FROM cursors WHERE network = ?', (network, ))
+        if rows:
+            return rows[0]['first_block'], rows[0]['last_block']
+
+    def add(self, network: str, events: list, first_block: int, last_block: int):
+        '''Saves events found in the given (scanned) range of blocks.'''
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join('?' for _ in self.fields)
+        rows = [tuple(dict(event, network=network).get(field) for field in self.fields) for event in events]
+        with self.transaction() as connection:
+            connection.executemany(f'INSERT OR IGNORE INTO swap_events ({columns}) VALUES ({placeholders})', rows)
+            connection.execute(
+                'INSERT OR IGNORE INTO cursors (network, first_block, last_block) VALUES (?, ?, ?)',
+                (network, first_block, last_block),
+            )
+            connection.execute(
+                'UPDATE cursors SET first_block = MIN(first_block, ?), last_block = MAX(last_block, ?) '
+                'WHERE network = ?',
+                (first_block, last_block, network),
+            )
+
+    def rewind(self, network: str, block_number: int):
+        '''Forgets events since the given block and shortens the scanned range, so the blocks are scanned again.'''
+        with self.transaction() as connection:
+            connection.execute(
+                'DELETE FROM swap_events WHERE network = ? AND block_number >= ?', (network, block_number)
+            )
+            connection.execute(
+                'UPDATE cursors SET last_block = ? WHERE network = ? AND last_block >= ?',
+                (block_number - 1, network, block_number),
+            )
+            connection.execute('DELETE FROM cursors WHERE network = ? AND last_block < first_block', (network, ))
+
+    def find(self, network: str, secret_hash: str, event: Optional[str]=None) -> list:
+        '''Returns events of the swaps with the given secret hash in the order of the blocks.'''
+        where = 'network = ? AND secret_hash = ?'
+        parameters = (network, secret_hash.lower())
+        if event is not None:
+            where += ' AND event = ?'
+            parameters += (event, )
+        return self.query(f'SELECT * FROM swap_events WHERE {where} ORDER BY block_number, log_index', parameters)
+
+
+class EventIndexer(object):
+    '''
+    Keeps the swap contract events (`InitiateSwap`, `RedeemSwap`, `RefundSwap`) in the local store.
+
+    Logs are fetched with `eth_getLogs`, so the indexer works with any node (filtering support is not required).
+    Blocks are scanned in chunks: the chunk is halved when the node fails to return the logs (e.g. too many results
+    or timeout) and doubled after every successful request (up to `max_chunk_size`). Every chunk is saved
+    with the scanned range, so the scan continues where it ended (also after restart if the store is kept in a file).
+    The newest `reorg_depth` scanned blocks are scanned again on every scan (their stored events are deleted first),
+    so events of the blocks dropped by a chain reorganization are not kept in the store.
+
+    Args:
+        network: Ethereum network object
+        store (EventStore): store for the events (in-memory store is created if not given)
+        start_block (int): the first block to scan (latest block if not given); earlier blocks are scanned
+            only when events of the older contract are looked up
+        chunk_size (int): initial number of blocks requested at once
+        max_chunk_size (int): maximal number of blocks requested at once
+        confirmations (int): number of the newest blocks which are not scanned yet
+        reorg_depth (int): number of the newest scanned blocks which are scanned again
+
+    Example:
+        >>> from clove.network import Ethereum
+        >>> network = Ethereum()
+        >>> network.use_event_indexer('events.db')
+        <clove.network.ethereum.indexer.EventIndexer at 0x7f3ba1d6f4a8>
+        >>> contract = network.audit_contract('0x7221773115ded91f856cedb2032a529edabe0bab8785d07d901681512314ef41')
+        >>> contract.find_secret()  # local query after scanning the new blocks
+        '1e0f4b7a3ec7d2b7e1a1e7ec3d1e7bd4b9c3e0f4b7a3ec7d2b7e1a1e7ec3d1e7'
+    '''
+
+    def __init__(
+        self,
+        network,
+        store: Optional[EventStore]=None,
+        start_block: Optional[int]=None,
+        chunk_size: int=ETH_LOGS_CHUNK_SIZE,
+        max_chunk_size: int=ETH_LOGS_MAX_CHUNK_SIZE,
+        confirmations: int=0,
+        reorg_depth: int=ETH_LOGS_REORG_DEPTH,
+    ):
+        self.network = network
+        self.store = store or EventStore()
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.confirmations = confirmations
+        self.reorg_depth = reorg_depth
+        self.events = get_swap_events(network.abi)
+        self.lock = threading.Lock()
+
+    def get_logs(self, from_block: int, to_block: int) -> list:
+        return self.network.web3.eth.getLogs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': self.network.contract_address,
+            'topics': [list(self.events)],
+        })
+
+    def decode(self, log) -> Optional[dict]:
+        '''
+        Returns details of the swap event from the log (None for the unknown events).
+
+        Indexed arguments are taken from the log topics (contract indexes the leading arguments of the events),
+        the rest of them is decoded from the log data.
+        '''
+        topics = [HexBytes(topic) for topic in log['topics']]
+        if not topics or topics[0].hex() not in self.events:
+            return
+        name, inputs = self.events[topics[0].hex()]
+        indexed, not_indexed = inputs[:len(topics) - 1], inputs[len(topics) - 1:]
+        try:
+            values = [decode_single(argument_type, topic) for (_, argument_type), topic in zip(indexed, topics[1:])]
+            values += decode_abi([argument_type for _, argument_type in not_indexed], HexBytes(log['data']))
+        except DecodingError as e:
+            logger.warning('Unable to decode %s event: %r', name, e)
+            return
+
+        event = {
+            'event': name,
+            'block_number': log['blockNumber'],
+            'transaction_hash': HexBytes(log['transactionHash']).hex(),
+            'log_index': log['logIndex'],
+        }
+        for (field, argument_type), value in zip(inputs, values):
+            if argument_type.startswith('bytes'):
+                value = value.hex()
+            elif argument_type == 'address':
+                value = value.lower()
+            elif argument_type == 'uint256' and field == 'value':
+                value = str(value)
+            event[field] = value
+        return event
+
+    def scan_range(self, from_block: int, to_block: int, reverse: bool=False) -> int:
+        '''
+        Scans the blocks (including both ends) and saves the found events.
+
+        Range is scanned from the end adjacent to the already scanned blocks
+        (`reverse` for the blocks preceding them), so the scanned blocks are always contiguous.
+
+        Returns:
+            int: number of the found events
+        '''
+        found = 0
+        while from_block <= to_block:
+            if reverse:
+                chunk_from, chunk_to = max(from_block, to_block - self.chunk_size + 1), to_block
+            else:
+                chunk_from, chunk_to = from_block, min(to_block, from_block + self.chunk_size - 1)
+            try:
+                logs = self.get_logs(chunk_from, chunk_to)
+            except (RequestException, ValueError) as e:
+                if self.chunk_size == 1:
+                    raise
+                self.chunk_size = max(self.chunk_size // 2, 1)
+                logger.debug('Unable to get logs of blocks %s-%s (%r), chunk size decreased to %s',
+                             chunk_from, chunk_to, e, self.chunk_size)
+                continue
+
+            events = [event for event in (self.decode(log) for log in logs) if event]
+            self.store.add(self.network.name, events, chunk_from, chunk_to)
+            found += len(events)
+            self.chunk_size = min(self.chunk_size * 2, self.max_chunk_size)
+            if reverse:
+                to_block = chunk_from - 1
+            else:
+                from_block = chunk_to + 1
+        return found
+
+    def scan(self, from_block: Optional[int]=None) -> int:
+        '''
+        Scans the blocks which were not scanned yet up to the latest (confirmed) block.
+
+        The newest `reorg_depth` blocks of the scanned range (and blocks after the latest block if the chain
+        got shorter) are forgotten and scanned again.
+
+        Args:
+            from_block (int): block from which the events are needed (older blocks are scanned if necessary)
+
+        Returns:
+            int: number of the found events
+        '''
+        with self.lock:
+            latest_block = self.network.latest_block - self.confirmations
+            scanned = self.store.get_range(self.network.name)
+            if scanned is None:
+                first_block = from_block if from_block is not None else self.start_block
+                return self.scan_range(latest_block if first_block is None else first_block, latest_block)
+
+            found = 0
+            if from_block is not None and from_block < scanned[0]:
+                found += self.scan_range(from_block, scanned[0] - 1, reverse=True)
+            rescan_from = max(scanned[0], min(scanned[1], latest_block) - self.reorg_depth + 1)
+            if rescan_from <= scanned[1]:
+                self.store.rewind(self.network.name, rescan_from)
+            found += self.scan_range(rescan_from, latest_block)
+            return found
+
+    def find_redeem_details(
+        self, recipient_address: str, secret_hash: str, block_number: Optional[int]=None
+    ) -> Optional[dict]:
+        '''
+        Returns secret and transaction hash of the contract redeem (None if the contract was not redeemed yet).
+
+        Args:
+            recipient_address (str): address of the contract recipient
+            secret_hash (str): secret hash of the contract
+            block_number (int): block of the contract (redeem is searched since this block)
+        '''
+        self.scan(block_number)
+        for event in self.store.find(self.network.name, secret_hash, 'RedeemSwap'):
+            if event['participant'] == recipient_address.lower():
+                return {'secret': event['secret'], 'transaction_hash': event['transaction_hash']}
@@ -0,0 +1,124 @@
+from typing import Optional
+
+from eth_abi import decode_abi, encode_abi
+from eth_abi.exceptions import DecodingError
+from web3 import Web3
+from web3.utils.abi import map_abi_data
+from web3.utils.normalizers import BASE_RETURN_NORMALIZERS
+
+from clove.constants import MULTICALL_MAX_CALLS
+from clove.utils.logging import logger
+
+AGGREGATE_SIGNATURE = 'aggregate((address,bytes)[])'
+AGGREGATE_INPUT_TYPE = '(address,bytes)[]'
+
+
+def get_input_types(signature: str) -> list:
+    '''
+    Returns argument types of the function signature, e.g. `['address', 'uint256']` for `f(address,uint256)`
+    (tuple arguments are not supported).
+    '''
+    arguments = signature[signature.index('(') + 1:signature.rindex(')')]
+    return [argument.strip() for argument in arguments.split(',') if argument.strip()]
+
+
+class Multicall(object):
+    '''
+    Aggregates read-only contract calls, so all of them are made in one request.
+
+    On networks with the Multicall contract (`multicall_address`) calls are bundled into `aggregate` calls
+    (one `eth_call` per `MULTICALL_MAX_CALLS` calls). On the other networks, or when any of the aggregated
+    calls fails, calls are sent as one JSON-RPC batch. Single call is always sent directly to its contract.
+
+    Args:
+        network: Ethereum network object
+
+    Example:
+        >>> from clove.network import Ethereum
+        >>> from clove.network.ethereum.multicall import Multicall
+        >>> multicall = Multicall(Ethereum())
+        >>> multicall.add('0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 'symbol()', output_types=('string', ))
+        0
+        >>> multicall.add('0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 'decimals()', output_types=('uint8', ))
+        1
+        >>> multicall.execute()
+        ['BNT', 18]
+    '''
+
+    def __init__(self, network):
+        self.network = network
+        self.calls = []
+
+    def add(self, target: str, signature: str, args: tuple=(), output_types: tuple=()) -> int:
+        '''
+        Adds the contract call.
+
+        Args:
+            target (str): address of the contract
+            signature (str): function signature, e.g. `balanceOf(address)`
+            args (tuple): function arguments
+            output_types (tuple): types of the returned values, e.g. `('uint256', )`
+
+        Returns:
+            int: index of the call result
+        '''
+        data = self.network.method_id(signature) + encode_abi(get_input_types(signature), args).hex()
+        self.calls.append((Web3.toChecksumAddress(target), data, tuple(output_types)))
+        return len(self.calls) - 1
+
+    @staticmethod
+    def decode(output_types: tuple, raw_result: Optional[bytes]):
+        '''Returns the decoded value (tuple if there are multiple values) or None if the call failed.'''
+        if not raw_result:
+            return
+        try:
+            values = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, decode_abi(output_types, raw_result))
+        except (DecodingError, OverflowError, UnicodeDecodeError) as e:
+            logger.debug('Unable to decode call result: %r', e)
+            return
+        return values[0] if len(values) == 1 else values
+
+    def aggregate(self, calls: list) -> list:
+        '''Makes the calls through the Multicall contract, raises ValueError if any of them fails.'''
+        data = self.network.method_id(AGGREGATE_SIGNATURE) + encode_abi(
+            [AGGREGATE_INPUT_TYPE],
+            [[(target, Web3.toBytes(hexstr=call_data)) for target, call_data, _ in calls]],
+        ).hex()
+        result = self.network.web3.eth.call({'to': self.network.multicall_address, 'data': data})
+        if not result:
+            raise ValueError('Aggregated call failed.')
+        try:
+            _, raw_results = decode_abi(['uint256', 'bytes[]'], bytes(result))
+        except DecodingError as e:
+            raise ValueError(f'Invalid aggregated call result: {e}')
+        return list(raw_results)
+
+    def batch(self, calls: list) -> list:
+        '''Makes the calls in one JSON-RPC batch, results of the failed calls are None.'''
+        responses = self.network.provider.make_batch_request([
+            ('eth_call', [{'to': target, 'data': data}, 'latest']) for target, data, _ in calls
+        ])
+        return [Web3.toBytes(hexstr=response['result']) if response.get('result') else None for response in responses]
+
+    def execute(self) -> list:
+        '''
+        Makes all of the added calls.
+
+        Returns:
+            list: decoded results in the order of the calls (None for the failed calls)
+        '''
+        results = []
+        for start in range(0, len(self.calls), MULTICALL_MAX_CALLS):
+            calls = self.calls[start:start + MULTICALL_MAX_CALLS]
+            raw_results = None
+            if self.network.multicall_address and len(calls) > 1:
+                try:
+                    raw_results = self.aggregate(calls)
+                except ValueError as e:
+                    logger.debug('Multicall failed, falling back to the batch request: %r', e)
+            if raw_results is None:
+                raw_results = self.batch(calls)
+            results.extend(
+                self.decode(output_types, raw_result) for (_, _, output_types), raw_result in zip(calls, raw_results)
+            )
+        return results
@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+import heapq
+import threading
+from time import time
+from typing import Callable
+
+from clove.constants import NONCE_RESERVATION_TTL
+from clove.utils.logging import logger
+
+
+class NonceManager(object):
+    '''
+    Reserves transaction nonces locally, so multiple transactions from the same address can be built
+    (and published) before any of them is mined.
+
+    Nonce of the address is synced with the pending transaction count whenever the address has no outstanding
+    (reserved, but not yet published) transactions, the following nonces are reserved without asking the node.
+    Nonces of the transactions which were not published are released and reused by the next reservations
+    (so there are no gaps). Reservations which were not published within `ttl` seconds (e.g. transactions
+    built only to show their details) are released as well.
+
+    Args:
+        web3: Web3 object used to get the transaction count
+        ttl (float): seconds after which the unpublished reservation is released
+        clock (callable): returns current timestamp
+
+    Example:
+        >>> from clove.network import EthereumTestnet
+        >>> network = EthereumTestnet()
+        >>> network.nonce_manager.reserve('0x999F348959E611F1E9eab2927c21E88E48e6Ef45')
+        17
+        >>> network.nonce_manager.reserve('0x999F348959E611F1E9eab2927c21E88E48e6Ef45')
+        18
+    '''
+
+    def __init__(self, web3, ttl: float=NONCE_RESERVATION_TTL, clock: Callable[[], float]=time):
+        self.web3 = web3
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.next_nonces = {}
+        '''The lowest never reserved nonce (by address).'''
+        self.released = {}
+        '''Heaps of the released nonces (by address).'''
+        self.outstanding = {}
+        '''Reservation timestamps of the nonces which were not published yet (by address and nonce).'''
+
+    @staticmethod
+    def normalize(address: str) -> str:
+        return address.lower()
+
+    def sync_address(self, address: str):
+        '''
+        Syncs the next nonce with the pending transaction count of the address.
+
+        Without outstanding transactions the node is the source of truth, otherwise the next nonce is only
+        moved forward (the node doesn't know about the outstanding transactions yet).
+        '''
+        pending = self.web3.eth.getTransactionCount(self.web3.toChecksumAddress(address), 'pending')
+        if not self.outstanding.get(address):
+            self.released[address] = []
+            self.next_nonces[address] = pending
+            return
+        released = [nonce for nonce in self.released.get(address, []) if nonce >= pending]
+        heapq.heapify(released)
+        self.released[address] = released
+        self.next_nonces[address] = max(self.next_nonces.get(address, 0), pending)
+
+    def sync(self, address: str):
+        with self.lock:
+            self.sync_address(self.normalize(address))
+
+    def expire_address(self, address: str):
+        '''Releases reservations of the address older than `ttl`.'''
+        expired_before = self.clock() - self.ttl
+        outstanding = self.outstanding.get(address, {})
+        for nonce in [nonce for nonce, reserved_at in outstanding.items() if reserved_at < expired_before]:
+            del outstanding[nonce]
+            if nonce < self.next_nonces[address]:
+                heapq.heappush(self.released[address], nonce)
+            logger.debug('Reservation of nonce %s of %s expired', nonce, address)
+
+    def reserve(self, address: str) -> int:
+        '''Returns the nonce for the next transaction from the given address.'''
+        address = self.normalize(address)
+        with self.lock:
+            self.expire_address(address)
+            if not self.outstanding.get(address):
+                self.sync_address(address)
+            released = self.released[address]
+            if released:
+                nonce = heapq.heappop(released)
+            else:
+                nonce = self.next_nonces[address]
+                self.next_nonces[address] = nonce + 1
+            self.outstanding.setdefault(address, {})[nonce] = self.clock()
+            return nonce
+
+    def release(self, address: str, nonce: int):
+        '''Returns the nonce of the transaction which won't be published, so it can be reused.'''
+        address = self.normalize(address)
+        with self.lock:
+            self.outstanding.get(address, {}).pop(nonce, None)
+            if address not in self.next_nonces or nonce >= self.next_nonces[address]:
+                return
+            released = self.released[address]
+            if nonce in released:
+                return
+            heapq.heappush(released, nonce)
+            # shrink the reserved range if its end was released
+            while released and max(released) == self.next_nonces[address] - 1:
+                released.remove(self.next_nonces[address] - 1)
+                self.next_nonces[address] -= 1
+            heapq.heapify(released)
+        logger.debug('Nonce %s of %s released', nonce, address)
+
+    @contextmanager
+    def reservation(self, address: str):
+        '''Reserves the nonce and releases it if the transaction building fails.'''
+        nonce = self.reserve(address)
+        try:
+            yield nonce
+        except Exception:
+            self.release(address, nonce)
+            raise
+
+    def published(self, address: str, nonce: int):
+        '''Marks the nonce as used by the published transaction.'''
+        with self.lock:
+            self.outstanding.get(self.normalize(address), {}).pop(nonce, None)
+
+    def publish_failed(self, address: str, nonce: int):
+        '''Releases the nonce after the failed publish and syncs the address (the node may know other nonces).'''
+        self.release(address, nonce)
+        self.sync(address)
+
+    def reset(self):
+        '''Forgets all reservations, nonces will be synced with the node on the next use.'''
+        with self.lock:
+            self.next_nonces = {}
+            self.released = {}
+            self.outstanding = {}
@@ -0,0 +1,400 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import json
+import threading
+from time import time
+from typing import Callable, Iterable, Optional
+
+from requests import RequestException
+from web3 import HTTPProvider
+from web3.providers.base import JSONBaseProvider
+from web3.utils.request import make_post_request
+
+from clove.constants import (
+    ETH_ENDPOINT_COOLDOWN,
+    ETH_ENDPOINT_MAX_FAILURES,
+    ETH_ENDPOINT_WRITE_FANOUT,
+    ETH_RPC_CACHE_TTL,
+    ETH_RPC_PREFETCH_METHODS,
+)
+from clove.utils.logging import logger
+
+FILTERING = 'filtering'
+'''Capability of the node supporting event filters (`eth_newFilter` and related methods).'''
+CAPABILITY_METHODS = {
+    'eth_newFilter': FILTERING,
+    'eth_newBlockFilter': FILTERING,
+    'eth_getFilterChanges': FILTERING,
+    'eth_getFilterLogs': FILTERING,
+    'eth_uninstallFilter': FILTERING,
+}
+FILTER_ID_METHODS = ('eth_getFilterChanges', 'eth_getFilterLogs', 'eth_uninstallFilter')
+'''Methods which have to be sent to the node which created the filter.'''
+FILTER_CREATE_METHODS = ('eth_newFilter', 'eth_newBlockFilter')
+WRITE_METHODS = ('eth_sendRawTransaction', )
+METHOD_NOT_FOUND = -32601
+
+
+class BatchingHTTPProvider(HTTPProvider):
+    '''
+    HTTP provider sending JSON-RPC requests in batches.
+
+    * Responses of the methods from `cache_ttl` (gas price, network version, block number) are cached
+      for the given number of seconds.
+    * Every request sent to the node carries also the stale `prefetch_methods`, so the values needed
+      to build the transaction are fetched in the same round trip as the first request.
+    * `prefetch` sends multiple requests in one batch, responses are served to the following calls
+      made through web3 (e.g. to audit multiple contracts in one round trip).
+    * Nodes rejecting batches are remembered and the requests are sent to them one by one.
+
+    Example:
+        >>> from web3 import Web3
+        >>> from clove.network.ethereum.provider import BatchingHTTPProvider
+        >>> provider = BatchingHTTPProvider('https://kovan.infura.io/')
+        >>> web3 = Web3(provider)
+        >>> provider.prefetch([
+        ...     ('eth_getTransactionByHash', ['0x7221773115ded91f856cedb2032a529edabe0bab8785d07d901681512314ef41']),
+        ...     ('eth_getTransactionByHash', ['0x65320e57b9d18ec08388896b029ad1495beb7a57c547440253a1dde01b4485f1']),
+        ... ])
+        >>> web3.eth.getTransaction('0x7221773115ded91f856cedb2032a529edabe0bab8785d07d901681512314ef41')  # no request
+    '''
+
+    def __init__(
+        self,
+        endpoint_uri: Optional[str]=None,
+        request_kwargs: Optional[dict]=None,
+        cache_ttl: Optional[dict]=None,
+        prefetch_methods: tuple=ETH_RPC_PREFETCH_METHODS,
+        clock: Callable[[], float]=time,
+    ):
+        super().__init__(endpoint_uri, request_kwargs)
+        self.cache_ttl = ETH_RPC_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.prefetch_methods = prefetch_methods
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.cache = {}
+        '''Cached responses with their expiration timestamps.'''
+        self.prefetched = {}
+        '''Prefetched responses (served only once).'''
+        self.batch_supported = True
+        '''False after the node rejected the batch request (requests are sent one by one then).'''
+
+    @staticmethod
+    def get_key(method: str, params) -> tuple:
+        return method, json.dumps(params, sort_keys=True)
+
+    def get_cached(self, key: tuple) -> Optional[dict]:
+        with self.lock:
+            response = self.prefetched.pop(key, None)
+            if response is not None:
+                return response
+            response, expires_at = self.cache.get(key, (None, 0))
+            if expires_at > self.clock():
+                return response
+
+    def is_cached(self, key: tuple) -> bool:
+        with self.lock:
+            return key in self.prefetched or self.cache.get(key, (None, 0))[1] > self.clock()
+
+    def save(self, key: tuple, response: dict, prefetched: bool=False):
+        if 'error' in response:
+            return
+        ttl = self.cache_ttl.get(key[0])
+        with self.lock:
+            if ttl:
+                self.cache[key] = response, self.clock() + ttl
+            elif prefetched:
+                self.prefetched[key] = response
+
+    def make_batch_request(self, requests: list, prefetched: bool=False) -> list:
+        '''
+        Sends the requests in one batch.
+
+        Args:
+            requests (list): list of (method, params) tuples
+            prefetched (bool): keep the responses for the following requests
+
+        Returns:
+            list: responses in the order of the requests
+        '''
+        if not self.batch_supported:
+            return self.make_single_requests(requests, prefetched)
+
+        ids = [next(self.request_counter) for _ in requests]
+        request_data = json.dumps([
+            {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': request_id}
+            for request_id, (method, params) in zip(ids, requests)
+        ]).encode()
+        raw_response = make_post_request(self.endpoint_uri, request_data, **self.get_request_kwargs())
+        responses = self.decode_rpc_response(raw_response)
+        if isinstance(responses, dict):
+            # node doesn't support batches and returned a single error
+            logger.debug('%s rejected the batch request (%r), sending requests one by one', self.endpoint_uri,
+                         responses.get('error'))
+            self.batch_supported = False
+            return self.make_single_requests(requests, prefetched)
+        responses_by_id = {response.get('id'): response for response in responses}
+        missing = {'jsonrpc': '2.0', 'error': {'code': -32603, 'message': 'Missing response in the batch.'}}
+
+        ordered = []
+        for request_id, (method, params) in zip(ids, requests):
+            response = responses_by_id.get(request_id, dict(missing, id=request_id))
+            self.save(self.get_key(method, params), response, prefetched)
+            ordered.append(response)
+        return ordered
+
+    def make_single_requests(self, requests: list, prefetched: bool=False) -> list:
+        '''Sends the requests one by one (for the nodes which don't support batches).'''
+        responses = []
+        for method, params in requests:
+            response = super().make_request(method, params)
+            self.save(self.get_key(method, params), response, prefetched)
+            responses.append(response)
+        return responses
+
+    def make_request(self, method, params):
+        key = self.get_key(method, params)
+        response = self.get_cached(key)
+        if response is not None:
+            return response
+
+        requests = [(method, params)]
+        for prefetch_method in self.prefetch_methods if self.batch_supported else ():
+            if prefetch_method != method and not self.is_cached(self.get_key(prefetch_method, [])):
+                requests.append((prefetch_method, []))
+
+        if len(requests) == 1:
+            response = super().make_request(method, params)
+            self.save(key, response)
+            return response
+        return self.make_batch_request(requests)[0]
+
+    def prefetch(self, requests: list):
+        '''
+        Fetches responses of the given requests in one batch.
+
+        Args:
+            requests (list): list of (method, params) tuples
+        '''
+        requests = [(method, params) for method, params in requests if not self.is_cached(self.get_key(method, params))]
+        if requests:
+            self.make_batch_request(requests, prefetched=True)
+
+
+class Endpoint(object):
+    '''
+    Node used by the `MultiEndpointProvider` with its statistics.
+
+    Args:
+        uri (str): address of the node
+        capabilities (iterable): capabilities supported by the node (e.g. `FILTERING`)
+    '''
+
+    latency_weight = 0.3
+    '''Weight of the last request in the average latency.'''
+
+    def __init__(self, uri: str, capabilities: Iterable[str]=()):
+        self.uri = uri
+        self.provider = BatchingHTTPProvider(uri)
+        self.capabilities = set(capabilities)
+        self.unsupported_methods = set()
+        self.latency = None
+        '''Average response time in seconds (None until the first response).'''
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.disabled_until = 0.0
+
+    def supports(self, method: str) -> bool:
+        if method in self.unsupported_methods:
+            return False
+        capability = CAPABILITY_METHODS.get(method)
+        return capability is None or capability in self.capabilities
+
+    def is_healthy(self, now: float) -> bool:
+        return self.disabled_until <= now
+
+    @property
+    def error_rate(self) -> float:
+        return self.failures / self.requests if self.requests else 0.0
+
+    @property
+    def expected_latency(self) -> float:
+        '''Average latency including the retries of the failed requests (infinity if the node never responded).'''
+        if self.latency is None or self.error_rate == 1:
+            return float('inf')
+        return self.latency / (1 - self.error_rate)
+
+    def record_success(self, elapsed: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.latency_weight * (elapsed - self.latency)
+
+    def record_failure(self, now: float):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= ETH_ENDPOINT_MAX_FAILURES:
+            self.disabled_until = now + ETH_ENDPOINT_COOLDOWN
+            logger.warning('%s disabled for %s seconds after %s failures', self, ETH_ENDPOINT_COOLDOWN,
+                           self.consecutive_failures)
+
+    def __repr__(self):
+        return f'<Endpoint {self.uri}>'
+
+
+class MultiEndpointProvider(JSONBaseProvider):
+    '''
+    Provider routing JSON-RPC requests between multiple nodes.
+
+    * Reads are sent to the fastest healthy node supporting the method (nodes without measured latency are tried
+      first), on connection error the next node is tried. Latency of the node is weighted by its error rate,
+      so the unreliable nodes are used only if they are much faster.
+    * Node failing `ETH_ENDPOINT_MAX_FAILURES` times in a row is skipped for `ETH_ENDPOINT_COOLDOWN` seconds.
+    * Methods requiring a capability (e.g. filters) are sent only to the nodes declaring it, filter polls
+      are sent to the node which created the filter. Node answering "method not found" is not asked
+      for this method again.
+    * Transactions are sent to `write_fanout` nodes at once.
+
+    Args:
+        endpoints (iterable): (address, capabilities) tuples
+        write_fanout (int): number of nodes receiving the published transactions
+
+    Example:
+        >>> from web3 import Web3
+        >>> from clove.network.ethereum.provider import FILTERING, MultiEndpointProvider
+        >>> provider = MultiEndpointProvider((
+        ...     ('https://web3.gastracker.io/', ()),
+        ...     ('https://etc-geth.0xinfra.com/', (FILTERING, )),
+        ... ))
+        >>> web3 = Web3(provider)
+    '''
+
+    def __init__(
+        self,
+        endpoints: Iterable[tuple],
+        write_fanout: int=ETH_ENDPOINT_WRITE_FANOUT,
+        clock: Callable[[], float]=time,
+    ):
+        super().__init__()
+        self.endpoints = [Endpoint(uri, capabilities) for uri, capabilities in endpoints]
+        if not self.endpoints:
+            raise ValueError('At least one endpoint is required.')
+        self.write_fanout = write_fanout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.filter_endpoints = {}
+        '''Nodes which created the filters (by filter id).'''
+        self.executor = ThreadPoolExecutor(max_workers=max(write_fanout, 1))
+
+    def __str__(self):
+        return f'Multi-endpoint connection {", ".join(endpoint.uri for endpoint in self.endpoints)}'
+
+    def get_endpoints(self, method: str) -> list:
+        '''Returns nodes able to handle the method, the best one first.'''
+        now = self.clock()
+        with self.lock:
+            supporting = [endpoint for endpoint in self.endpoints if endpoint.supports(method)]
+            if not supporting:
+                # none of the nodes declares the capability, let them answer themselves
+                supporting = list(self.endpoints)
+            healthy = [endpoint for endpoint in supporting if endpoint.is_healthy(now)]
+            # when all of the nodes are disabled, the one to be enabled first is tried anyway
+            candidates = healthy or sorted(supporting, key=lambda endpoint: endpoint.disabled_until)[:1]
+            return sorted(candidates, key=lambda endpoint: (
+                endpoint.latency is not None or endpoint.failures > 0, endpoint.expected_latency
+            ))
+
+    def call(self, endpoint: Endpoint, function: Callable, *args):
+        '''Calls the function of the node provider, records the latency of the node or its failure.'''
+        started = self.clock()
+        try:
+            result = function(*args)
+        except (RequestException, ValueError):
+            with self.lock:
+                endpoint.record_failure(self.clock())
+            raise
+        with self.lock:
+            endpoint.record_success(self.clock() - started)
+        return result
+
+    def call_with_failover(self, method: str, function_name: str, *args):
+        '''Calls the provider function on the best node for the method, the next node is tried on connection error.'''
+        error = None
+        for endpoint in self.get_endpoints(method):
+            try:
+                return self.call(endpoint, getattr(endpoint.provider, function_name), *args)
+            except (RequestException, ValueError) as e:
+                logger.debug('%s failed on %s: %r', function_name, endpoint, e)
+                error = e
+        raise error
+
+    def send(self, endpoint: Endpoint, method: str, params) -> dict:
+        response = self.call(endpoint, endpoint.provider.make_request, method, params)
+        if response.get('error', {}).get('code') == METHOD_NOT_FOUND:
+            with self.lock:
+                endpoint.unsupported_methods.add(method)
+        return response
+
+    def make_request(self, method, params):
+        if method in WRITE_METHODS:
+            return self.make_write_request(method, params)
+
+        if method in FILTER_ID_METHODS and params and params[0] in self.filter_endpoints:
+            endpoints = [self.filter_endpoints[params[0]]]
+        else:
+            endpoints = self.get_endpoints(method)
+
+        error = None
+        for endpoint in endpoints:
+            try:
+                response = self.send(endpoint, method, params)
+            except (RequestException, ValueError) as e:
+                logger.debug('%s failed on %s: %r', method, endpoint, e)
+                error = e
+                continue
+            if response.get('error', {}).get('code') == METHOD_NOT_FOUND and endpoint is not endpoints[-1]:
+                continue
+            if 'error' not in response:
+                if method in FILTER_CREATE_METHODS:
+                    self.filter_endpoints[response['result']] = endpoint
+                elif method == 'eth_uninstallFilter':
+                    self.filter_endpoints.pop(params[0], None)
+            return response
+        raise error
+
+    def make_write_request(self, method, params) -> dict:
+        endpoints = self.get_endpoints(method)[:self.write_fanout]
+        futures = [self.executor.submit(self.send, endpoint, method, params) for endpoint in endpoints]
+        wait(futures)
+        responses = [future.result() for future in futures if future.exception() is None]
+        for response in responses:
+            if 'error' not in response:
+                return response
+        if responses:
+            return responses[0]
+        raise futures[0].exception()
+
+    def make_batch_request(self, requests: list, prefetched: bool=False) -> list:
+        '''Sends the requests in one batch to the best node (see `BatchingHTTPProvider.make_batch_request`).'''
+        return self.call_with_failover('eth_call', 'make_batch_request', requests, prefetched)
+
+    def prefetch(self, requests: list):
+        '''Prefetches the requests on the best node (see `BatchingHTTPProvider.prefetch`).'''
+        self.call_with_failover('eth_getTransactionByHash', 'prefetch', requests)
+
+    def check_health(self):
+        '''Measures the latency of all the nodes (disabled nodes are enabled if they respond).'''
+        for endpoint in self.endpoints:
+            try:
+                self.send(endpoint, 'eth_blockNumber', [])
+            except (RequestException, ValueError) as e:
+                logger.debug('Health check of %s failed: %r', endpoint, e)
+                continue
+            with self.lock:
+                endpoint.disabled_until = 0.0
+
+    def isConnected(self):
+        return any(endpoint.provider.isConnected() for endpoint in self.endpoints)
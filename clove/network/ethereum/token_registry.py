@@ -0,0 +1,85 @@
+import threading
+from typing import Iterable, Optional
+
+from clove.network.ethereum_based import Token
+from clove.utils.storage import SqliteStore
+
+
+class TokenRegistry(object):
+    '''
+    Tokens of the network indexed by the lower case symbol, address and name.
+
+    Listed tokens are indexed by all of the attributes. Tokens discovered on chain are indexed only
+    by the address: their name and symbol are chosen by the contract creator, so anybody could deploy
+    a contract impersonating the listed token. If multiple tokens share the same value,
+    the first added one is returned.
+
+    Example:
+        >>> from clove.network import Ethereum
+        >>> registry = Ethereum.get_token_registry()
+        >>> registry.get('symbol', 'bnt')
+        Token(name='Bancor', symbol='BNT', address='0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', decimals=18)
+    '''
+
+    indexed_attributes = ('symbol', 'address', 'name')
+
+    def __init__(self, tokens: Iterable[Token]=()):
+        self.indexes = {name: {} for name in self.indexed_attributes}
+        self.lock = threading.Lock()
+        self.add(*tokens)
+
+    def add(self, *tokens: Token):
+        with self.lock:
+            for token in tokens:
+                for name, index in self.indexes.items():
+                    index.setdefault(getattr(token, name).lower(), token)
+
+    def discover(self, *tokens: Token):
+        '''Adds tokens discovered on chain (looked up only by the address).'''
+        with self.lock:
+            for token in tokens:
+                self.indexes['address'].setdefault(token.address.lower(), token)
+
+    def get(self, name: str, value: str) -> Optional[Token]:
+        '''Returns token with the given attribute value (case insensitive).'''
+        if name not in self.indexes:
+            raise ValueError(f'Tokens are not indexed by {name}.')
+        return self.indexes[name].get(value.lower())
+
+    def __len__(self):
+        return len(self.indexes['address'])
+
+
+class TokenCache(SqliteStore):
+    '''
+    Tokens discovered on chain (name, symbol and decimals read from the token contracts), kept across restarts.
+
+    Example:
+        >>> from clove.network import Ethereum
+        >>> Ethereum.use_token_cache('tokens.db')
+        >>> Ethereum().get_token_by_address('0x53E546387A0d054e7FF127923254c0a679DA6DBf')  # contract called once
+    '''
+
+    schema = '''
+        CREATE TABLE IF NOT EXISTS tokens (
+            network TEXT NOT NULL,
+            address TEXT NOT NULL,
+            name TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            decimals INTEGER NOT NULL,
+            PRIMARY KEY (network, address)
+        );
+    '''
+
+    def add(self, network: str, *tokens: Token):
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO tokens (network, address, name, symbol, decimals) VALUES (?, ?, ?, ?, ?)',
+                [(network, token.address, token.name, token.symbol, token.decimals) for token in tokens],
+            )
+
+    def get_tokens(self, network: str) -> list:
+        return [
+            Token(**row) for row in
+            self.query('SELECT name, symbol, address, decimals FROM tokens WHERE network = ?', (network, ))
+        ]
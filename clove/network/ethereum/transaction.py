@@ -18,6 +18,7 @@ class EthereumTransaction(object):
         self.tx = None
         self.value = None
         self.recipient_address = None
+        self.sender_address = None
 
     @property
     def raw_transaction(self) -> str:
@@ -48,7 +49,15 @@ class EthereumTransaction(object):
         return self.tx.sign(private_key)
 
     def publish(self) -> Optional[str]:
-        return self.network.publish(self.tx)
+        '''Publishes the transaction, nonce of the transaction which failed to publish is released for reuse.'''
+        transaction_address = self.network.publish(self.tx)
+        if not self.sender_address:
+            return transaction_address
+        if transaction_address is None:
+            self.network.nonce_manager.publish_failed(self.sender_address, self.tx.nonce)
+        else:
+            self.network.nonce_manager.published(self.sender_address, self.tx.nonce)
+        return transaction_address
 
     def get_transaction_url(self) -> Optional[str]:
         '''Wrapper around the `get_transaction_url` method from base network.'''
@@ -104,25 +113,25 @@ class EthereumTokenApprovalTransaction(EthereumTokenTransaction):
             self.value_base_units,
         )
 
-        tx_dict = {
-            'nonce': self.network.web3.eth.getTransactionCount(self.sender_address),
-            'from': self.sender_address,
-        }
+        with self.network.nonce_manager.reservation(self.sender_address) as nonce:
+            tx_dict = {
+                'nonce': nonce,
+                'from': self.sender_address,
+            }
 
-        tx_dict = approve_func.buildTransaction(tx_dict)
+            tx_dict = approve_func.buildTransaction(tx_dict)
 
-        self.gas_limit = approve_func.estimateGas({
-            key: value for key, value in tx_dict.items() if key not in ('to', 'data')
-        })
+            # gas was estimated while building the transaction
+            self.gas_limit = tx_dict['gas']
 
-        self.tx = Transaction(
-            nonce=tx_dict['nonce'],
-            gasprice=tx_dict['gasPrice'],
-            startgas=self.gas_limit,
-            to=tx_dict['to'],
-            value=tx_dict['value'],
-            data=Web3.toBytes(hexstr=tx_dict['data']),
-        )
+            self.tx = Transaction(
+                nonce=tx_dict['nonce'],
+                gasprice=tx_dict['gasPrice'],
+                startgas=self.gas_limit,
+                to=tx_dict['to'],
+                value=tx_dict['value'],
+                data=Web3.toBytes(hexstr=tx_dict['data']),
+            )
 
     def show_details(self):
         details = super().show_details()
@@ -202,26 +211,26 @@ class EthereumAtomicSwapTransaction(EthereumTokenTransaction):
             self.token_value_base_units,
         )
 
-        tx_dict = {
-            'nonce': self.network.web3.eth.getTransactionCount(self.sender_address),
-            'from': self.sender_address,
-            'value': self.value_base_units,
-        }
-
-        tx_dict = initiate_func.buildTransaction(tx_dict)
-
-        self.gas_limit = initiate_func.estimateGas({
-            key: value for key, value in tx_dict.items() if key not in ('to', 'data')
-        })
-
-        self.tx = Transaction(
-            nonce=tx_dict['nonce'],
-            gasprice=tx_dict['gasPrice'],
-            startgas=self.gas_limit,
-            to=tx_dict['to'],
-            value=tx_dict['value'],
-            data=Web3.toBytes(hexstr=tx_dict['data']),
-        )
+        with self.network.nonce_manager.reservation(self.sender_address) as nonce:
+            tx_dict = {
+                'nonce': nonce,
+                'from': self.sender_address,
+                'value': self.value_base_units,
+            }
+
+            tx_dict = initiate_func.buildTransaction(tx_dict)
+
+            # gas was estimated while building the transaction
+            self.gas_limit = tx_dict['gas']
+
+            self.tx = Transaction(
+                nonce=tx_dict['nonce'],
+                gasprice=tx_dict['gasPrice'],
+                startgas=self.gas_limit,
+                to=tx_dict['to'],
+                value=tx_dict['value'],
+                data=Web3.toBytes(hexstr=tx_dict['data']),
+            )
 
     def show_details(self):
         details = super().show_details()
@@ -7,12 +7,13 @@ from urllib.error import HTTPError, URLError
 import urllib.request
 
 from clove.constants import (
+    BLOCKCYPHER_INPUTS_PAGE_SIZE,
     BLOCKCYPHER_SUPPORTED_NETWORKS,
     CLOVE_API_URL,
     CRYPTOID_SUPPORTED_NETWORKS,
     NETWORKS_WITH_API,
 )
-from clove.utils.bitcoin import from_base_units
+from clove.utils.bitcoin import from_base_units, to_base_units
 from clove.utils.logging import logger
 
 
@@ -160,7 +161,7 @@ def get_utxo_from_api(
     testnet: bool=False,
     cryptoid_api_key: str=None
 ) -> Optional[list]:
-    from clove.network.bitcoin.utxo import Utxo
+    from clove.network.bitcoin.utxo import UtxoSet
 
     if use_blockcypher:
         subnet = 'test3' if testnet else 'main'
@@ -180,31 +181,16 @@ def get_utxo_from_api(
         logger.debug('Could not get UTXOs for address %s in %s network', address, network)
         return
 
-    unspent = data.get(unspent_key, [])
+    utxo_set = UtxoSet()
+    for output in data.get(unspent_key, []):
+        utxo_set.add(output['tx_hash'], output[vout_key], int(output['value']), output['script'])
 
-    for output in unspent:
-        output['value'] = int(output['value'])
-
-    unspent = sorted(unspent, key=lambda k: k['value'], reverse=True)
-
-    utxo = []
-    total = 0
-
-    for output in unspent:
-        value = from_base_units(output['value'])
-        utxo.append(
-            Utxo(
-                tx_id=output['tx_hash'],
-                vout=output[vout_key],
-                value=value,
-                tx_script=output['script'],
-            )
+    utxo = utxo_set.select(to_base_units(amount))
+    if utxo is None:
+        logger.debug(
+            f'Cannot find enough UTXO\'s. Found %.8f from %.8f.', from_base_units(utxo_set.total), amount
         )
-        total += value
-        if total > amount:
-            return utxo
-
-    logger.debug(f'Cannot find enough UTXO\'s. Found %.8f from %.8f.', total, amount)
+    return utxo
 
 
 def extract_scriptsig_from_redeem_transaction(
@@ -212,7 +198,22 @@ def extract_scriptsig_from_redeem_transaction(
     contract_address: str,
     testnet: bool=False,
     cryptoid_api_key: str=None,
+    transaction_address: str=None,
+    vout: int=None,
 ) -> Optional[str]:
+    '''
+    Returns scriptSig of the transaction redeeming the contract or None if the contract was not redeemed yet.
+
+    Only the transaction spending the contract output is requested (not the whole address history).
+
+    Args:
+        network (str): network symbol
+        contract_address (str): P2SH address of the contract
+        testnet (bool): testnet flag
+        cryptoid_api_key (str): API key for the cryptoid service
+        transaction_address (str): address of the transaction with the contract output (if it's known)
+        vout (int): index of the contract output (if it's known)
+    '''
 
     network = network.lower()
 
@@ -220,30 +221,86 @@ def extract_scriptsig_from_redeem_transaction(
         raise NotImplementedError
 
     if network in ('btc', 'doge', 'dash'):
-        return extract_scriptsig_blockcypher(network, contract_address, testnet)
+        return extract_scriptsig_blockcypher(network, contract_address, testnet, transaction_address, vout)
 
     if network == 'rvn':
-        return extract_scriptsig_raven(contract_address, testnet)
+        return extract_scriptsig_raven(contract_address, testnet, transaction_address, vout)
 
     if network not in CRYPTOID_SUPPORTED_NETWORKS:
         raise NotImplementedError
 
-    return extract_scriptsig_cryptoid(network, contract_address, testnet, cryptoid_api_key)
+    return extract_scriptsig_cryptoid(
+        network, contract_address, testnet, cryptoid_api_key, transaction_address, vout
+    )
 
 
-def extract_scriptsig_blockcypher(network: str, contract_address: str, testnet: bool=False) -> Optional[str]:
-    subnet = 'test3' if testnet else 'main'
-    data = clove_req_json(f'https://api.blockcypher.com/v1/{network}/{subnet}/addrs/{contract_address}/full')
-    if not data:
-        logger.debug('Unexpected response from blockcypher')
-        raise ValueError('Unexpected response from blockcypher')
+def find_contract_script_sig(vin: list, transaction_address: str, vout: int=None) -> Optional[str]:
+    '''
+    Returns scriptSig of the input spending the contract output from the `vin` list of the redeem transaction.
 
-    transactions = data['txs']
-    if len(transactions) == 1:
+    Redeem transaction may spend multiple outputs (e.g. batch redeem), so the input is matched by the outpoint
+    (by the transaction address only if the contract output index is not known).
+    '''
+    for tx_input in vin:
+        if tx_input.get('txid') == transaction_address and (vout is None or tx_input.get('vout') == vout):
+            return tx_input['scriptSig']['hex']
+    logger.debug('Contract output was not found in the inputs of the redeem transaction')
+
+
+def extract_scriptsig_blockcypher(
+    network: str,
+    contract_address: str,
+    testnet: bool=False,
+    transaction_address: str=None,
+    vout: int=None,
+) -> Optional[str]:
+    subnet = 'test3' if testnet else 'main'
+    api_url = f'https://api.blockcypher.com/v1/{network}/{subnet}'
+
+    if transaction_address and vout is not None:
+        # only the contract output with the `spent_by` field
+        data = clove_req_json(f'{api_url}/txs/{transaction_address}?outstart={vout}&limit=1&includeHex=false')
+        if not data or not data.get('outputs'):
+            logger.debug('Unexpected response from blockcypher')
+            raise ValueError('Unexpected response from blockcypher')
+        outpoint = (transaction_address, vout)
+        spent_by = data['outputs'][0].get('spent_by')
+    else:
+        # address summary with transaction references (without transactions details)
+        data = clove_req_json(f'{api_url}/addrs/{contract_address}?limit=50')
+        if not data:
+            logger.debug('Unexpected response from blockcypher')
+            raise ValueError('Unexpected response from blockcypher')
+        outpoint = spent_by = None
+        for txref in data.get('txrefs', []) + data.get('unconfirmed_txrefs', []):
+            if txref['tx_input_n'] == -1 and txref.get('spent_by'):
+                outpoint = (txref['tx_hash'], txref['tx_output_n'])
+                spent_by = txref['spent_by']
+                break
+
+    if not spent_by:
         logger.debug('Contract was not redeemed yet.')
         return
 
-    return transactions[0]['inputs'][0]['script']
+    # redeem transaction may spend multiple contracts (batch redeem), inputs are fetched page by page
+    start = 0
+    while True:
+        data = clove_req_json(
+            f'{api_url}/txs/{spent_by}?instart={start}&limit={BLOCKCYPHER_INPUTS_PAGE_SIZE}&includeHex=false'
+        )
+        if not data:
+            logger.debug('Unexpected response from blockcypher')
+            raise ValueError('Unexpected response from blockcypher')
+
+        inputs = data.get('inputs', [])
+        for tx_input in inputs:
+            if (tx_input.get('prev_hash'), tx_input.get('output_index')) == outpoint:
+                return tx_input['script']
+
+        start += len(inputs)
+        if not inputs or start >= data.get('vin_sz', start):
+            logger.debug('Contract output was not found in the inputs of %s', spent_by)
+            return
 
 
 def extract_scriptsig_cryptoid(
@@ -251,12 +308,18 @@ def extract_scriptsig_cryptoid(
     contract_address: str,
     testnet: bool=False,
     cryptoid_api_key: str=None,
+    transaction_address: str=None,
+    vout: int=None,
 ) -> Optional[str]:
 
     if not cryptoid_api_key:
         raise ValueError('API key for cryptoid is required.')
 
-    url = f'https://chainz.cryptoid.info/ltc/api.dws?q=multiaddr&active={contract_address}&key={cryptoid_api_key}'
+    # two latest transactions are enough to tell if the contract was redeemed (funding transaction is the first one)
+    url = (
+        f'https://chainz.cryptoid.info/{network}/api.dws'
+        f'?q=multiaddr&n=2&active={contract_address}&key={cryptoid_api_key}'
+    )
     data = clove_req_json(url)
     if not data:
         logger.debug('Unexpected response from cryptoid')
@@ -274,10 +337,15 @@ def extract_scriptsig_cryptoid(
         logger.debug('Unexpected response from cryptoid')
         raise ValueError('Unexpected response from cryptoid')
 
-    return data['vin'][0]['scriptSig']['hex']
+    return find_contract_script_sig(data['vin'], transaction_address or transactions[-1]['hash'], vout)
 
 
-def extract_scriptsig_raven(contract_address: str, testnet: bool=False) -> Optional[str]:
+def extract_scriptsig_raven(
+    contract_address: str,
+    testnet: bool=False,
+    transaction_address: str=None,
+    vout: int=None,
+) -> Optional[str]:
 
     data = clove_req_json(f'http://raven-blockchain.info/ext/getaddress/{contract_address}')
     if not data:
@@ -295,7 +363,7 @@ def extract_scriptsig_raven(contract_address: str, testnet: bool=False) -> Optio
         logger.debug('Unexpected response from Ravencoin API.')
         raise ValueError('Unexpected response from Ravencoin API.')
 
-    return data['vin'][0]['scriptSig']['hex']
+    return find_contract_script_sig(data['vin'], transaction_address or transactions[-1]['addresses'], vout)
 
 
 def find_redeem_transaction_on_etherscan(
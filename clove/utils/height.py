@@ -0,0 +1,211 @@
+import mmap
+import os
+import struct
+import threading
+from time import time
+from typing import Callable, Iterable, Optional, Tuple
+
+from clove.constants import (
+    BLOCK_HEIGHT_MAX_AGE,
+    BLOCK_HEIGHT_NEW_BLOCKS_POLL_INTERVAL,
+    BLOCK_HEIGHT_REFRESH_INTERVAL,
+    SHARED_HEIGHT_MAX_READ_ATTEMPTS,
+)
+from clove.utils.logging import logger
+
+SHARED_HEIGHT_LAYOUT = struct.Struct('<QQd')
+'''Layout of the shared memory segment: sequence number, block height and update timestamp.'''
+SEQUENCE_LAYOUT = struct.Struct('<Q')
+
+
+class SharedHeight(object):
+    '''
+    Block height kept in the memory mapped file, so it can be shared by multiple processes.
+
+    Readers never block: writer makes the sequence number odd for the time of the write (seqlock)
+    and readers retry until they read the same even sequence number before and after reading the data.
+    Writers are serialized with the file lock. If a writer dies in the middle of the write, the next writer
+    makes the sequence number even again (readers give up after `SHARED_HEIGHT_MAX_READ_ATTEMPTS` in the meantime).
+
+    File locks are available only on POSIX systems.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < SHARED_HEIGHT_LAYOUT.size:
+            os.ftruncate(self.fd, SHARED_HEIGHT_LAYOUT.size)
+        self.memory = mmap.mmap(self.fd, SHARED_HEIGHT_LAYOUT.size)
+
+    def read(self) -> Tuple[int, float]:
+        '''
+        Returns block height and timestamp of its update
+        (zeros if the height was never written or could not be read consistently).
+        '''
+        for _ in range(SHARED_HEIGHT_MAX_READ_ATTEMPTS):
+            sequence, height, updated_at = SHARED_HEIGHT_LAYOUT.unpack_from(self.memory)
+            if sequence % 2 == 0 and SEQUENCE_LAYOUT.unpack_from(self.memory)[0] == sequence:
+                return height, updated_at
+        logger.warning('Unable to read the shared block height from %s', self.path)
+        return 0, 0.0
+
+    def write(self, height: int, updated_at: float):
+        '''Saves the block height (lower heights than the saved one are ignored).'''
+        import fcntl  # not available on Windows, shared height is optional
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            sequence, current_height, _ = SHARED_HEIGHT_LAYOUT.unpack_from(self.memory)
+            if sequence % 2:
+                # previous writer died in the middle of the write
+                sequence += 1
+            height = max(height, current_height)
+            SEQUENCE_LAYOUT.pack_into(self.memory, 0, sequence + 1)
+            SHARED_HEIGHT_LAYOUT.pack_into(self.memory, 0, sequence + 1, height, updated_at)
+            SEQUENCE_LAYOUT.pack_into(self.memory, 0, sequence + 2)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self.memory.close()
+        os.close(self.fd)
+
+
+class HeightOracle(object):
+    '''
+    Keeps the latest block number of the network in memory.
+
+    Height is refreshed by the background thread every `refresh_interval` seconds or right after the new block
+    is announced. Announcements are pushed with `notify` (e.g. by `BaseNetwork.notify_new_block` when the node
+    connection receives block headers) or pulled by the thread from `new_blocks` every `new_blocks_interval` seconds
+    (e.g. the node's block filter). If the height is older than `max_age` seconds (e.g. the thread is not started),
+    it's fetched on the first access.
+
+    If `shared_path` is given, the height is kept in the memory mapped file, so all of the processes using
+    the same path share it (only one of them has to run the refreshing thread).
+
+    Args:
+        fetch (callable): returns the latest block number from the network
+        refresh_interval (float): seconds between the refreshes made by the background thread
+        max_age (float): seconds after which the height is considered stale
+        shared_path (str): path of the file shared with the other processes
+        clock (callable): returns current timestamp
+        new_blocks (callable): returns blocks announced since the last call (empty if there are none)
+        new_blocks_interval (float): seconds between the calls of `new_blocks`
+
+    Example:
+        >>> from clove.network import Bitcoin
+        >>> network = Bitcoin()
+        >>> network.use_height_oracle()
+        <clove.utils.height.HeightOracle at 0x7f3ba1d6f4a8>
+        >>> network.latest_block  # served from memory
+        518934
+    '''
+
+    def __init__(
+        self,
+        fetch: Callable[[], Optional[int]],
+        refresh_interval: float=BLOCK_HEIGHT_REFRESH_INTERVAL,
+        max_age: float=BLOCK_HEIGHT_MAX_AGE,
+        shared_path: Optional[str]=None,
+        clock: Callable[[], float]=time,
+        new_blocks: Optional[Callable[[], Iterable]]=None,
+        new_blocks_interval: float=BLOCK_HEIGHT_NEW_BLOCKS_POLL_INTERVAL,
+    ):
+        self.fetch = fetch
+        self.new_blocks = new_blocks
+        self.new_blocks_interval = new_blocks_interval
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.clock = clock
+        self.shared = SharedHeight(shared_path) if shared_path else None
+        self._height = 0
+        self._updated_at = 0.0
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+        self.wake_up = threading.Event()
+        self.thread = None
+        self.running = False
+
+    def read(self) -> Tuple[int, float]:
+        if self.shared is not None:
+            return self.shared.read()
+        with self.lock:
+            return self._height, self._updated_at
+
+    def update(self, height: int):
+        '''Saves the block height (e.g. pushed by the node), lower heights than the known one are ignored.'''
+        updated_at = self.clock()
+        if self.shared is not None:
+            self.shared.write(height, updated_at)
+            return
+        with self.lock:
+            self._height = max(self._height, height)
+            self._updated_at = updated_at
+
+    def is_fresh(self, updated_at: float) -> bool:
+        return self.clock() - updated_at <= self.max_age
+
+    @property
+    def height(self) -> Optional[int]:
+        '''The latest block number (fetched only if the known one is stale).'''
+        height, updated_at = self.read()
+        if height and self.is_fresh(updated_at):
+            return height
+        return self.refresh(force=False)
+
+    def refresh(self, force: bool=True) -> Optional[int]:
+        '''Fetches the block height from the network.'''
+        with self.fetch_lock:
+            if not force:
+                # other thread could refresh the height while we were waiting for the lock
+                height, updated_at = self.read()
+                if height and self.is_fresh(updated_at):
+                    return height
+            height = self.fetch()
+            if height is not None:
+                self.update(height)
+        return self.read()[0] or height
+
+    def notify(self):
+        '''Wakes up the refreshing thread (e.g. when the application learns about the new block).'''
+        self.wake_up.set()
+
+    def wait_for_new_block(self):
+        '''Waits for `refresh_interval` seconds or until the new block is announced.'''
+        if self.new_blocks is None:
+            self.wake_up.wait(self.refresh_interval)
+            return
+        deadline = time() + self.refresh_interval
+        while self.running and not self.wake_up.wait(min(self.new_blocks_interval, max(deadline - time(), 0))):
+            if time() >= deadline:
+                return
+            try:
+                if self.new_blocks():
+                    return
+            except Exception as e:
+                logger.warning('Unable to check for new blocks: %r', e)
+
+    def run(self):
+        while self.running:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning('Unable to refresh block height: %r', e)
+            self.wait_for_new_block()
+            self.wake_up.clear()
+
+    def start(self):
+        '''Starts the refreshing thread.'''
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='clove-height-oracle', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake_up.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
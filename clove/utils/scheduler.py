@@ -0,0 +1,231 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+import heapq
+from itertools import count
+import threading
+from typing import Callable, Optional
+
+from clove.constants import (
+    REDEEM_SAFETY_MARGIN,
+    REFUND_MTP_MARGIN,
+    SCHEDULER_MAX_ATTEMPTS,
+    SCHEDULER_MAX_WAIT,
+    SCHEDULER_MAX_WORKERS,
+    SCHEDULER_RETRY_DELAY,
+)
+from clove.utils.logging import logger
+
+REFUND = 'refund'
+REDEEM = 'redeem'
+
+
+class ScheduledJob(object):
+    '''Refund or redeem of the contract scheduled on the given date (UTC).'''
+
+    def __init__(self, contract, action: str, deadline: datetime):
+        self.contract = contract
+        self.action = action
+        self.deadline = deadline
+        self.cancelled = False
+        self.attempts = 0
+        self.future = None
+        '''Future of the handler call (set when the job is dispatched).'''
+
+    def __repr__(self):
+        return f'<ScheduledJob {self.action} {self.contract.secret_hash} at {self.deadline}>'
+
+
+class ContractScheduler(object):
+    '''
+    Dispatches refunds and redeems of the atomic swap contracts based on their locktime.
+
+    Jobs are kept in a heap ordered by the deadline. Scheduler thread sleeps until the nearest deadline
+    (or until a new job is added) and passes due jobs to the worker pool, so the contracts
+    don't have to be audited on every tick.
+
+    Refund is dispatched `refund_margin` after the contract locktime, because nodes accept the refund only
+    after the median time of the past blocks passes the locktime. Redeem is dispatched `redeem_margin` before
+    the locktime, so the contract is redeemed before the other side is able to refund it.
+
+    Job fails if the handler raises an exception or returns None (e.g. `publish()` of the rejected transaction).
+    Failed job is dispatched again after `retry_delay` (doubled after every failure), up to `max_attempts` times.
+
+    Args:
+        refund_handler (callable): called with the contract object to refund
+        redeem_handler (callable): called with the contract object to redeem
+        redeem_margin (timedelta): how long before the locktime redeem should be dispatched
+        refund_margin (timedelta): how long after the locktime refund should be dispatched
+        retry_delay (timedelta): delay before the first retry of the failed job
+        max_attempts (int): how many times the job is dispatched before giving up
+        max_workers (int): number of the worker threads
+        clock (callable): returns current date (UTC)
+
+    Example:
+        >>> from clove.utils.scheduler import ContractScheduler
+        >>> def refund(contract):
+        ...     transaction = contract.refund(alice_wallet)
+        ...     transaction.add_fee_and_sign()
+        ...     return transaction.publish()
+        >>> def redeem(contract):
+        ...     transaction = contract.redeem(alice_wallet, secret)
+        ...     transaction.add_fee_and_sign()
+        ...     return transaction.publish()
+        >>> scheduler = ContractScheduler(refund_handler=refund, redeem_handler=redeem)
+        >>> scheduler.start()
+        >>> scheduler.schedule_refund(initial_contract)
+        <ScheduledJob refund 977afed2fcdfea9d27fd3032b4a1bc20219007f1 at 2018-04-14 14:31:07>
+        >>> scheduler.schedule_redeem(participate_contract)
+        <ScheduledJob redeem 977afed2fcdfea9d27fd3032b4a1bc20219007f1 at 2018-04-13 12:31:07>
+    '''
+
+    def __init__(
+        self,
+        refund_handler: Optional[Callable]=None,
+        redeem_handler: Optional[Callable]=None,
+        redeem_margin: timedelta=REDEEM_SAFETY_MARGIN,
+        refund_margin: timedelta=REFUND_MTP_MARGIN,
+        retry_delay: timedelta=SCHEDULER_RETRY_DELAY,
+        max_attempts: int=SCHEDULER_MAX_ATTEMPTS,
+        max_workers: int=SCHEDULER_MAX_WORKERS,
+        clock: Callable[[], datetime]=datetime.utcnow,
+    ):
+        self.handlers = {REFUND: refund_handler, REDEEM: redeem_handler}
+        self.redeem_margin = redeem_margin
+        self.refund_margin = refund_margin
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.max_workers = max_workers
+        self.clock = clock
+        self.jobs = []
+        self.sequence = count()
+        self.condition = threading.Condition()
+        self.executor = None
+        self.thread = None
+        self.running = False
+
+    def schedule(self, contract, action: str, deadline: datetime) -> ScheduledJob:
+        if self.handlers.get(action) is None:
+            raise ValueError(f'There is no handler for the {action} action.')
+        job = ScheduledJob(contract, action, deadline)
+        self.push(job)
+        logger.debug('%s scheduled', job)
+        return job
+
+    def push(self, job: ScheduledJob):
+        with self.condition:
+            heapq.heappush(self.jobs, (job.deadline, next(self.sequence), job))
+            # wake up the scheduler thread if the new job is the nearest one
+            if self.jobs[0][2] is job:
+                self.condition.notify()
+
+    def schedule_refund(self, contract) -> ScheduledJob:
+        '''Schedules refund of the contract `refund_margin` after its locktime.'''
+        return self.schedule(contract, REFUND, contract.locktime + self.refund_margin)
+
+    def schedule_redeem(self, contract) -> ScheduledJob:
+        '''Schedules redeem of the contract `redeem_margin` before its locktime.'''
+        return self.schedule(contract, REDEEM, contract.locktime - self.redeem_margin)
+
+    def cancel(self, job: ScheduledJob):
+        '''Cancels the job (e.g. when the contract was redeemed by the other side).'''
+        with self.condition:
+            job.cancelled = True
+
+    def next_deadline(self) -> Optional[datetime]:
+        '''Deadline of the nearest job which is not cancelled.'''
+        with self.condition:
+            while self.jobs and self.jobs[0][2].cancelled:
+                heapq.heappop(self.jobs)
+            return self.jobs[0][0] if self.jobs else None
+
+    def pop_due_jobs(self) -> list:
+        now = self.clock()
+        jobs = []
+        with self.condition:
+            while self.jobs and self.jobs[0][0] <= now:
+                job = heapq.heappop(self.jobs)[2]
+                if not job.cancelled:
+                    jobs.append(job)
+        return jobs
+
+    def dispatch(self, job: ScheduledJob) -> Future:
+        handler = self.handlers[job.action]
+        job.attempts += 1
+        logger.info('Dispatching %s (attempt %s)', job, job.attempts)
+        if self.executor is None:
+            job.future = Future()
+            try:
+                job.future.set_result(handler(job.contract))
+            except Exception as e:
+                job.future.set_exception(e)
+        else:
+            job.future = self.executor.submit(handler, job.contract)
+        job.future.add_done_callback(lambda future: self.handle_result(job, future))
+        return job.future
+
+    def handle_result(self, job: ScheduledJob, future: Future):
+        '''Reschedules the failed job (with backoff) until it runs out of attempts.'''
+        exception = future.exception()
+        if exception is None and future.result() is not None:
+            return
+        logger.warning('%s failed: %r', job, exception)
+        if job.cancelled:
+            return
+        if job.attempts >= self.max_attempts:
+            logger.error('%s failed %s times, giving up', job, job.attempts)
+            return
+        job.deadline = self.clock() + self.retry_delay * 2 ** (job.attempts - 1)
+        self.push(job)
+        logger.debug('%s rescheduled', job)
+
+    def run_pending(self) -> list:
+        '''
+        Dispatches all of the due jobs.
+
+        Jobs are run in the worker pool if the scheduler is started, otherwise they are run in the calling thread.
+
+        Returns:
+            list: dispatched jobs
+        '''
+        jobs = self.pop_due_jobs()
+        for job in jobs:
+            self.dispatch(job)
+        return jobs
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                deadline = self.next_deadline()
+                if deadline is None:
+                    self.condition.wait()
+                    continue
+                delay = (deadline - self.clock()).total_seconds()
+                if delay > 0:
+                    # waiting is capped in case the system clock changes
+                    self.condition.wait(min(delay, SCHEDULER_MAX_WAIT))
+                    continue
+            self.run_pending()
+
+    def start(self):
+        '''Starts the scheduler thread and the worker pool.'''
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.thread = threading.Thread(target=self.run, name='clove-scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self, wait: bool=True):
+        '''Stops the scheduler thread. Already dispatched jobs are finished if `wait` is set.'''
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
@@ -0,0 +1,249 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import os
+import sqlite3
+import threading
+from typing import Optional
+from uuid import uuid4
+
+from clove.utils.logging import logger
+
+
+class SqliteStore(object):
+    '''
+    Base class for the stores kept in the sqlite database.
+
+    Every thread gets its own connection, database is opened in the WAL mode, so readers are not blocked
+    by the writer. Writes are made in `BEGIN IMMEDIATE` transactions, writers from the same process are
+    serialized by a lock and writers from the other processes are awaited (up to `timeout` seconds).
+    If no path is given, the database is kept in memory (shared by all of the threads of the store).
+    '''
+
+    schema = ''
+    '''SQL statements creating tables and indexes of the store.'''
+
+    def __init__(self, path: Optional[str]=None, timeout: float=30):
+        if path is None:
+            self.database = f'file:clove-{uuid4().hex}?mode=memory&cache=shared'
+        else:
+            self.database = f'file:{path}'
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+        # the first connection keeps the in-memory database alive
+        connection = self.connection
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(self.schema)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.database,
+                timeout=self.timeout,
+                isolation_level=None,
+                uri=True,
+                check_same_thread=False,
+            )
+            connection.row_factory = sqlite3.Row
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection
+        with self.write_lock:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    def query(self, sql: str, parameters: tuple=()) -> list:
+        return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+    def close(self):
+        with self.connections_lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+
+class ContractIndex(SqliteStore):
+    '''
+    Index of the atomic swap contracts.
+
+    Contracts can be found by secret hash, contract address, transaction address or locktime
+    (all of the lookups are using the database indexes).
+
+    Secrets of the initiated swaps are not saved unless `store_secrets` is set, because anyone who can read
+    the database could redeem the participate contract with them. With `store_secrets` the database file
+    is made readable and writable only by its owner (the sqlite journal files inherit these permissions).
+    Secrets revealed on chain (see `set_secret`) are public, so they are always saved.
+
+    Args:
+        path (str): path of the sqlite database (kept in memory if not given)
+        store_secrets (bool): save secrets of the initiated swaps
+        kwargs: other `SqliteStore` arguments
+
+    Example:
+        >>> from clove.utils.storage import ContractIndex
+        >>> index = ContractIndex('contracts.db', store_secrets=True)
+        >>> index.add(initial_transaction)
+        >>> index.add(participate_contract)
+        >>> [contract['network'] for contract in index.find_by_secret_hash(initial_transaction.secret_hash.hex())]
+        ['test-bitcoin', 'test-litecoin']
+    '''
+
+    schema = '''
+        CREATE TABLE IF NOT EXISTS contracts (
+            id INTEGER PRIMARY KEY,
+            network TEXT NOT NULL,
+            symbol TEXT,
+            contract_address TEXT NOT NULL,
+            transaction_address TEXT NOT NULL,
+            secret_hash TEXT NOT NULL,
+            secret TEXT,
+            locktime INTEGER NOT NULL,
+            recipient_address TEXT NOT NULL,
+            refund_address TEXT NOT NULL,
+            value REAL,
+            token_address TEXT,
+            contract TEXT,
+            raw_transaction TEXT,
+            UNIQUE (network, transaction_address, secret_hash)
+        );
+        CREATE INDEX IF NOT EXISTS contracts_secret_hash ON contracts (secret_hash);
+        CREATE INDEX IF NOT EXISTS contracts_contract_address ON contracts (contract_address);
+        CREATE INDEX IF NOT EXISTS contracts_transaction_address ON contracts (transaction_address);
+        CREATE INDEX IF NOT EXISTS contracts_network_locktime ON contracts (network, locktime);
+    '''
+
+    fields = (
+        'network', 'symbol', 'contract_address', 'transaction_address', 'secret_hash', 'secret', 'locktime',
+        'recipient_address', 'refund_address', 'value', 'token_address', 'contract', 'raw_transaction',
+    )
+    optional_fields = ('secret', 'token_address', 'contract', 'raw_transaction')
+    '''Fields which are not overwritten with empty values when the contract is added again.'''
+
+    def __init__(self, path: Optional[str]=None, store_secrets: bool=False, **kwargs):
+        self.store_secrets = store_secrets
+        if store_secrets and path is not None:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+            os.chmod(path, 0o600)
+        super().__init__(path, **kwargs)
+
+    @staticmethod
+    def get_contracts_details(item) -> list:
+        '''
+        Returns details of the contracts to index.
+
+        Args:
+            item: `BitcoinAtomicSwapTransaction`, `BitcoinAtomicSwapBatchTransaction`, `BitcoinContract`
+                or `EthereumContract` object
+        '''
+        network = item.network
+        common = {'network': network.name, 'symbol': getattr(item, 'symbol', network.default_symbol)}
+
+        if hasattr(item, 'get_contracts_details'):
+            # batch transaction, one contract per leg
+            return [dict(common, **details) for details in item.get_contracts_details()]
+
+        if hasattr(item, 'tx_dict'):
+            # Ethereum contract
+            return [dict(
+                common,
+                contract_address=item.contract_address,
+                transaction_address=item.tx_dict['hash'].hex(),
+                secret_hash=item.secret_hash,
+                locktime=item.locktime,
+                recipient_address=item.recipient_address,
+                refund_address=item.refund_address,
+                value=item.value,
+                token_address=getattr(item, 'token_address', None),
+            )]
+
+        if hasattr(item, 'sender_address'):
+            # atomic swap transaction
+            return [dict(common, **item.show_details())]
+
+        # Bitcoin contract
+        return [dict(
+            common,
+            contract_address=item.address,
+            transaction_address=item.transaction_address,
+            secret_hash=item.secret_hash,
+            locktime=item.locktime,
+            recipient_address=item.recipient_address,
+            refund_address=item.refund_address,
+            value=item.value,
+            contract=item.contract,
+        )]
+
+    def get_row(self, details: dict) -> tuple:
+        row = dict(details)
+        row.setdefault('raw_transaction', row.get('contract_transaction'))
+        row['secret'] = (row.get('secret') or None) if self.store_secrets else None
+        row['locktime'] = int(row['locktime'].replace(tzinfo=timezone.utc).timestamp())
+        return tuple(row.get(field) for field in self.fields)
+
+    def add(self, *items):
+        '''
+        Adds (or updates) contracts of the given transactions and contracts to the index.
+
+        Args:
+            items: `BitcoinAtomicSwapTransaction`, `BitcoinAtomicSwapBatchTransaction`, `BitcoinContract`
+                or `EthereumContract` objects
+        '''
+        rows = [self.get_row(details) for item in items for details in self.get_contracts_details(item)]
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join('?' for _ in self.fields)
+        updates = ', '.join(
+            f'{field} = COALESCE(?, {field})' if field in self.optional_fields else f'{field} = ?'
+            for field in self.fields
+        )
+        with self.transaction() as connection:
+            connection.executemany(f'INSERT OR IGNORE INTO contracts ({columns}) VALUES ({placeholders})', rows)
+            connection.executemany(
+                f'UPDATE contracts SET {updates} WHERE network = ? AND transaction_address = ? AND secret_hash = ?',
+                [row + (row[0], row[3], row[4]) for row in rows],
+            )
+        logger.debug('%s contracts indexed', len(rows))
+
+    def set_secret(self, secret_hash: str, secret: str) -> int:
+        '''Saves revealed secret for all contracts with the given secret hash. Returns number of updated contracts.'''
+        with self.transaction() as connection:
+            return connection.execute(
+                'UPDATE contracts SET secret = ? WHERE secret_hash = ?', (secret, secret_hash)
+            ).rowcount
+
+    def find(self, where: str, parameters: tuple) -> list:
+        contracts = self.query(f'SELECT * FROM contracts WHERE {where} ORDER BY locktime, id', parameters)
+        for contract in contracts:
+            contract.pop('id')
+            contract['locktime'] = datetime.utcfromtimestamp(contract['locktime'])
+        return contracts
+
+    def find_by_secret_hash(self, secret_hash: str) -> list:
+        '''Returns all contracts using the given secret hash (e.g. initial and participate contracts of the swap).'''
+        return self.find('secret_hash = ?', (secret_hash, ))
+
+    def find_by_contract_address(self, contract_address: str) -> list:
+        return self.find('contract_address = ?', (contract_address, ))
+
+    def find_by_transaction_address(self, transaction_address: str) -> list:
+        return self.find('transaction_address = ?', (transaction_address, ))
+
+    def find_expiring(self, network: str, before: datetime) -> list:
+        '''Returns contracts from the given network with locktime before the given date (UTC).'''
+        timestamp = int(before.replace(tzinfo=timezone.utc).timestamp())
+        return self.find('network = ? AND locktime <= ?', (network, timestamp))
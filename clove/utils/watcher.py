@@ -0,0 +1,301 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import heapq
+from itertools import count
+import threading
+from typing import Callable, Optional
+
+from bitcoin.core import x
+
+from clove.constants import (
+    SCHEDULER_MAX_WAIT,
+    SECRET_WATCHER_BACKOFF,
+    SECRET_WATCHER_EXPIRE_MARGIN,
+    SECRET_WATCHER_MAX_INTERVAL,
+    SECRET_WATCHER_MAX_WORKERS,
+    SECRET_WATCHER_MIN_INTERVAL,
+)
+from clove.network.bitcoin.htlc import extract_secret_from_script_sig, is_refund_script_sig
+from clove.utils.logging import logger
+
+REFUNDED = 'refunded'
+EXPIRED = 'expired'
+
+
+class WatchedContract(object):
+    '''Contract watched by the `SecretWatcher` with its polling state.'''
+
+    def __init__(self, contract, callback: Callable, interval: timedelta, next_poll: datetime):
+        self.contract = contract
+        self.callback = callback
+        self.interval = interval
+        self.next_poll = next_poll
+        self.active = True
+        self.event_filter = None
+        '''Redeem event filter created on the node (only for the networks supporting filtering).'''
+        self.refunded = False
+        '''Contract output was spent with the refund branch of the contract (only for the Bitcoin based networks).'''
+
+    @property
+    def network_name(self) -> str:
+        return self.contract.network.name
+
+    def __repr__(self):
+        return f'<WatchedContract {self.network_name} {self.contract.secret_hash}>'
+
+
+class SecretWatcher(object):
+    '''
+    Watches atomic swap contracts on any network and reports the secret as soon as the contract is redeemed.
+
+    Contracts are polled in adaptive intervals: interval starts at `min_interval` and grows `backoff` times
+    after every poll without the secret (up to `max_interval`). The last poll before the contract locktime
+    is made exactly on the locktime. Due contracts are polled in batches, one batch per network,
+    and the batches are run concurrently.
+
+    Contract is no longer watched when it's refunded (Bitcoin contract output spent by the refund branch
+    of the contract) or when `expire_margin` passes after the locktime without the secret.
+    Both cases are reported to the `expired_callback`. Errors of the lookups (e.g. block explorer failures
+    or spending transaction not known to the explorer yet) only postpone the next poll.
+
+    Polling is as cheap as the backend allows:
+
+    * Ethereum networks with the event indexer (see `use_event_indexer`) look up the secret in the local index.
+    * Ethereum networks supporting filtering keep the redeem event filter on the node and receive only new events.
+    * Bitcoin based networks skip downloading the contract address history while the contract is still funded.
+
+    Args:
+        callback (callable): called with the contract and the secret (hex string) when the secret is found
+        expired_callback (callable): called with the contract and the reason (`refunded` or `expired`)
+            when the contract is no longer watched without the secret
+        min_interval (timedelta): the shortest interval between the polls of the contract
+        max_interval (timedelta): the longest interval between the polls of the contract
+        backoff (float): interval multiplier used after every poll without the secret
+        expire_margin (timedelta): how long after the locktime the contract is watched
+        max_workers (int): number of the networks polled at the same time
+        clock (callable): returns current date (UTC)
+
+    Example:
+        >>> from clove.utils.watcher import SecretWatcher
+        >>> watcher = SecretWatcher(callback=lambda contract, secret: initial_contract.redeem(secret).publish())
+        >>> watcher.watch(participate_contract)
+        <WatchedContract ethereum 977afed2fcdfea9d27fd3032b4a1bc20219007f1>
+        >>> watcher.start()
+    '''
+
+    def __init__(
+        self,
+        callback: Optional[Callable]=None,
+        expired_callback: Optional[Callable]=None,
+        min_interval: timedelta=SECRET_WATCHER_MIN_INTERVAL,
+        max_interval: timedelta=SECRET_WATCHER_MAX_INTERVAL,
+        backoff: float=SECRET_WATCHER_BACKOFF,
+        expire_margin: timedelta=SECRET_WATCHER_EXPIRE_MARGIN,
+        max_workers: int=SECRET_WATCHER_MAX_WORKERS,
+        clock: Callable[[], datetime]=datetime.utcnow,
+    ):
+        self.callback = callback
+        self.expired_callback = expired_callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.expire_margin = expire_margin
+        self.max_workers = max_workers
+        self.clock = clock
+        self.queue = []
+        self.sequence = count()
+        self.condition = threading.Condition()
+        self.executor = None
+        self.thread = None
+        self.running = False
+
+    def push(self, watched: WatchedContract):
+        with self.condition:
+            heapq.heappush(self.queue, (watched.next_poll, next(self.sequence), watched))
+            if self.queue[0][2] is watched:
+                self.condition.notify()
+
+    def watch(self, contract, callback: Optional[Callable]=None) -> WatchedContract:
+        '''
+        Starts watching the contract.
+
+        Args:
+            contract: `BitcoinContract` or `EthereumContract` object
+            callback (callable): callback used instead of the default one for this contract
+
+        Returns:
+            WatchedContract: object which can be passed to `unwatch`
+        '''
+        callback = callback or self.callback
+        if callback is None:
+            raise ValueError('Callback is required.')
+        watched = WatchedContract(contract, callback, self.min_interval, self.clock())
+        self.push(watched)
+        logger.debug('Watching %s', watched)
+        return watched
+
+    def unwatch(self, watched: WatchedContract):
+        with self.condition:
+            watched.active = False
+
+    @staticmethod
+    def fetch_secret(watched: WatchedContract) -> Optional[str]:
+        '''Returns secret of the contract or None if the contract was not redeemed yet.'''
+        contract = watched.contract
+        network = contract.network
+
+        if not network.ethereum_based:
+            contract.refresh()
+            if contract.balance:
+                # contract is still funded, so it cannot be redeemed yet
+                return
+            try:
+                script_sig = network.get_spending_script_sig(
+                    contract.address, contract.transaction_address, contract.vout_index
+                )
+            except ValueError as e:
+                # explorer failed or it doesn't know the spending transaction yet, contract is polled again later
+                logger.debug('%s: %s', watched, e)
+                return
+            if not script_sig:
+                return
+            script_sig = x(script_sig)
+            secret = extract_secret_from_script_sig(script_sig)
+            if secret is not None:
+                return secret.hex()
+            watched.refunded = is_refund_script_sig(script_sig)
+            return
+
+        if network.event_indexer is not None:
+            # new blocks are scanned once for all of the contracts of the network
+            return contract.find_secret()
+
+        if network.filtering_supported:
+            if watched.event_filter is None:
+                watched.event_filter = network.create_redeem_event_filter(
+                    contract.recipient_address, contract.secret_hash, contract.block_number
+                )
+                events = watched.event_filter.get_all_entries()
+            else:
+                events = watched.event_filter.get_new_entries()
+            if events:
+                return network.get_redeem_event_details(events[0])['secret']
+            return
+
+        redeem_transaction_hash = contract.find_redeem_transaction()
+        if redeem_transaction_hash:
+            return network.extract_secret_from_redeem_transaction(redeem_transaction_hash)
+
+    def get_next_interval(self, watched: WatchedContract, now: datetime) -> timedelta:
+        interval = min(watched.interval * self.backoff, self.max_interval)
+        until_locktime = watched.contract.locktime - now
+        if timedelta(0) < until_locktime < interval:
+            # don't sleep through the locktime, it's the last moment to redeem the contract
+            interval = max(until_locktime, self.min_interval)
+        return interval
+
+    def poll(self, watched: WatchedContract) -> Optional[str]:
+        '''Polls the contract once, calls the callback if the secret was found or reschedules the next poll.'''
+        try:
+            secret = self.fetch_secret(watched)
+        except NotImplementedError:
+            logger.warning('%s: network is not supported, contract will not be watched.', watched)
+            return
+        except Exception as e:
+            logger.warning('%s: polling failed: %r', watched, e)
+            secret = None
+
+        if secret:
+            logger.info('Secret found for %s', watched)
+            watched.active = False
+            try:
+                watched.callback(watched.contract, secret)
+            except Exception as e:
+                logger.error('%s: callback failed: %r', watched, e)
+            return secret
+
+        if watched.refunded:
+            self.finish(watched, REFUNDED)
+            return
+        now = self.clock()
+        if now > watched.contract.locktime + self.expire_margin:
+            self.finish(watched, EXPIRED)
+            return
+
+        watched.interval = self.get_next_interval(watched, now)
+        watched.next_poll = now + watched.interval
+        if watched.active:
+            self.push(watched)
+
+    def finish(self, watched: WatchedContract, reason: str):
+        '''Stops watching the contract which will not reveal the secret.'''
+        logger.info('%s %s, no longer watched', watched, reason)
+        watched.active = False
+        if self.expired_callback is None:
+            return
+        try:
+            self.expired_callback(watched.contract, reason)
+        except Exception as e:
+            logger.error('%s: expired callback failed: %r', watched, e)
+
+    def poll_batch(self, batch: list) -> list:
+        return [secret for secret in (self.poll(watched) for watched in batch) if secret]
+
+    def pop_due(self) -> dict:
+        '''Pops contracts due for polling, grouped by the network name.'''
+        now = self.clock()
+        batches = defaultdict(list)
+        with self.condition:
+            while self.queue and self.queue[0][0] <= now:
+                watched = heapq.heappop(self.queue)[2]
+                if watched.active:
+                    batches[watched.network_name].append(watched)
+        return batches
+
+    def poll_pending(self) -> list:
+        '''
+        Polls all of the due contracts in the calling thread.
+
+        Returns:
+            list: found secrets
+        '''
+        return [secret for batch in self.pop_due().values() for secret in self.poll_batch(batch)]
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                while self.queue and not self.queue[0][2].active:
+                    heapq.heappop(self.queue)
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+                delay = (self.queue[0][0] - self.clock()).total_seconds()
+                if delay > 0:
+                    self.condition.wait(min(delay, SCHEDULER_MAX_WAIT))
+                    continue
+            for batch in self.pop_due().values():
+                self.executor.submit(self.poll_batch, batch)
+
+    def start(self):
+        '''Starts the watcher thread.'''
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.thread = threading.Thread(target=self.run, name='clove-secret-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -10,6 +10,7 @@ import pytest
 
 from clove.network.bitcoin import BitcoinTestNet
 from clove.network.bitcoin.utxo import Utxo
+from clove.network.ethereum.base import EthereumBaseNetwork
 
 Key = namedtuple('Key', ['secret', 'address'])
 
@@ -138,6 +139,8 @@ def web3_request_side_effect(method, params):
 
 @pytest.fixture
 def web3_request_mock():
+    EthereumBaseNetwork.nonce_managers.clear()
+    EthereumBaseNetwork.token_registries.clear()
     with patch('web3.manager.RequestManager.request_blocking', side_effect=web3_request_side_effect):
         yield
 
@@ -1,14 +1,17 @@
 from datetime import datetime, timedelta
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
-from bitcoin.core import CTransaction, b2x, script
+from bitcoin.core import COIN, CTransaction, b2lx, b2x, script
 from freezegun import freeze_time
 import pytest
 from pytest import raises
 
-from clove.constants import SIGNATURE_SIZE
+from clove.constants import MAX_SIGNATURE_SIZE, SEQUENCE_NO_RBF, SEQUENCE_RBF, SIGNATURE_SIZE
+from clove.exceptions import ImpossibleDeserialization
 from clove.network import BitcoinTestNet, EthereumTestnet, Litecoin
+from clove.network.bitcoin.contract import BitcoinContract
 from clove.network.bitcoin.transaction import BitcoinAtomicSwapTransaction, BitcoinTransaction
+from clove.network.bitcoin.utxo import Utxo
 from clove.utils.bitcoin import to_base_units
 
 
@@ -134,6 +137,13 @@ def test_transaction_with_invalid_recipient_address():
         BitcoinTransaction(BitcoinTestNet(), 'invalid_address', 0.01, [])
 
 
+def test_transaction_requires_exactly_one_value(alice_wallet):
+    with raises(ValueError, match='Exactly one of value and value_satoshi has to be given.'):
+        BitcoinTransaction(BitcoinTestNet(), alice_wallet.address, solvable_utxo=[])
+    with raises(ValueError, match='Exactly one of value and value_satoshi has to be given.'):
+        BitcoinTransaction(BitcoinTestNet(), alice_wallet.address, 0.01, [], value_satoshi=1000000)
+
+
 def test_swap_transaction_with_invalid_recipient_address(bob_wallet):
     with raises(ValueError, match='Given recipient address is invalid.'):
         BitcoinAtomicSwapTransaction(BitcoinTestNet(), bob_wallet.address, 'invalid_address', 0.01, [])
@@ -204,6 +214,14 @@ def test_audit_contract_non_matching_contract(_, signed_transaction):
         btc_network.audit_contract(contract, transaction_details['contract_transaction'])
 
 
+def test_is_valid_contract_script(signed_transaction):
+    contract = signed_transaction.contract
+    assert BitcoinContract.is_valid_contract_script(contract)
+    assert BitcoinContract.is_valid_contract_script(list(contract))
+    assert not BitcoinContract.is_valid_contract_script([script.OP_TRUE])
+    assert not BitcoinContract.is_valid_contract_script(list(contract)[:-1])
+
+
 @patch('clove.network.bitcoin.contract.get_balance', return_value=0.01)
 def test_audit_contract_by_address_blockcypher(get_balance_mock):
     btc_network = BitcoinTestNet()
@@ -429,3 +447,426 @@ def test_transaction_link_in_unsigned_transaction(unsigned_transaction):
 def test_transaction_link_in_signed_transaction(signed_transaction):
 
     assert signed_transaction.show_details()['transaction_link'].startswith('http')
+
+
+@patch('clove.network.bitcoin.contract.get_balance', return_value=0.01)
+def test_atomic_swap_batch(_, alice_wallet, bob_wallet, alice_utxo):
+    btc_network = BitcoinTestNet()
+    transaction = btc_network.atomic_swap_batch(
+        alice_wallet.address,
+        [
+            {'recipient_address': bob_wallet.address, 'value': 0.2},
+            {
+                'recipient_address': bob_wallet.address,
+                'value': 0.3,
+                'secret_hash': '977afed2fcdfea9d27fd3032b4a1bc20219007f1',
+            },
+        ],
+        alice_utxo,
+    )
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+
+    assert len(transaction.tx.vout) == 3
+    assert transaction.value == 0.5
+
+    details = transaction.show_details()
+    first_leg, second_leg = details['contracts']
+    assert first_leg['secret']
+    assert second_leg['secret'] == ''
+    assert second_leg['secret_hash'] == '977afed2fcdfea9d27fd3032b4a1bc20219007f1'
+    assert first_leg['locktime'] > second_leg['locktime']
+
+    for vout, leg_details in enumerate(details['contracts']):
+        contract = btc_network.audit_contract(leg_details['contract'], leg_details['contract_transaction'])
+        assert contract.vout_index == vout
+        contract_details = contract.show_details()
+        contract_details.pop('locktime')
+        contract_details.pop('confirmations')
+        for field in contract_details.keys():
+            assert contract_details[field] == leg_details[field]
+
+
+@patch('clove.network.bitcoin.contract.get_balance', return_value=0.01)
+def test_atomic_swap_batch_redeem(_, alice_wallet, bob_wallet, alice_utxo):
+    btc_network = BitcoinTestNet()
+    transaction = btc_network.atomic_swap_batch(
+        alice_wallet.address,
+        [
+            {'recipient_address': bob_wallet.address, 'value': 0.2},
+            {'recipient_address': bob_wallet.address, 'value': 0.3},
+        ],
+        alice_utxo,
+    )
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+    leg_details = transaction.show_details()['contracts'][1]
+
+    contract = btc_network.audit_contract(leg_details['contract'], leg_details['contract_transaction'])
+    redeem_transaction = contract.redeem(bob_wallet, leg_details['secret'])
+    redeem_transaction.fee_per_kb = 0.002
+    redeem_transaction.add_fee_and_sign()
+
+    assert redeem_transaction.tx.vin[0].prevout.n == 1
+    assert redeem_transaction.value == 0.3
+
+
+def test_atomic_swap_batch_without_legs(alice_wallet, alice_utxo):
+    with raises(ValueError, match='At least one atomic swap leg is required.'):
+        BitcoinTestNet().atomic_swap_batch(alice_wallet.address, [], alice_utxo)
+
+
+def test_atomic_swap_batch_with_duplicate_legs(alice_wallet, bob_wallet, alice_utxo):
+    leg = {
+        'recipient_address': bob_wallet.address,
+        'value': 0.2,
+        'secret_hash': '977afed2fcdfea9d27fd3032b4a1bc20219007f1',
+        'locktime': datetime(2018, 4, 13, 12),
+    }
+    with raises(ValueError, match='have to differ'):
+        BitcoinTestNet().atomic_swap_batch(alice_wallet.address, [leg, dict(leg, value=0.3)], alice_utxo)
+
+
+@pytest.fixture
+def batch_contracts(alice_wallet, bob_wallet, alice_utxo):
+    btc_network = BitcoinTestNet()
+    transaction = btc_network.atomic_swap_batch(
+        alice_wallet.address,
+        [
+            {'recipient_address': bob_wallet.address, 'value': 0.2},
+            {'recipient_address': bob_wallet.address, 'value': 0.3},
+        ],
+        alice_utxo,
+    )
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+    contracts = []
+    with patch('clove.network.bitcoin.contract.get_balance', return_value=0.01):
+        for leg_details in transaction.show_details()['contracts']:
+            contract = btc_network.audit_contract(leg_details['contract'], leg_details['contract_transaction'])
+            contracts.append((contract, leg_details['secret']))
+    return contracts
+
+
+def test_redeem_many(bob_wallet, batch_contracts):
+    redeem_transaction = BitcoinTestNet().redeem_many(batch_contracts, bob_wallet)
+    redeem_transaction.fee_per_kb = 0.002
+    redeem_transaction.add_fee_and_sign()
+
+    assert len(redeem_transaction.tx.vin) == 2
+    assert len(redeem_transaction.tx.vout) == 1
+    assert redeem_transaction.recipient_address == bob_wallet.address
+    assert redeem_transaction.value == 0.5
+
+    secrets = [secret for _, secret in batch_contracts]
+    for tx_in in redeem_transaction.tx.vin:
+        assert BitcoinTestNet.extract_secret(scriptsig=tx_in.scriptSig.hex()) in secrets
+
+
+def test_refund_many(alice_wallet, batch_contracts):
+    contracts = [contract for contract, _ in batch_contracts]
+    locktime = max(contract.locktime for contract in contracts)
+
+    with freeze_time(locktime - timedelta(seconds=1)):
+        with raises(RuntimeError, match="Some of the contracts are still valid!"):
+            BitcoinTestNet().refund_many(contracts, alice_wallet)
+
+    with freeze_time(locktime):
+        refund_transaction = BitcoinTestNet().refund_many(contracts, alice_wallet)
+    refund_transaction.fee_per_kb = 0.002
+    refund_transaction.add_fee_and_sign()
+
+    assert len(refund_transaction.tx.vin) == 2
+    assert refund_transaction.recipient_address == alice_wallet.address
+    assert refund_transaction.tx.nLockTime == max(contract.locktime_timestamp for contract in contracts)
+
+
+def test_redeem_many_different_recipients(alice_wallet, bob_wallet, batch_contracts, btc_testnet_contract):
+    contracts_with_secrets = batch_contracts + [(btc_testnet_contract, 'secret')]
+    btc_testnet_contract.recipient_address = alice_wallet.address
+    with raises(ValueError, match='All contracts have to use the same recipient address.'):
+        BitcoinTestNet().redeem_many(contracts_with_secrets, bob_wallet)
+
+
+def test_refund_many_zero_balance(alice_wallet, batch_contracts):
+    contract = batch_contracts[0][0]
+    contract.balance = 0
+    with raises(ValueError, match=f'Balance of contract {contract.address} is 0.'):
+        BitcoinTestNet().refund_many([contract], alice_wallet)
+
+
+def test_transaction_amounts_in_satoshis(alice_wallet, bob_wallet):
+    utxo = [
+        Utxo(
+            tx_id='6ecd66d88b1a976cde70ebbef1909edec5db80cff9b8b97024ea3805dbe28ab8',
+            vout=1,
+            satoshis=30000000,
+            tx_script='76a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b88ac',
+            wallet=alice_wallet,
+        ),
+    ]
+    transaction = BitcoinTestNet().atomic_swap(alice_wallet.address, bob_wallet.address, 0.1, utxo)
+    transaction.fee_per_kb = 0.00012345
+    transaction.add_fee_and_sign()
+
+    assert transaction.value_satoshi == 10000000
+    assert transaction.utxo_value_satoshi == 30000000
+    assert isinstance(transaction.fee_satoshi, int)
+    assert transaction.tx.vout[0].nValue == 10000000
+    assert transaction.tx.vout[1].nValue == 20000000 - transaction.fee_satoshi
+    assert transaction.fee == transaction.fee_satoshi / COIN
+
+
+def test_transaction_is_not_replaceable_by_default(signed_transaction):
+    assert signed_transaction.rbf is False
+    assert all(tx_in.nSequence == SEQUENCE_NO_RBF for tx_in in signed_transaction.tx.vin)
+
+    with raises(RuntimeError, match='does not signal replaceability'):
+        signed_transaction.bump_fee(0.004)
+
+
+def test_bump_fee(alice_wallet, bob_wallet, alice_utxo):
+    network = BitcoinTestNet()
+    transaction = network.atomic_swap(alice_wallet.address, bob_wallet.address, 0.7, alice_utxo, rbf=True)
+    assert all(tx_in.nSequence == SEQUENCE_RBF for tx_in in transaction.tx.vin)
+
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+    previous_fee = transaction.fee_satoshi
+    previous_address = transaction.address
+    change = transaction.tx.vout[1].nValue
+
+    with raises(ValueError, match='has to be higher'):
+        transaction.bump_fee(0.001)
+
+    network.bump_fee(transaction, 0.004)
+    assert transaction.fee_per_kb == 0.004
+    assert transaction.fee_satoshi > previous_fee
+    assert transaction.tx.vout[0].nValue == to_base_units(0.7)
+    assert transaction.tx.vout[1].nValue == change + previous_fee - transaction.fee_satoshi
+    assert transaction.address != previous_address
+    assert transaction.tx.vin[0].prevout == alice_utxo[0].outpoint
+
+
+def test_bump_fee_without_enough_change(alice_wallet, bob_wallet, alice_utxo):
+    transaction = BitcoinTestNet().atomic_swap(alice_wallet.address, bob_wallet.address, 0.7, alice_utxo, rbf=True)
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+    raw_transaction = transaction.raw_transaction
+
+    with raises(RuntimeError, match='Cannot subtract fee'):
+        transaction.bump_fee(100)
+    assert transaction.raw_transaction == raw_transaction
+    assert transaction.fee_per_kb == 0.002
+
+
+def test_bump_fee_without_change(alice_wallet, bob_wallet, alice_utxo):
+    transaction = BitcoinTestNet().atomic_swap(
+        alice_wallet.address, bob_wallet.address, 0.78956946, alice_utxo, rbf=True
+    )
+    transaction.fee_per_kb = 0.002
+    transaction.sign()
+
+    with raises(ValueError, match='no change output'):
+        transaction.bump_fee(0.004)
+
+
+def test_child_pays_for_parent(signed_transaction, alice_wallet):
+    network = BitcoinTestNet()
+    child = network.child_pays_for_parent(signed_transaction, 0.01, alice_wallet)
+    change = signed_transaction.tx.vout[1]
+
+    assert child.signed
+    assert child.recipient_address == alice_wallet.address
+    assert b2x(child.tx.vin[0].prevout.hash[::-1]) == signed_transaction.address
+    assert child.tx.vin[0].prevout.n == 1
+
+    package_fee = to_base_units(0.01 / 1000 * (signed_transaction.size + child.size))
+    assert signed_transaction.fee_satoshi + child.fee_satoshi >= package_fee
+    # fee would be enough even with the biggest signature
+    signature = list(child.tx.vin[0].scriptSig)[0]
+    worst_child_size = child.size + MAX_SIGNATURE_SIZE - len(signature)
+    package_fee = to_base_units(0.01 / 1000 * (signed_transaction.size + worst_child_size))
+    assert signed_transaction.fee_satoshi + child.fee_satoshi == package_fee
+    assert child.tx.vout[0].nValue == change.nValue - child.fee_satoshi
+
+
+def test_child_pays_for_parent_without_change(alice_wallet, bob_wallet, alice_utxo):
+    transaction = BitcoinTestNet().atomic_swap(alice_wallet.address, bob_wallet.address, 0.78956946, alice_utxo)
+    transaction.sign()
+    with raises(RuntimeError, match='no change output'):
+        transaction.build_cpfp_transaction(0.01, alice_wallet)
+
+
+def test_presigned_refund(alice_wallet, bob_wallet, alice_utxo):
+    network = BitcoinTestNet()
+    transaction = network.atomic_swap(alice_wallet.address, bob_wallet.address, 0.7, alice_utxo, presign_refund=True)
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+
+    refund_transaction = transaction.refund_transaction
+    assert refund_transaction.signed
+    assert refund_transaction.recipient_address == alice_wallet.address
+    assert refund_transaction.tx.nLockTime == transaction.locktime_timestamp
+    assert refund_transaction.tx.vin[0].nSequence == SEQUENCE_NO_RBF
+    assert b2x(refund_transaction.tx.vin[0].prevout.hash[::-1]) == transaction.address
+    assert refund_transaction.tx.vout[0].nValue == to_base_units(0.7) - refund_transaction.fee_satoshi
+
+    details = transaction.show_details()
+    assert details['refund_transaction'] == refund_transaction.raw_transaction
+    assert details['refund_transaction_address'] == refund_transaction.address
+
+    with raises(RuntimeError, match="This contract is still valid! It can't be refunded until"):
+        transaction.publish_refund()
+
+    with freeze_time(transaction.locktime + timedelta(minutes=1)):
+        with patch.object(BitcoinTestNet, 'publish', return_value='refund') as publish_mock:
+            assert transaction.publish_refund() == 'refund'
+    publish_mock.assert_called_once_with(
+        refund_transaction.tx,
+        refund_transaction.fee_satoshi,
+        refund_transaction.serialized_transaction,
+        refund_transaction.transaction_hash,
+    )
+
+
+def test_presigned_refund_is_rebuilt_after_bump_fee(alice_wallet, bob_wallet, alice_utxo):
+    transaction = BitcoinTestNet().atomic_swap(
+        alice_wallet.address, bob_wallet.address, 0.7, alice_utxo, rbf=True, presign_refund=True
+    )
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee_and_sign()
+    transaction.bump_fee(0.004)
+
+    assert b2x(transaction.refund_transaction.tx.vin[0].prevout.hash[::-1]) == transaction.address
+    assert transaction.refund_transaction.fee_per_kb == 0.002
+
+
+def test_refund_transaction_requires_signed_contract(unsigned_transaction):
+    assert 'refund_transaction' not in unsigned_transaction.show_details()
+    with raises(RuntimeError, match='has to be signed'):
+        unsigned_transaction.build_refund_transaction()
+    with raises(RuntimeError, match='was not created'):
+        unsigned_transaction.publish_refund()
+
+
+def test_serialized_transaction_is_cached(unsigned_transaction, alice_wallet):
+    transaction = unsigned_transaction
+    serialized_transaction = transaction.serialized_transaction
+    assert transaction.serialized_transaction is serialized_transaction
+    assert transaction.transaction_hash is transaction.transaction_hash
+
+    transaction.fee_per_kb = 0.002
+    transaction.add_fee()
+    assert transaction.serialized_transaction != serialized_transaction
+    serialized_transaction = transaction.serialized_transaction
+
+    transaction.sign(alice_wallet)
+    assert transaction.serialized_transaction == transaction.tx.serialize() != serialized_transaction
+    assert transaction.address == b2lx(transaction.tx.GetHash())
+    assert transaction.size == len(transaction.tx.serialize())
+
+
+@patch('clove.network.bitcoin.contract.get_balance', return_value=0.7)
+def test_audit_contracts(_, signed_transaction):
+    network = BitcoinTestNet()
+    details = signed_transaction.show_details()
+    items = [
+        {'contract': details['contract'], 'raw_transaction': details['contract_transaction']},
+        {'contract': details['contract'], 'transaction_address': details['transaction_address']},
+        {'contract': details['contract'], 'transaction_address': details['transaction_address']},
+        {'contract': details['contract'], 'raw_transaction': 'invalid'},
+    ]
+    transaction_json = {'hex': details['contract_transaction'], 'block_height': 1300000}
+
+    with patch.object(BitcoinTestNet, 'get_transaction', return_value=transaction_json), \
+            patch.object(BitcoinTestNet, 'latest_block', new_callable=PropertyMock, return_value=1300010) as block_mock:
+        results = network.audit_contracts(items)
+
+    block_mock.assert_called_once_with()
+    assert len(results) == 4
+    contracts = [contract for contract, error in results[:3]]
+    assert [error for contract, error in results[:3]] == [None, None, None]
+    assert [contract.confirmations for contract in contracts] == [None, 10, 10]
+    assert all(contract.secret_hash == details['secret_hash'] for contract in contracts)
+
+    contract, error = results[3]
+    assert contract is None
+    assert isinstance(error, ImpossibleDeserialization)
+
+
+def test_audit_contracts_without_items():
+    assert BitcoinTestNet().audit_contracts([]) == []
+
+
+def test_audit_contract_is_lazy(signed_transaction):
+    details = signed_transaction.show_details()
+    with patch('clove.network.bitcoin.contract.get_balance', return_value=0.7) as balance_mock:
+        contract = BitcoinTestNet().audit_contract(details['contract'], details['contract_transaction'])
+        balance_mock.assert_not_called()
+        assert contract.confirmations is None
+
+        assert contract.balance == 0.7
+        assert contract.balance == 0.7
+        balance_mock.assert_called_once_with(contract.network, contract.address)
+
+        balance_mock.return_value = 0
+        contract.refresh()
+        assert contract.balance == 0
+        assert balance_mock.call_count == 2
+
+
+def test_contract_confirmations_are_lazy(signed_transaction):
+    details = signed_transaction.show_details()
+    transaction_json = {'hex': details['contract_transaction'], 'block_height': 1300000}
+
+    with patch.object(BitcoinTestNet, 'get_transaction', return_value=transaction_json), \
+            patch.object(BitcoinTestNet, 'latest_block', new_callable=PropertyMock, return_value=1300001) as block_mock:
+        contract = BitcoinTestNet().audit_contract(
+            details['contract'], transaction_address=details['transaction_address']
+        )
+        block_mock.assert_not_called()
+
+        assert contract.confirmations == 1
+        assert contract.confirmations == 1
+        assert block_mock.call_count == 1
+
+        block_mock.return_value = 1300005
+        contract.refresh()
+        assert contract.confirmations == 5
+
+
+def test_unconfirmed_contract_has_no_confirmations(signed_transaction):
+    details = signed_transaction.show_details()
+    transaction_json = {'hex': details['contract_transaction'], 'block_height': -1}
+
+    with patch.object(BitcoinTestNet, 'get_transaction', return_value=transaction_json) as transaction_mock, \
+            patch.object(BitcoinTestNet, 'latest_block', new_callable=PropertyMock, return_value=1300001) as block_mock:
+        contract = BitcoinTestNet().audit_contract(
+            details['contract'], transaction_address=details['transaction_address']
+        )
+        assert contract.confirmations == 0
+        block_mock.assert_not_called()
+
+        # transaction is fetched again to find its block
+        transaction_mock.return_value = {'hex': details['contract_transaction'], 'block_height': 1300000}
+        contract.refresh()
+        assert contract.confirmations == 1
+        assert transaction_mock.call_count == 2
+
+
+def test_explorer_confirmations_are_preferred(signed_transaction):
+    details = signed_transaction.show_details()
+    transaction_json = {'hex': details['contract_transaction'], 'block_height': 1300000, 'confirmations': 2}
+
+    with patch.object(BitcoinTestNet, 'get_transaction', return_value=transaction_json) as transaction_mock, \
+            patch.object(BitcoinTestNet, 'latest_block', new_callable=PropertyMock, return_value=1300001) as block_mock:
+        contract = BitcoinTestNet().audit_contract(
+            details['contract'], transaction_address=details['transaction_address']
+        )
+        assert contract.confirmations == 2
+
+        transaction_mock.return_value = dict(transaction_json, confirmations=3)
+        contract.refresh()
+        assert contract.confirmations == 3
+        block_mock.assert_not_called()
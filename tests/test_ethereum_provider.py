@@ -0,0 +1,207 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from requests import ConnectionError
+from web3 import Web3
+
+from clove.network.ethereum.provider import FILTERING, BatchingHTTPProvider, MultiEndpointProvider
+
+TX_HASH = '0x7221773115ded91f856cedb2032a529edabe0bab8785d07d901681512314ef41'
+RESULTS = {
+    'eth_gasPrice': '0x4a817c800',
+    'net_version': '42',
+    'eth_blockNumber': '0x802a20',
+    'eth_getTransactionCount': '0x1',
+}
+
+
+def node_response(endpoint_uri, data, **kwargs):
+    requests = json.loads(data.decode())
+    batch = isinstance(requests, list)
+    responses = [
+        {'jsonrpc': '2.0', 'id': request['id'], 'result': RESULTS.get(request['method'])}
+        for request in (requests if batch else [requests])
+    ]
+    # batch responses may come in any order
+    return json.dumps(responses[::-1] if batch else responses[0]).encode()
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def sent_methods(post_mock):
+    calls = []
+    for call in post_mock.call_args_list:
+        data = json.loads(call[0][1].decode())
+        calls.append([request['method'] for request in data] if isinstance(data, list) else [data['method']])
+    return calls
+
+
+@patch('web3.providers.rpc.make_post_request', side_effect=node_response)
+@patch('clove.network.ethereum.provider.make_post_request', side_effect=node_response)
+def test_values_for_transaction_building_are_prefetched(post_mock, plain_post_mock):
+    clock = Clock(1000)
+    web3 = Web3(BatchingHTTPProvider('http://localhost:8545', clock=clock))
+
+    assert web3.eth.getTransactionCount('0x999F348959E611F1E9eab2927c21E88E48e6Ef45') == 1
+    assert web3.eth.gasPrice == 20000000000
+    assert web3.net.version == '42'
+    assert sent_methods(post_mock) == [['eth_getTransactionCount', 'eth_gasPrice', 'net_version']]
+
+    # gas price expires earlier than the network version
+    clock.now += 16
+    assert web3.eth.gasPrice == 20000000000
+    assert web3.net.version == '42'
+    assert sent_methods(plain_post_mock) == [['eth_gasPrice']]
+
+
+@patch('clove.network.ethereum.provider.make_post_request', side_effect=node_response)
+def test_prefetched_responses_are_served_once(post_mock):
+    provider = BatchingHTTPProvider('http://localhost:8545', prefetch_methods=())
+    provider.prefetch([('eth_getTransactionByHash', [TX_HASH]), ('eth_blockNumber', [])])
+    provider.prefetch([('eth_blockNumber', [])])
+    assert post_mock.call_count == 1
+
+    assert provider.make_request('eth_getTransactionByHash', [TX_HASH])['id'] is not None
+    assert provider.make_request('eth_blockNumber', [])['result'] == '0x802a20'
+    assert post_mock.call_count == 1
+
+    with patch('web3.providers.rpc.make_post_request', side_effect=node_response) as plain_post_mock:
+        provider.make_request('eth_getTransactionByHash', [TX_HASH])
+    plain_post_mock.assert_called_once()
+
+
+@patch('clove.network.ethereum.provider.make_post_request')
+def test_errors_are_not_cached(post_mock):
+    post_mock.return_value = json.dumps([
+        {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': 'busy'}},
+    ]).encode()
+    provider = BatchingHTTPProvider('http://localhost:8545', prefetch_methods=())
+    provider.prefetch([('eth_gasPrice', []), ('eth_blockNumber', [])])
+
+    assert not provider.is_cached(provider.get_key('eth_gasPrice', []))
+    assert not provider.is_cached(provider.get_key('eth_blockNumber', []))
+
+
+def batch_rejecting_node_response(endpoint_uri, data, **kwargs):
+    if isinstance(json.loads(data.decode()), list):
+        error = {'code': -32600, 'message': 'Invalid request'}
+        return json.dumps({'jsonrpc': '2.0', 'id': None, 'error': error}).encode()
+    return node_response(endpoint_uri, data, **kwargs)
+
+
+@patch('web3.providers.rpc.make_post_request', side_effect=batch_rejecting_node_response)
+@patch('clove.network.ethereum.provider.make_post_request', side_effect=batch_rejecting_node_response)
+def test_requests_are_sent_one_by_one_when_node_rejects_batches(post_mock, plain_post_mock):
+    web3 = Web3(BatchingHTTPProvider('http://localhost:8545', clock=Clock(1000)))
+
+    assert web3.eth.getTransactionCount('0x999F348959E611F1E9eab2927c21E88E48e6Ef45') == 1
+    assert web3.eth.gasPrice == 20000000000
+    assert sent_methods(plain_post_mock) == [['eth_getTransactionCount'], ['eth_gasPrice'], ['net_version']]
+
+    # batches are not sent again
+    web3.providers[0].prefetch([('eth_blockNumber', [])])
+    assert web3.eth.blockNumber == 8399392
+    assert web3.eth.getTransactionCount('0xd867f293Ba129629a9f9355fa285B8D3711a9092') == 1
+    assert post_mock.call_count == 1
+    assert sent_methods(plain_post_mock)[3:] == [['eth_blockNumber'], ['eth_getTransactionCount']]
+
+
+def rpc_result(result):
+    return {'jsonrpc': '2.0', 'id': 1, 'result': result}
+
+
+def multi_endpoint_provider(clock, *capabilities):
+    provider = MultiEndpointProvider(
+        [(f'http://node{i}:8545', node_capabilities) for i, node_capabilities in enumerate(capabilities)],
+        clock=clock,
+    )
+    for endpoint in provider.endpoints:
+        endpoint.provider.make_request = Mock(return_value=rpc_result(endpoint.uri))
+    return provider
+
+
+def test_reads_are_routed_to_the_fastest_healthy_node():
+    clock = Clock(1000.0)
+    provider = multi_endpoint_provider(clock, (), ())
+    slow, fast = provider.endpoints
+    slow.latency, fast.latency = 0.5, 0.1
+    assert provider.make_request('eth_blockNumber', [])['result'] == fast.uri
+
+    fast.provider.make_request.side_effect = ConnectionError()
+    for _ in range(3):
+        assert provider.make_request('eth_blockNumber', [])['result'] == slow.uri
+    assert fast.error_rate == 0.75
+    assert not fast.is_healthy(clock.now)
+
+    fast.provider.make_request.reset_mock()
+    provider.make_request('eth_blockNumber', [])
+    fast.provider.make_request.assert_not_called()
+
+    # node is enabled again, but its failures are taken into account
+    clock.now += 31
+    fast.provider.make_request.side_effect = None
+    slow.latency = 0.2
+    assert provider.make_request('eth_blockNumber', [])['result'] == slow.uri
+    slow.latency = 0.5
+    assert provider.make_request('eth_blockNumber', [])['result'] == fast.uri
+
+
+def test_filters_are_kept_on_the_node_supporting_them():
+    provider = multi_endpoint_provider(Clock(1000.0), (), (FILTERING, ), (FILTERING, ))
+    plain, first, second = provider.endpoints
+    plain.latency, first.latency, second.latency = 0.1, 0.2, 0.3
+    first.provider.make_request.return_value = rpc_result('0x1')
+
+    assert provider.make_request('eth_newFilter', [{}])['result'] == '0x1'
+    first.latency = 1
+    provider.make_request('eth_getFilterChanges', ['0x1'])
+    assert first.provider.make_request.call_count == 2
+    provider.make_request('eth_uninstallFilter', ['0x1'])
+    assert provider.filter_endpoints == {}
+    plain.provider.make_request.assert_not_called()
+
+
+def test_unsupported_method_is_not_sent_again():
+    provider = multi_endpoint_provider(Clock(1000.0), (), ())
+    first, second = provider.endpoints
+    first.provider.make_request.return_value = {
+        'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32601, 'message': 'Method not found'}
+    }
+    assert provider.make_request('eth_getLogs', [{}])['result'] == second.uri
+    assert provider.make_request('eth_getLogs', [{}])['result'] == second.uri
+    first.provider.make_request.assert_called_once()
+
+
+def test_batches_fail_over_to_the_next_node():
+    provider = multi_endpoint_provider(Clock(1000.0), (), ())
+    first, second = provider.endpoints
+    first.latency, second.latency = 0.1, 0.2
+    first.provider.make_batch_request = Mock(side_effect=ConnectionError())
+    second.provider.make_batch_request = Mock(return_value=[rpc_result('0x1')])
+
+    assert provider.make_batch_request([('eth_call', [{}])]) == [rpc_result('0x1')]
+    assert (first.failures, second.requests) == (1, 1)
+
+    first.provider.prefetch = Mock(side_effect=ConnectionError())
+    second.provider.prefetch = Mock(side_effect=ConnectionError())
+    with pytest.raises(ConnectionError):
+        provider.prefetch([('eth_getTransactionByHash', [TX_HASH])])
+    assert (first.failures, second.failures) == (2, 1)
+
+
+def test_transactions_are_sent_to_multiple_nodes():
+    provider = multi_endpoint_provider(Clock(1000.0), (), (), ())
+    first, second, third = provider.endpoints
+    first.provider.make_request.side_effect = ConnectionError()
+
+    assert provider.make_request('eth_sendRawTransaction', ['0xf8']) == rpc_result(second.uri)
+    first.provider.make_request.assert_called_once_with('eth_sendRawTransaction', ['0xf8'])
+    third.provider.make_request.assert_not_called()
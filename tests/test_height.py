@@ -0,0 +1,155 @@
+from unittest.mock import MagicMock, Mock, patch
+
+from bitcoin.messages import msg_headers
+
+from clove.network import BitcoinTestNet, EllaismTestnet
+from clove.network.base import BaseNetwork
+from clove.utils.height import SEQUENCE_LAYOUT, HeightOracle
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_height_is_served_from_memory():
+    clock = Clock(1000.0)
+    fetch = Mock(side_effect=[100, 101])
+    oracle = HeightOracle(fetch, max_age=60, clock=clock)
+
+    assert oracle.height == 100
+    clock.now += 60
+    assert oracle.height == 100
+    fetch.assert_called_once_with()
+
+    clock.now += 1
+    assert oracle.height == 101
+    assert fetch.call_count == 2
+
+
+def test_height_never_goes_back():
+    oracle = HeightOracle(Mock(return_value=99))
+    oracle.update(100)
+    assert oracle.refresh() == 100
+
+
+def test_failed_fetch():
+    oracle = HeightOracle(Mock(return_value=None))
+    assert oracle.height is None
+
+
+def test_shared_height(tmpdir):
+    path = str(tmpdir.join('height'))
+    fetch = Mock(return_value=100)
+    # oracles of the different processes using the same file
+    first, second = HeightOracle(fetch, shared_path=path), HeightOracle(fetch, shared_path=path)
+
+    assert first.height == 100
+    assert second.height == 100
+    fetch.assert_called_once_with()
+
+    second.update(105)
+    assert first.height == 105
+    first.shared.close()
+    second.shared.close()
+
+
+def test_shared_height_recovers_from_interrupted_write(tmpdir):
+    path = str(tmpdir.join('height'))
+    fetch = Mock(side_effect=[100, 101])
+    oracle = HeightOracle(fetch, shared_path=path)
+    oracle.update(99)
+    # writer died after making the sequence number odd
+    SEQUENCE_LAYOUT.pack_into(oracle.shared.memory, 0, 3)
+
+    assert oracle.shared.read() == (0, 0.0)
+    assert oracle.height == 100
+    assert oracle.shared.read()[0] == 100
+    assert SEQUENCE_LAYOUT.unpack_from(oracle.shared.memory)[0] % 2 == 0
+    oracle.shared.close()
+
+
+def test_refreshing_thread_wakes_up_on_new_block():
+    fetch = Mock(side_effect=[100, 101])
+    oracle = HeightOracle(fetch, refresh_interval=60)
+    oracle.start()
+    try:
+        oracle.notify()
+        for _ in range(100):
+            if fetch.call_count == 2:
+                break
+            oracle.thread.join(0.01)
+    finally:
+        oracle.stop()
+    assert oracle.read()[0] == 101
+
+
+def test_network_uses_height_oracle():
+    network = BitcoinTestNet()
+    try:
+        with patch.object(BitcoinTestNet, 'get_latest_block', return_value=1300000) as fetch_mock:
+            network.use_height_oracle(start=False)
+            assert network.latest_block == 1300000
+            assert BitcoinTestNet().latest_block == 1300000
+        fetch_mock.assert_called_once_with()
+    finally:
+        BaseNetwork.height_oracles.pop(network.name)
+
+
+def test_refreshing_thread_wakes_up_on_announced_block():
+    fetch = Mock(side_effect=[100, 101])
+    new_blocks = Mock(side_effect=[[], ['0xblock']] + [[]] * 1000)
+    oracle = HeightOracle(fetch, refresh_interval=60, new_blocks=new_blocks, new_blocks_interval=0.001)
+    oracle.start()
+    try:
+        for _ in range(100):
+            if fetch.call_count == 2:
+                break
+            oracle.thread.join(0.01)
+    finally:
+        oracle.stop()
+    assert oracle.read()[0] == 101
+
+
+def test_network_notifies_height_oracle_about_new_block():
+    network = BitcoinTestNet()
+    network.notify_new_block()  # no oracle, nothing happens
+    with patch.object(BitcoinTestNet, 'get_latest_block', return_value=1300000):
+        oracle = network.use_height_oracle(start=False)
+    try:
+        with patch.object(oracle, 'notify') as notify_mock:
+            network.notify_new_block()
+        notify_mock.assert_called_once_with()
+
+        network.notify_new_block(1300001)
+        assert network.latest_block == 1300001
+    finally:
+        BaseNetwork.height_oracles.pop(network.name)
+
+
+def test_node_connection_announces_new_block():
+    network = BitcoinTestNet()
+    network.switch_params()
+    network.connection = MagicMock()
+    network.connection.recv.side_effect = [msg_headers().to_bytes()]
+    with patch.object(BitcoinTestNet, 'notify_new_block') as notify_mock:
+        network.capture_messages([msg_headers], timeout=1)
+    notify_mock.assert_called_once_with()
+
+
+def test_ethereum_height_oracle_polls_block_filter(web3_request_mock):
+    network = EllaismTestnet()
+    oracle = network.use_height_oracle(start=False)
+    try:
+        assert oracle.new_blocks == network.get_new_blocks
+        block_filter = Mock(**{'get_new_entries.return_value': ['0xblock']})
+        with patch.object(network.web3.eth, 'filter', return_value=block_filter) as filter_mock:
+            assert network.get_new_blocks() == []
+            assert network.get_new_blocks() == ['0xblock']
+        filter_mock.assert_called_once_with('latest')
+    finally:
+        BaseNetwork.height_oracles.pop(network.name)
@@ -0,0 +1,67 @@
+from bitcoin.core import script, x
+
+from clove.network.bitcoin.htlc import (
+    extract_secret_from_script_sig,
+    is_refund_script_sig,
+    match_htlc,
+    match_htlc_batch,
+)
+
+contract = x(
+    '63a614977afed2fcdfea9d27fd3032b4a1bc20219007f18876a9143f8870a5633e4fdac612fba4752'
+    '5fef082bbe96167049b02d25ab17576a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b6888ac'
+)
+
+
+def test_match_htlc():
+    match = match_htlc(contract)
+    assert match.secret_hash.hex() == '977afed2fcdfea9d27fd3032b4a1bc20219007f1'
+    assert match.recipient_hash.hex() == '3f8870a5633e4fdac612fba47525fef082bbe961'
+    assert match.refund_hash.hex() == '812ff3e5afea281eb3dd7fce9b077e4ec6fba08b'
+    assert match.locktime == 1523712667
+    assert match.secret_hash.obj is contract
+
+
+def test_match_htlc_with_different_locktime_sizes():
+    for locktime in (b'\x01', b'\x70\x11\x01', b'\x01\x02\x03\x04\x05'):
+        contract_script = script.CScript([
+            script.OP_IF, script.OP_RIPEMD160, b'\x01' * 20, script.OP_EQUALVERIFY, script.OP_DUP, script.OP_HASH160,
+            b'\x02' * 20, script.OP_ELSE, locktime, script.OP_CHECKLOCKTIMEVERIFY, script.OP_DROP,
+            script.OP_DUP, script.OP_HASH160, b'\x03' * 20, script.OP_ENDIF, script.OP_EQUALVERIFY, script.OP_CHECKSIG,
+        ])
+        assert match_htlc(contract_script).locktime == int.from_bytes(locktime, byteorder='little')
+
+
+def test_match_htlc_invalid_scripts():
+    assert match_htlc(b'') is None
+    assert match_htlc(contract[:-1]) is None
+    assert match_htlc(contract[:47] + b'\x68' + contract[48:]) is None
+    assert match_htlc(contract[:-1] + b'\x87') is None
+    # locktime push length not matching the script size
+    assert match_htlc(contract[:48] + b'\x03' + contract[49:]) is None
+
+
+def test_match_htlc_batch():
+    p2pkh = x('76a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b88ac')
+    matches = list(match_htlc_batch([p2pkh, contract, contract[:-1], memoryview(contract)]))
+    assert [index for index, _ in matches] == [1, 3]
+    assert matches[1][1].locktime == 1523712667
+
+
+def test_extract_secret_from_script_sig():
+    secret = b'\xaa' * 32
+    script_sig = script.CScript([b'\x30' * 71, b'\x02' * 33, secret, script.OP_TRUE, contract])
+    assert bytes(extract_secret_from_script_sig(script_sig)) == secret
+
+    refund_script_sig = script.CScript([b'\x30' * 71, b'\x02' * 33, script.OP_FALSE, contract])
+    assert extract_secret_from_script_sig(refund_script_sig) is None
+    assert extract_secret_from_script_sig(script_sig[:-10]) is None
+    assert extract_secret_from_script_sig(b'') is None
+
+
+def test_is_refund_script_sig():
+    signature, public_key = b'\x30' * 71, b'\x02' * 33
+    assert is_refund_script_sig(script.CScript([signature, public_key, script.OP_FALSE, contract]))
+    assert not is_refund_script_sig(script.CScript([signature, public_key, b'\x01' * 32, script.OP_TRUE, contract]))
+    assert not is_refund_script_sig(script.CScript([signature, public_key, script.OP_FALSE, b'\x01' * 20]))
+    assert not is_refund_script_sig(b'\x4c')
@@ -0,0 +1,114 @@
+from unittest.mock import PropertyMock, patch
+
+from eth_abi import encode_single
+from hexbytes import HexBytes
+from web3 import Web3
+
+from clove.network import EthereumTestnet
+from clove.network.ethereum.base import EthereumBaseNetwork
+from clove.network.ethereum.indexer import EventIndexer, EventStore
+
+RECIPIENT_ADDRESS = '0xd867f293Ba129629a9f9355fa285B8D3711a9092'
+SECRET_HASH = '10ff972f3d8181f603aa7f6b4bc43aff6f8f0b7b'
+SECRET = 'bc2424e1dcdd2e425c555bcea35a54fd27cf540e60f18366e153e3fb7cf4490c'
+TX_HASH = '0x65320e57b9d18ec08388896b029ad1495beb7a57c547440253a1dde01b4485f1'
+
+
+def redeem_log(block_number):
+    return {
+        'topics': [
+            Web3.sha3(text='RedeemSwap(address,bytes20,bytes32)'),
+            HexBytes(encode_single('address', RECIPIENT_ADDRESS)),
+            HexBytes(encode_single('bytes20', bytes.fromhex(SECRET_HASH))),
+        ],
+        'data': '0x' + SECRET,
+        'blockNumber': block_number,
+        'transactionHash': HexBytes(TX_HASH),
+        'logIndex': 0,
+    }
+
+
+class Node(object):
+    '''Returns the redeem log from the given block, fails for ranges longer than `max_range` blocks.'''
+
+    def __init__(self, redeem_block, max_range=250):
+        self.redeem_block = redeem_block
+        self.max_range = max_range
+        self.requests = []
+
+    def __call__(self, filter_params):
+        from_block, to_block = filter_params['fromBlock'], filter_params['toBlock']
+        self.requests.append((from_block, to_block))
+        if to_block - from_block + 1 > self.max_range:
+            raise ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+        return [redeem_log(self.redeem_block)] if from_block <= self.redeem_block <= to_block else []
+
+
+def test_decode_redeem_event(infura_token):
+    indexer = EventIndexer(EthereumTestnet())
+    assert indexer.decode(redeem_log(100)) == {
+        'event': 'RedeemSwap',
+        'block_number': 100,
+        'transaction_hash': TX_HASH,
+        'log_index': 0,
+        'participant': RECIPIENT_ADDRESS.lower(),
+        'secret_hash': SECRET_HASH,
+        'secret': SECRET,
+    }
+    assert indexer.decode(dict(redeem_log(100), topics=[HexBytes('0x01')])) is None
+
+
+@patch.object(EthereumTestnet, 'latest_block', new_callable=PropertyMock, return_value=2000)
+def test_blocks_are_scanned_in_adaptive_chunks(_, infura_token):
+    network = EthereumTestnet()
+    node = Node(redeem_block=1500)
+    indexer = EventIndexer(network, start_block=1001, chunk_size=1000, max_chunk_size=400)
+    with patch.object(network.web3.eth, 'getLogs', side_effect=node):
+        assert indexer.scan() == 1
+        assert indexer.store.get_range(network.name) == (1001, 2000)
+        assert node.requests[:5] == [(1001, 2000), (1001, 1500), (1001, 1250), (1251, 1650), (1251, 1450)]
+
+        # only the newest blocks are scanned again
+        node.requests = []
+        assert indexer.scan() == 0
+        assert node.requests == [(1989, 2000)]
+        assert indexer.store.get_range(network.name) == (1001, 2000)
+
+
+@patch.object(EthereumTestnet, 'latest_block', new_callable=PropertyMock, return_value=2000)
+def test_redeem_lookup_is_local(_, infura_token, tmpdir):
+    network = EthereumTestnet()
+    path = str(tmpdir.join('events.db'))
+    indexer = network.use_event_indexer(path, start_block=1900)
+    node = Node(redeem_block=1200, max_range=1000)
+    try:
+        with patch.object(network.web3.eth, 'getLogs', side_effect=node):
+            assert indexer.scan() == 0
+            # blocks before the start block are scanned for the older contract
+            details = network.find_transaction_details_in_redeem_event(RECIPIENT_ADDRESS, SECRET_HASH, 1100)
+            assert details == {'secret': SECRET, 'transaction_hash': TX_HASH}
+            assert node.requests == [(1900, 2000), (1100, 1899), (1989, 2000)]
+
+            # scanned blocks are kept in the file
+            assert EventStore(path).get_range(network.name) == (1100, 2000)
+            assert indexer.find_redeem_details(RECIPIENT_ADDRESS, SECRET_HASH, 1100) == details
+            assert indexer.find_redeem_details('0x999F348959E611F1E9eab2927c21E88E48e6Ef45', SECRET_HASH) is None
+    finally:
+        EthereumBaseNetwork.event_indexers.pop(network.name)
+
+
+def test_events_of_reorganized_blocks_are_dropped(infura_token):
+    network = EthereumTestnet()
+    node = Node(redeem_block=1995)
+    indexer = EventIndexer(network, start_block=1900)
+    with patch.object(network.web3.eth, 'getLogs', side_effect=node), \
+            patch.object(EthereumTestnet, 'latest_block', new_callable=PropertyMock, return_value=2000):
+        assert indexer.scan() == 1
+        assert indexer.find_redeem_details(RECIPIENT_ADDRESS, SECRET_HASH)
+
+        # redeem block was replaced and the chain got shorter
+        node.redeem_block = 0
+        with patch.object(EthereumTestnet, 'latest_block', new_callable=PropertyMock, return_value=1998):
+            assert indexer.scan() == 0
+        assert indexer.store.get_range(network.name) == (1900, 1998)
+        assert indexer.find_redeem_details(RECIPIENT_ADDRESS, SECRET_HASH) is None
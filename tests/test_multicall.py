@@ -0,0 +1,115 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from eth_abi import decode_abi, encode_abi
+from web3 import Web3
+
+from clove.constants import SWAP_CLOSED, SWAP_OPEN, SWAP_REFUNDABLE, SWAP_STATE_OUTPUT_TYPES
+from clove.network import EthereumClassic, EthereumTestnet
+from clove.network.ethereum.multicall import Multicall, get_input_types
+
+TOKEN_ADDRESS = '0x53E546387A0d054e7FF127923254c0a679DA6DBf'
+OWNER_ADDRESS = '0x999F348959E611F1E9eab2927c21E88E48e6Ef45'
+ZERO_ADDRESS = '0x' + '00' * 20
+CLOSED_SWAP = encode_abi(SWAP_STATE_OUTPUT_TYPES, [0, ZERO_ADDRESS, ZERO_ADDRESS, 0, False, ZERO_ADDRESS, False])
+
+
+def rpc_result(data: bytes) -> dict:
+    return {'jsonrpc': '2.0', 'id': 1, 'result': '0x' + data.hex()}
+
+
+def test_get_input_types():
+    assert get_input_types('decimals()') == []
+    assert get_input_types('allowance(address,address)') == ['address', 'address']
+
+
+def test_calls_are_aggregated(infura_token):
+    network = EthereumTestnet()
+    aggregated_result = encode_abi(['uint256', 'bytes[]'], [8400000, [
+        encode_abi(['string'], ['BlockbustersTest']),
+        encode_abi(['uint256'], [10 ** 18]),
+    ]])
+    with patch.object(network.web3.eth, 'call', return_value=aggregated_result) as call_mock:
+        multicall = network.multicall()
+        multicall.add(TOKEN_ADDRESS, 'name()', output_types=('string', ))
+        multicall.add(TOKEN_ADDRESS, 'balanceOf(address)', (OWNER_ADDRESS, ), ('uint256', ))
+        assert multicall.execute() == ['BlockbustersTest', 10 ** 18]
+
+    transaction = call_mock.call_args[0][0]
+    assert transaction['to'] == network.multicall_address
+    assert transaction['data'].startswith(network.method_id('aggregate((address,bytes)[])'))
+    calls = decode_abi(['(address,bytes)[]'], Web3.toBytes(hexstr=transaction['data'][10:]))[0]
+    assert [target for target, _ in calls] == [TOKEN_ADDRESS.lower()] * 2
+    assert calls[1][1] == Web3.toBytes(hexstr=network.method_id('balanceOf(address)')) + encode_abi(
+        ['address'], [OWNER_ADDRESS]
+    )
+
+
+def test_failed_aggregate_falls_back_to_batch(infura_token):
+    network = EthereumTestnet()
+    multicall = Multicall(network)
+    multicall.add(TOKEN_ADDRESS, 'decimals()', output_types=('uint8', ))
+    multicall.add(OWNER_ADDRESS, 'decimals()', output_types=('uint8', ))
+    batch_responses = [
+        rpc_result(encode_abi(['uint8'], [18])),
+        {'jsonrpc': '2.0', 'id': 2, 'error': {'code': -32000, 'message': 'execution reverted'}},
+    ]
+    with patch.object(network.web3.eth, 'call', return_value=b''), \
+            patch.object(network.provider, 'make_batch_request', return_value=batch_responses) as batch_mock:
+        assert multicall.execute() == [18, None]
+
+    requests = batch_mock.call_args[0][0]
+    assert [method for method, _ in requests] == ['eth_call', 'eth_call']
+    assert requests[1][1] == [{'to': OWNER_ADDRESS, 'data': network.method_id('decimals()')}, 'latest']
+
+
+def test_batch_is_used_without_multicall_contract():
+    network = EthereumClassic()
+    multicall = network.multicall()
+    multicall.add(TOKEN_ADDRESS, 'symbol()', output_types=('string', ))
+    with patch.object(network.web3.eth, 'call') as call_mock, \
+            patch.object(network.provider, 'make_batch_request', return_value=[rpc_result(b'')]):
+        assert multicall.execute() == [None]
+    call_mock.assert_not_called()
+
+
+@patch('clove.network.ethereum.base.Multicall.execute')
+def test_tokens_are_read_in_one_request(execute_mock, infura_token):
+    execute_mock.return_value = ['First', 'FST', 18, None, None, None]
+    tokens = EthereumTestnet().get_tokens_from_token_contracts([TOKEN_ADDRESS, OWNER_ADDRESS])
+    assert tokens[0].symbol == 'FST'
+    assert tokens[0].address == TOKEN_ADDRESS
+    assert tokens[1] is None
+    execute_mock.assert_called_once_with()
+
+
+def test_swap_states_are_read_in_one_request(infura_token):
+    network = EthereumTestnet()
+    secret_hash = '10ff972f3d8181f603aa7f6b4bc43aff6f8f0b7b'
+    open_swap = encode_abi(
+        SWAP_STATE_OUTPUT_TYPES, [4102444800, OWNER_ADDRESS, TOKEN_ADDRESS, 10 ** 18, False, ZERO_ADDRESS, True]
+    )
+    expired_swap = encode_abi(
+        SWAP_STATE_OUTPUT_TYPES, [1523620800, OWNER_ADDRESS, TOKEN_ADDRESS, 10, True, TOKEN_ADDRESS, True]
+    )
+    aggregated_result = encode_abi(['uint256', 'bytes[]'], [8400000, [open_swap, expired_swap, CLOSED_SWAP]])
+
+    with patch.object(network.web3.eth, 'call', return_value=aggregated_result) as call_mock:
+        states = network.get_swap_states([(TOKEN_ADDRESS, secret_hash)] * 3)
+    call_mock.assert_called_once()
+
+    assert [state['state'] for state in states] == [SWAP_OPEN, SWAP_REFUNDABLE, SWAP_CLOSED]
+    assert states[0]['initiator'] == OWNER_ADDRESS
+    assert states[0]['value'] == 10 ** 18
+    assert states[0]['token_address'] is None
+    assert states[1]['expiration'] == datetime(2018, 4, 13, 12)
+    assert states[1]['token_address'] == TOKEN_ADDRESS
+
+
+def test_single_swap_state_is_read_directly(infura_token):
+    network = EthereumTestnet()
+    with patch.object(network.provider, 'make_batch_request', return_value=[rpc_result(CLOSED_SWAP)]) as batch_mock:
+        state = network.get_swap_state(TOKEN_ADDRESS, '10ff972f3d8181f603aa7f6b4bc43aff6f8f0b7b')
+    assert state['state'] == SWAP_CLOSED
+    assert not state['exists']
+    assert batch_mock.call_args[0][0][0][1][0]['to'] == network.contract_address
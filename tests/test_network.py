@@ -2,7 +2,7 @@ import ipaddress
 from unittest.mock import patch
 
 import bitcoin
-from bitcoin.core import CTransaction
+from bitcoin.core import CMutableTransaction, CTransaction
 import pytest
 from pytest import mark, raises
 from validators import domain
@@ -165,7 +165,6 @@ expected_utxo = [
         tx_script='76a9143804c5840717fb1c5c8ac0bd2726556a51e91fcd99ac'
     )
 ]
-expected_utxo_dicts = [utxo.__dict__ for utxo in expected_utxo]
 
 
 @mark.parametrize('network', networks)
@@ -182,7 +181,7 @@ def test_getting_utxo(json_response, network):
     if network.name in ('test-bitcoin', 'dogecoin'):
         json_response.return_value = blockcypher_utxo_response
 
-        assert [utxo.__dict__ for utxo in network.get_utxo(address, amount)] == expected_utxo_dicts
+        assert network.get_utxo(address, amount) == expected_utxo
 
         assert json_response.call_args[0][0].startswith('https://api.blockcypher.com')
         return
@@ -194,7 +193,7 @@ def test_getting_utxo(json_response, network):
 
     json_response.return_value = cryptoid_utxo_response
 
-    assert [utxo.__dict__ for utxo in network.get_utxo(address, amount)] == expected_utxo_dicts
+    assert network.get_utxo(address, amount) == expected_utxo
     assert json_response.call_args[0][0].startswith('https://chainz.cryptoid.info/')
 
 
@@ -203,7 +202,7 @@ def test_getting_utxo_monacoin(json_response):
     network = Monacoin()
     address = 'testaddress'
     amount = 1.0
-    assert [utxo.__dict__ for utxo in network.get_utxo(address, amount)] == expected_utxo_dicts
+    assert network.get_utxo(address, amount) == expected_utxo
     assert json_response.call_args[0][0].startswith('https://mona.chainseeker.info/api/v1/utxos/')
 
 
@@ -244,6 +243,16 @@ def test_get_network_obj_on_existing_networks(network):
     assert network_object.is_test_network() == is_test_network
 
 
+def test_network_instances_are_shared(infura_token):
+    assert get_network_by_symbol('ETH') is get_network_by_symbol('eth')
+    assert get_network_by_symbol('ETH') is not get_network_by_symbol('ETH-TESTNET')
+
+
+def test_bitcoin_network_instances_are_not_shared():
+    # every instance keeps its own connection to the node
+    assert get_network_by_symbol('BTC') is not get_network_by_symbol('BTC')
+
+
 def test_get_network_obj_on_not_existing_network():
     assert get_network_by_symbol('NON_EXISTING_NETWORK_SYMBOL') is None
 
@@ -284,6 +293,35 @@ def test_publish_transaction_from_transaction(signed_transaction, connection_moc
         assert signed_transaction.address == signed_transaction.publish()
 
 
+def test_publish_transaction_uses_cached_serialization(signed_transaction, connection_mock):
+    signed_transaction.serialized_transaction
+    signed_transaction.transaction_hash
+
+    with connection_mock, patch.object(CMutableTransaction, 'serialize') as serialize_mock, \
+            patch('clove.network.bitcoin.base.Hash') as hash_mock:
+        assert signed_transaction.address == signed_transaction.publish()
+    serialize_mock.assert_not_called()
+    hash_mock.assert_not_called()
+
+
+@mark.parametrize('transaction_format', ['tx', 'serialized_transaction'])
+def test_broadcast_transaction_without_hex(signed_transaction, connection_mock, transaction_format):
+    btc_network = BitcoinTestNet()
+    transaction = getattr(signed_transaction, transaction_format)
+
+    with connection_mock:
+        assert signed_transaction.address == btc_network.broadcast_transaction(transaction)
+
+
+def test_prepare_transaction(signed_transaction):
+    tx, serialized_transaction = BitcoinTestNet.prepare_transaction(signed_transaction.raw_transaction)
+    assert serialized_transaction == signed_transaction.serialized_transaction
+    assert tx == signed_transaction.tx
+
+    with raises(ImpossibleDeserialization):
+        BitcoinTestNet.prepare_transaction('non_hex_characters')
+
+
 def test_deserialize_raw_transaction():
     valid_transaction = '0100000001350ff23c56027e3f7b8206d01a8fa2302d7ef82898e7ac795674a4e6450dd427000000008a47' \
                         '3044022033a4d693aedc99fea12d03acb07d3fbd2c26eb1da88df2820a2544058010a750022032195aaed8' \
@@ -16,6 +16,7 @@ from .constants import (
 from clove.constants import ETH_REDEEM_GAS_LIMIT, ETH_REFUND_GAS_LIMIT
 from clove.exceptions import ImpossibleDeserialization, UnsupportedTransactionType
 from clove.network import BitcoinTestNet, EthereumClassic, EthereumTestnet
+from clove.network.ethereum.provider import MultiEndpointProvider
 from clove.network.ethereum.token import EthToken
 from clove.network.ethereum.transaction import EthereumAtomicSwapTransaction
 from clove.network.ethereum_based import Token
@@ -375,3 +376,12 @@ def test_transaction_link_in_signed_transaction(infura_token, web3_request_mock)
     eth_atomic_swap = network.atomic_swap(sender_address=alice_address, recipient_address=bob_address, value=3)
     eth_atomic_swap.sign('34fff148b3d00c1e8b3a016c7859e1616dc0edcfc3ea1ef7c96a7c4487fbeb26')
     assert eth_atomic_swap.show_details()['transaction_link'].startswith('http')
+
+
+def test_web3_is_shared_by_network_instances():
+    first, second = EthereumClassic(), EthereumClassic()
+    assert first.web3 is second.web3
+    assert first.provider is first.web3.providers[0]
+    assert isinstance(first.provider, MultiEndpointProvider)
+    assert first.provider.get_endpoints('eth_newFilter')[0].uri == 'https://etc-geth.0xinfra.com/'
+    assert first.redeem == second.redeem == '0xeda1122c'
@@ -0,0 +1,109 @@
+from threading import Thread
+from unittest.mock import Mock, patch
+
+from pytest import raises
+
+from clove.network import EthereumTestnet
+from clove.network.ethereum.nonce import NonceManager
+
+ADDRESS = '0x999F348959E611F1E9eab2927c21E88E48e6Ef45'
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def get_manager(pending=17, **kwargs):
+    web3 = Mock()
+    web3.toChecksumAddress.side_effect = lambda address: address
+    web3.eth.getTransactionCount.return_value = pending
+    return NonceManager(web3, **kwargs)
+
+
+def test_nonces_are_reserved_locally():
+    manager = get_manager()
+    assert [manager.reserve(ADDRESS) for _ in range(3)] == [17, 18, 19]
+    assert manager.reserve(ADDRESS.lower()) == 20
+    manager.web3.eth.getTransactionCount.assert_called_once_with(ADDRESS.lower(), 'pending')
+
+
+def test_released_nonces_are_reused():
+    manager = get_manager()
+    nonces = [manager.reserve(ADDRESS) for _ in range(4)]
+    assert nonces == [17, 18, 19, 20]
+
+    manager.release(ADDRESS, 18)
+    assert manager.reserve(ADDRESS) == 18
+
+    # releasing the end of the range moves the next nonce back
+    manager.release(ADDRESS, 20)
+    manager.release(ADDRESS, 19)
+    assert manager.reserve(ADDRESS) == 19
+    assert manager.next_nonces[ADDRESS.lower()] == 20
+
+
+def test_failed_build_releases_nonce():
+    manager = get_manager()
+    with raises(ValueError):
+        with manager.reservation(ADDRESS):
+            raise ValueError('Gas estimation failed.')
+    assert manager.reserve(ADDRESS) == 17
+
+
+def test_failed_publish_syncs_with_node():
+    manager = get_manager()
+    nonce = manager.reserve(ADDRESS)
+    manager.reserve(ADDRESS)
+    # other transaction from this address was sent outside of the manager
+    manager.web3.eth.getTransactionCount.return_value = 19
+
+    manager.publish_failed(ADDRESS, nonce)
+    assert manager.reserve(ADDRESS) == 19
+
+
+def test_unpublished_reservations_expire():
+    clock = Clock(1000.0)
+    manager = get_manager(ttl=60, clock=clock)
+    # transaction built only to show its details
+    assert manager.reserve(ADDRESS) == 17
+
+    clock.now += 61
+    assert manager.reserve(ADDRESS) == 17
+    assert manager.web3.eth.getTransactionCount.call_count == 2
+
+
+def test_node_is_source_of_truth_without_outstanding_transactions():
+    manager = get_manager()
+    nonces = [manager.reserve(ADDRESS) for _ in range(3)]
+    for nonce in nonces:
+        manager.published(ADDRESS, nonce)
+    # the last transaction was dropped by the node
+    manager.web3.eth.getTransactionCount.return_value = 19
+    assert manager.reserve(ADDRESS) == 19
+
+
+def test_concurrent_reservations():
+    manager = get_manager(0)
+    nonces = []
+    threads = [Thread(target=lambda: nonces.append(manager.reserve(ADDRESS))) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(nonces) == list(range(50))
+
+
+def test_transactions_built_in_a_row_get_consecutive_nonces(infura_token, web3_request_mock):
+    network = EthereumTestnet()
+    first = network.atomic_swap(ADDRESS, '0xd867f293Ba129629a9f9355fa285B8D3711a9092', 0.01)
+    second = network.atomic_swap(ADDRESS, '0xd867f293Ba129629a9f9355fa285B8D3711a9092', 0.01)
+    assert (first.tx.nonce, second.tx.nonce) == (1, 2)
+
+    with patch.object(EthereumTestnet, 'publish', return_value=None):
+        assert second.publish() is None
+    assert network.nonce_manager.reserve(ADDRESS) == 2
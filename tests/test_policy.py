@@ -0,0 +1,116 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from bitcoin.core import CMutableTransaction, CMutableTxOut, script
+from freezegun import freeze_time
+from pytest import raises
+
+from clove.constants import REFUND_MTP_MARGIN, SEQUENCE_FINAL
+from clove.exceptions import NonStandardTransaction
+from clove.network import Bitcoin, BitcoinTestNet, Litecoin
+from clove.network.bitcoin.policy import get_dust_threshold, get_policy_violations, is_standard_output_script
+
+
+def test_standard_transaction(signed_transaction):
+    assert get_policy_violations(
+        BitcoinTestNet(), signed_transaction.tx, signed_transaction.size, signed_transaction.fee_satoshi
+    ) == []
+
+
+def test_standard_output_scripts(signed_transaction):
+    p2pkh, p2sh = signed_transaction.tx.vout[1].scriptPubKey, signed_transaction.tx.vout[0].scriptPubKey
+    assert is_standard_output_script(p2pkh)
+    assert is_standard_output_script(p2sh)
+    assert is_standard_output_script(script.CScript([script.OP_RETURN, b'clove']))
+    assert not is_standard_output_script(script.CScript([script.OP_RETURN, b'\x00' * 81]))
+    assert not is_standard_output_script(signed_transaction.contract)
+
+
+def test_dust_threshold(signed_transaction):
+    p2pkh, p2sh = signed_transaction.tx.vout[1].scriptPubKey, signed_transaction.tx.vout[0].scriptPubKey
+    assert get_dust_threshold(Bitcoin(), p2pkh) == 546
+    assert get_dust_threshold(Bitcoin(), p2sh) == 540
+    assert get_dust_threshold(Bitcoin(), script.CScript([0, b'\x00' * 20])) == 294
+
+
+def test_policy_violations(signed_transaction):
+    tx = CMutableTransaction.from_tx(signed_transaction.tx)
+    tx.vout[1].nValue = 545
+    tx.vout[0].nValue = 540
+    tx.vout.append(CMutableTxOut(1000, signed_transaction.contract))
+    tx.vin[0].scriptSig = script.CScript([script.OP_DUP])
+    tx.nVersion = 3
+
+    violations = get_policy_violations(Bitcoin(), tx, 100001, fee=10)
+    assert violations == [
+        'Transaction version 3 is not standard.',
+        'Transaction size 100001 bytes exceeds the limit of 100000 bytes.',
+        'Input 0 scriptSig is not push only.',
+        'Output 1 value 545 is below the dust threshold of 546.',
+        'Output 2 script is not standard.',
+        'Transaction fee 10 is below the minimal relay fee of 100001.',
+    ]
+
+    # testnet nodes accept non-standard transactions
+    assert get_policy_violations(BitcoinTestNet(), tx, 100001, fee=10) == [
+        'Transaction fee 10 is below the minimal relay fee of 100001.',
+    ]
+
+
+def test_unknown_network_policy(signed_transaction):
+    tx = CMutableTransaction.from_tx(signed_transaction.tx)
+    tx.vout[1].nValue = 100
+    tx.nVersion = 3
+
+    assert get_policy_violations(Litecoin(), tx, 300, fee=0) == []
+    assert get_policy_violations(Litecoin(), tx, 300, fee=-1) == ['Transaction outputs are bigger than inputs.']
+
+
+def test_locktime_policy(signed_transaction):
+    tx = CMutableTransaction.from_tx(signed_transaction.tx)
+    locktime = signed_transaction.locktime
+    tx.nLockTime = signed_transaction.locktime_timestamp
+
+    assert get_policy_violations(BitcoinTestNet(), tx, 300) == [
+        f'Transaction is locked until {tx.nLockTime} timestamp.'
+    ]
+    # median time of the past blocks hasn't passed the locktime yet
+    with freeze_time(locktime + timedelta(minutes=30)):
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == [
+            f'Transaction is locked until {tx.nLockTime} timestamp.'
+        ]
+    with freeze_time(locktime + REFUND_MTP_MARGIN + timedelta(seconds=1)):
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == []
+
+        tx.vin[0].nSequence = SEQUENCE_FINAL
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == [
+            'Transaction locktime is ignored, because all of the inputs have final sequence.'
+        ]
+
+
+def test_height_locktime_policy(signed_transaction):
+    tx = CMutableTransaction.from_tx(signed_transaction.tx)
+    tx.nLockTime = 1300000
+
+    with patch.object(BitcoinTestNet, 'get_latest_block', return_value=1299999):
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == [
+            'Transaction is locked until block 1300000 (latest block is 1299999).'
+        ]
+    with patch.object(BitcoinTestNet, 'get_latest_block', return_value=1300000):
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == []
+    # height is checked by the nodes if it's not known
+    with patch.object(BitcoinTestNet, 'get_latest_block', return_value=None):
+        assert get_policy_violations(BitcoinTestNet(), tx, 300) == []
+
+
+@patch.object(BitcoinTestNet, 'require_standard', True)
+def test_publish_fails_fast_for_non_standard_transaction(signed_transaction):
+    signed_transaction.tx.vout[1].nValue = 100
+    signed_transaction.clear_cache()
+
+    with patch.object(BitcoinTestNet, 'broadcast_transaction') as broadcast_mock:
+        with raises(NonStandardTransaction) as e:
+            signed_transaction.publish()
+
+    assert 'Output 1 value 100 is below the dust threshold of 546.' in e.value.message
+    broadcast_mock.assert_not_called()
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from bitcoin.core import COutPoint, CTransaction, CTxIn, CTxOut, b2lx, b2x, script
+from pytest import raises
+
+from clove.network import BitcoinTestNet
+from clove.network.bitcoin.psbt import PSBT_IN_NON_WITNESS_UTXO, PartiallySignedTransaction
+from clove.network.bitcoin.transaction import BitcoinAtomicSwapTransaction, BitcoinTransaction
+from clove.network.bitcoin.utxo import Utxo
+
+ALICE_SCRIPT = '76a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b88ac'
+PREVIOUS_TRANSACTION = CTransaction(
+    [CTxIn(COutPoint(b'\x11' * 32, 0))],
+    [CTxOut(1000, script.CScript.fromhex(ALICE_SCRIPT)), CTxOut(78956946, script.CScript.fromhex(ALICE_SCRIPT))],
+)
+PREVIOUS_TRANSACTION_ID = b2lx(PREVIOUS_TRANSACTION.GetTxid())
+PREVIOUS_TRANSACTIONS = {PREVIOUS_TRANSACTION_ID: PREVIOUS_TRANSACTION}
+
+
+def alice_utxo():
+    return [Utxo(tx_id=PREVIOUS_TRANSACTION_ID, vout=1, value=0.78956946, tx_script=ALICE_SCRIPT)]
+
+
+def unsigned_swap(alice_wallet, bob_wallet):
+    transaction = BitcoinTestNet().atomic_swap(alice_wallet.address, bob_wallet.address, 0.7, alice_utxo())
+    transaction.fee_per_kb = 0.002
+    transaction.calculate_fee(add_sig_size=True)
+    transaction.add_fee()
+    return transaction
+
+
+def test_psbt_serialization(alice_wallet, bob_wallet):
+    transaction = unsigned_swap(alice_wallet, bob_wallet)
+    psbt = transaction.to_psbt(PREVIOUS_TRANSACTIONS)
+    data = psbt.to_base64()
+
+    assert data.startswith('cHNidP8')
+    assert PartiallySignedTransaction.from_base64(data) == psbt
+    assert PartiallySignedTransaction.deserialize(psbt.serialize()).inputs[0].utxo == alice_utxo()[0]
+    assert 'secret' not in psbt.state
+    # spent output is kept in the standard field
+    assert psbt.inputs[0].serialize_pairs()[0] == (
+        bytes([PSBT_IN_NON_WITNESS_UTXO]), PREVIOUS_TRANSACTION.serialize()
+    )
+
+    with raises(ValueError, match='is not a PSBT'):
+        PartiallySignedTransaction.deserialize(b'\x01\x00')
+    with raises(ValueError, match='truncated'):
+        PartiallySignedTransaction.deserialize(psbt.serialize()[:-10])
+
+
+def test_psbt_previous_transaction_is_fetched(alice_wallet, bob_wallet):
+    transaction = unsigned_swap(alice_wallet, bob_wallet)
+    with patch.object(
+        BitcoinTestNet, 'get_transaction', return_value={'hex': b2x(PREVIOUS_TRANSACTION.serialize())}
+    ) as transaction_mock:
+        psbt = transaction.to_psbt()
+    transaction_mock.assert_called_once_with(PREVIOUS_TRANSACTION_ID)
+    assert psbt == transaction.to_psbt({PREVIOUS_TRANSACTION_ID: b2x(PREVIOUS_TRANSACTION.serialize())})
+
+    with patch.object(BitcoinTestNet, 'get_transaction', return_value=None):
+        with raises(ValueError, match='pass it in previous_transactions'):
+            transaction.to_psbt()
+
+
+def test_psbt_previous_transaction_has_to_match_the_input(alice_wallet, bob_wallet):
+    transaction = unsigned_swap(alice_wallet, bob_wallet)
+    other_transaction = CTransaction(PREVIOUS_TRANSACTION.vin, PREVIOUS_TRANSACTION.vout, nLockTime=1)
+    psbt = transaction.to_psbt({PREVIOUS_TRANSACTION_ID: other_transaction})
+    with raises(ValueError, match='does not match the spent output'):
+        PartiallySignedTransaction.deserialize(psbt.serialize())
+
+
+def test_psbt_sign_combine_and_finalize(alice_wallet, bob_wallet):
+    transaction = unsigned_swap(alice_wallet, bob_wallet)
+    psbt = transaction.to_psbt(PREVIOUS_TRANSACTIONS)
+
+    signer_psbt = PartiallySignedTransaction.from_base64(psbt.to_base64())
+    assert signer_psbt.sign(bob_wallet) == 0
+    assert signer_psbt.sign(alice_wallet) == 1
+
+    with raises(RuntimeError, match='Input 0 has no valid signature'):
+        psbt.finalize()
+
+    combined = PartiallySignedTransaction.combine(psbt, signer_psbt)
+    combined.finalize()
+    assert combined.is_finalized
+
+    signed_transaction = BitcoinTransaction.from_psbt(BitcoinTestNet(), combined.to_base64())
+    assert isinstance(signed_transaction, BitcoinAtomicSwapTransaction)
+    assert signed_transaction.signed
+    assert signed_transaction.contract == transaction.contract
+    assert signed_transaction.locktime == transaction.locktime
+    assert signed_transaction.fee_satoshi == transaction.fee_satoshi
+    assert signed_transaction.tx.vout == transaction.tx.vout
+
+    details = signed_transaction.show_details()
+    contract = BitcoinTestNet().audit_contract(details['contract'], details['contract_transaction'])
+    assert contract.value_satoshi == transaction.value_satoshi
+
+
+def test_psbt_combine_different_transactions(alice_wallet, bob_wallet):
+    first_psbt = unsigned_swap(alice_wallet, bob_wallet).to_psbt(PREVIOUS_TRANSACTIONS)
+    second_psbt = unsigned_swap(alice_wallet, bob_wallet).to_psbt(PREVIOUS_TRANSACTIONS)
+    with raises(ValueError, match='different transactions'):
+        PartiallySignedTransaction.combine(first_psbt, second_psbt)
+
+
+@patch('clove.network.bitcoin.contract.get_balance', return_value=0.7)
+def test_psbt_contract_redeem(_, signed_transaction, bob_wallet, alice_wallet):
+    transaction_details = signed_transaction.show_details()
+    contract = BitcoinTestNet().audit_contract(
+        transaction_details['contract'],
+        transaction_details['contract_transaction']
+    )
+    secret = transaction_details['secret']
+    redeem_transaction = contract.redeem(bob_wallet, secret)
+    psbt = PartiallySignedTransaction.from_base64(
+        redeem_transaction.to_psbt({contract.transaction_address: contract.tx}).to_base64()
+    )
+
+    psbt_input = psbt.inputs[0]
+    assert psbt_input.utxo.contract == contract.contract
+    assert psbt_input.utxo.secret == secret
+    assert psbt_input.script_code == script.CScript.fromhex(contract.contract)
+
+    # refund branch of the contract is locked to Alice, she can't sign the redeem input
+    assert psbt.sign(alice_wallet) == 0
+    assert psbt.sign(bob_wallet) == 1
+    psbt.finalize()
+
+    transaction = psbt.to_transaction(BitcoinTestNet())
+    assert transaction.signed
+    assert BitcoinTestNet.extract_secret(transaction.raw_transaction) == secret
+
+
+def test_psbt_batch_transaction(alice_wallet, bob_wallet):
+    locktime = datetime.utcnow().replace(microsecond=0) + timedelta(hours=10)
+    transaction = BitcoinTestNet().atomic_swap_batch(
+        alice_wallet.address,
+        [
+            {'recipient_address': bob_wallet.address, 'value': 0.1, 'locktime': locktime},
+            {'recipient_address': bob_wallet.address, 'value': 0.2},
+        ],
+        alice_utxo(),
+    )
+    psbt = transaction.to_psbt(PREVIOUS_TRANSACTIONS)
+    psbt.sign(alice_wallet)
+    psbt.finalize()
+
+    signed_transaction = psbt.to_transaction(BitcoinTestNet())
+    assert signed_transaction.signed
+    assert [leg.contract for leg in signed_transaction.legs] == [leg.contract for leg in transaction.legs]
+    assert signed_transaction.legs[0].locktime == locktime
+    assert signed_transaction.legs[1].value_satoshi == 20000000
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from threading import Event
+from unittest.mock import Mock
+
+from pytest import raises
+
+from clove.utils.scheduler import ContractScheduler
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def contract(locktime):
+    return Mock(locktime=locktime, secret_hash='977afed2fcdfea9d27fd3032b4a1bc20219007f1')
+
+
+def test_dispatches_jobs_by_deadline():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    refund, redeem = Mock(), Mock()
+    scheduler = ContractScheduler(
+        refund, redeem, redeem_margin=timedelta(hours=1), refund_margin=timedelta(0), clock=clock
+    )
+    later = contract(datetime(2018, 4, 13, 15))
+    sooner = contract(datetime(2018, 4, 13, 14))
+    scheduler.schedule_refund(later)
+    scheduler.schedule_refund(sooner)
+    redeem_job = scheduler.schedule_redeem(later)
+
+    assert scheduler.next_deadline() == datetime(2018, 4, 13, 14)
+    assert scheduler.run_pending() == []
+
+    clock.now = datetime(2018, 4, 13, 14)
+    assert [(job.action, job.contract) for job in scheduler.run_pending()] == [
+        ('refund', sooner), ('redeem', later)
+    ]
+    refund.assert_called_once_with(sooner)
+    redeem.assert_called_once_with(later)
+    assert redeem_job.future.result() == redeem.return_value
+
+    clock.now = datetime(2018, 4, 13, 16)
+    assert len(scheduler.run_pending()) == 1
+    assert scheduler.next_deadline() is None
+
+
+def test_cancelled_job_is_not_dispatched():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    refund = Mock()
+    scheduler = ContractScheduler(refund, clock=clock)
+    job = scheduler.schedule_refund(contract(datetime(2018, 4, 13, 11)))
+    scheduler.cancel(job)
+
+    assert scheduler.next_deadline() is None
+    assert scheduler.run_pending() == []
+    refund.assert_not_called()
+
+
+def test_missing_handler():
+    scheduler = ContractScheduler(refund_handler=Mock())
+    with raises(ValueError) as e:
+        scheduler.schedule_redeem(contract(datetime(2018, 4, 13, 11)))
+    assert str(e.value) == 'There is no handler for the redeem action.'
+
+
+def test_handler_exception_is_kept_in_future():
+    scheduler = ContractScheduler(Mock(side_effect=RuntimeError('Too early.')))
+    job = scheduler.schedule_refund(contract(datetime(2018, 4, 13, 11)))
+    scheduler.run_pending()
+    assert isinstance(job.future.exception(), RuntimeError)
+
+
+def test_scheduler_thread_wakes_up_for_new_job():
+    refunded = Event()
+    scheduler = ContractScheduler(lambda contract: refunded.set() or 'refund_transaction_hash')
+    scheduler.start()
+    try:
+        # scheduler is sleeping on the empty heap and has to be woken up by the new job
+        scheduler.schedule_refund(contract(datetime.utcnow() - timedelta(hours=2)))
+        assert refunded.wait(5)
+    finally:
+        scheduler.stop()
+    assert scheduler.thread is None
+
+
+def test_refund_is_dispatched_after_median_time_past():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    scheduler = ContractScheduler(Mock(), clock=clock)
+    job = scheduler.schedule_refund(contract(datetime(2018, 4, 13, 12)))
+    assert job.deadline == datetime(2018, 4, 13, 13)
+    assert scheduler.run_pending() == []
+
+
+def test_failed_job_is_retried_with_backoff():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    # rejected transaction is not published
+    refund = Mock(side_effect=[RuntimeError('non-final'), None, 'refund_transaction_hash'])
+    scheduler = ContractScheduler(
+        refund, refund_margin=timedelta(0), retry_delay=timedelta(minutes=10), max_attempts=3, clock=clock
+    )
+    job = scheduler.schedule_refund(contract(datetime(2018, 4, 13, 12)))
+
+    assert scheduler.run_pending() == [job]
+    assert scheduler.next_deadline() == datetime(2018, 4, 13, 12, 10)
+
+    clock.now = datetime(2018, 4, 13, 12, 10)
+    assert scheduler.run_pending() == [job]
+    assert scheduler.next_deadline() == datetime(2018, 4, 13, 12, 30)
+
+    clock.now = datetime(2018, 4, 13, 12, 30)
+    assert scheduler.run_pending() == [job]
+    assert job.future.result() == 'refund_transaction_hash'
+    assert scheduler.next_deadline() is None
+    assert job.attempts == 3
+
+
+def test_job_gives_up_after_max_attempts():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    refund = Mock(return_value=None)
+    scheduler = ContractScheduler(refund, refund_margin=timedelta(0), max_attempts=2, clock=clock)
+    scheduler.schedule_refund(contract(datetime(2018, 4, 13, 12)))
+    for _ in range(3):
+        scheduler.run_pending()
+        clock.now += timedelta(hours=1)
+    assert refund.call_count == 2
+    assert scheduler.next_deadline() is None
@@ -0,0 +1,82 @@
+from datetime import timedelta
+import os
+import stat
+from threading import Thread
+
+from clove.network import BitcoinTestNet
+from clove.utils.storage import ContractIndex
+
+
+def test_index_transaction(signed_transaction, tmpdir):
+    index = ContractIndex(str(tmpdir.join('contracts.db')), store_secrets=True)
+    index.add(signed_transaction)
+    details = signed_transaction.show_details()
+    assert stat.S_IMODE(os.stat(str(tmpdir.join('contracts.db'))).st_mode) == 0o600
+
+    contracts = index.find_by_secret_hash(details['secret_hash'])
+    assert len(contracts) == 1
+    contract = contracts[0]
+    assert contract['network'] == 'test-bitcoin'
+    assert contract['contract_address'] == details['contract_address']
+    assert contract['transaction_address'] == details['transaction_address']
+    assert contract['locktime'] == details['locktime'].replace(microsecond=0)
+    assert contract['secret'] == details['secret']
+    assert contract['raw_transaction'] == details['contract_transaction']
+    assert index.find_by_contract_address(details['contract_address']) == contracts
+    assert index.find_by_transaction_address(details['transaction_address']) == contracts
+    index.close()
+
+    # data is kept in the file
+    assert ContractIndex(str(tmpdir.join('contracts.db'))).find_by_secret_hash(details['secret_hash']) == contracts
+
+
+def test_secret_is_not_stored_by_default(signed_transaction):
+    index = ContractIndex()
+    index.add(signed_transaction)
+    assert index.find_by_secret_hash(signed_transaction.secret_hash.hex())[0]['secret'] is None
+
+
+def test_index_audited_contract_keeps_known_fields(signed_transaction, btc_testnet_contract):
+    index = ContractIndex(store_secrets=True)
+    index.add(signed_transaction, btc_testnet_contract)
+
+    contracts = index.find_by_secret_hash(btc_testnet_contract.secret_hash)
+    assert len(contracts) == 1
+    assert contracts[0]['secret'] == signed_transaction.secret.hex()
+    assert contracts[0]['raw_transaction'] == signed_transaction.raw_transaction
+    assert contracts[0]['contract'] == btc_testnet_contract.contract
+
+
+def test_set_secret(btc_testnet_contract):
+    index = ContractIndex()
+    index.add(btc_testnet_contract)
+    assert index.find_by_secret_hash(btc_testnet_contract.secret_hash)[0]['secret'] is None
+
+    assert index.set_secret(btc_testnet_contract.secret_hash, 'secret') == 1
+    assert index.find_by_secret_hash(btc_testnet_contract.secret_hash)[0]['secret'] == 'secret'
+
+
+def test_find_expiring(signed_transaction):
+    index = ContractIndex()
+    index.add(signed_transaction)
+
+    assert index.find_expiring('test-bitcoin', signed_transaction.locktime - timedelta(seconds=1)) == []
+    assert len(index.find_expiring('test-bitcoin', signed_transaction.locktime)) == 1
+    assert index.find_expiring('bitcoin', signed_transaction.locktime) == []
+
+
+def test_concurrent_writers(alice_wallet, bob_wallet, alice_utxo):
+    index = ContractIndex()
+    network = BitcoinTestNet()
+    transactions = [
+        network.atomic_swap(alice_wallet.address, bob_wallet.address, 0.01, alice_utxo) for _ in range(8)
+    ]
+
+    threads = [Thread(target=index.add, args=(transaction, )) for transaction in transactions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for transaction in transactions:
+        assert len(index.find_by_secret_hash(transaction.secret_hash.hex())) == 1
@@ -0,0 +1,76 @@
+import os
+import stat
+from unittest.mock import patch
+
+from clove.network import Ethereum, EthereumTestnet
+from clove.network.ethereum.base import EthereumBaseNetwork
+from clove.network.ethereum.token_registry import TokenRegistry
+from clove.network.ethereum_based import Token
+
+TOKEN_ADDRESS = '0x7B22938ca841aA392C93dBB7f4c42178E3d65E88'
+
+
+def test_registry_lookup_is_case_insensitive():
+    first = Token('First', 'TKN', '0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 18)
+    second = Token('Second', 'tkn', '0x2F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 8)
+    registry = TokenRegistry([first, second])
+
+    assert registry.get('symbol', 'Tkn') is first
+    assert registry.get('address', second.address.upper()) is second
+    assert registry.get('name', 'second') is second
+    assert registry.get('symbol', 'XYZ') is None
+    assert len(registry) == 2
+
+
+def test_discovered_tokens_are_looked_up_only_by_address():
+    listed = Token('Bancor', 'BNT', '0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 18)
+    fake = Token('Bancor', 'BNT', '0x2F573D6Fb3F13d689FF844B4cE37794d79a7FF1C', 18)
+    discovered = Token('AstroTokens', 'ASTRO', TOKEN_ADDRESS, 4)
+    registry = TokenRegistry([listed])
+    registry.discover(fake, discovered)
+
+    assert registry.get('symbol', 'BNT') is listed
+    assert registry.get('address', fake.address) is fake
+    assert registry.get('symbol', 'ASTRO') is None
+    assert registry.get('name', 'AstroTokens') is None
+    assert registry.get('address', TOKEN_ADDRESS) is discovered
+
+
+def test_network_registry_is_built_once(infura_token):
+    registry = Ethereum.get_token_registry()
+    assert Ethereum().get_token_registry() is registry
+    assert len(registry) == len(Ethereum.tokens)
+    assert Ethereum.get_token_by_symbol('bnt').token_address == '0x1F573D6Fb3F13d689FF844B4cE37794d79a7FF1C'
+
+
+@patch('clove.network.ethereum.base.Multicall.execute', return_value=['AstroTokens', 'ASTRO', 4])
+def test_discovered_tokens_are_cached(execute_mock, infura_token, web3_request_mock, tmpdir):
+    cache = EthereumTestnet.use_token_cache(str(tmpdir.join('tokens.db')))
+    try:
+        network = EthereumTestnet()
+        assert network.get_token_by_address(TOKEN_ADDRESS).symbol == 'ASTRO'
+        assert network.get_token_by_address(TOKEN_ADDRESS.lower()).symbol == 'ASTRO'
+        execute_mock.assert_called_once_with()
+
+        # registry is rebuilt after restart
+        EthereumBaseNetwork.token_registries.clear()
+        assert network.get_token_by_address(TOKEN_ADDRESS).symbol == 'ASTRO'
+        assert EthereumTestnet.get_token_by_symbol('ASTRO') is None
+        execute_mock.assert_called_once_with()
+    finally:
+        EthereumBaseNetwork.token_cache = None
+        EthereumBaseNetwork.token_registries.clear()
+        cache.close()
+
+
+def test_default_token_cache_is_private(monkeypatch, tmpdir):
+    monkeypatch.setenv('HOME', str(tmpdir))
+    try:
+        cache = EthereumTestnet.use_token_cache()
+        directory = tmpdir.join('.clove')
+        assert stat.S_IMODE(os.stat(str(directory)).st_mode) == 0o700
+        assert directory.join('tokens.db').check()
+        cache.close()
+    finally:
+        EthereumBaseNetwork.token_cache = None
+        EthereumBaseNetwork.token_registries.clear()
@@ -23,44 +23,80 @@ from clove.utils.external_source import (
 @mark.parametrize('network', ('btc', 'doge', 'dash'))
 @patch('clove.utils.external_source.clove_req_json')
 def test_extract_scriptsig_from_redeem_transaction_blockcypher(req_mock, network):
-    # minimal version of required json object
-    req_mock.return_value = {
-        "txs": [
-            {
-                "hash": "011",
-                "inputs": [
-                    {
-                        "script": "test-sigscript",
-                        "script_type": "pay-to-script-hash"
-                    }
-                ]
-            },
-            {
-                "hash": "010"
-            }
+    # minimal versions of required json responses
+    address_response = {
+        "txrefs": [
+            {"tx_hash": "011", "tx_input_n": 0, "tx_output_n": -1},
+            {"tx_hash": "010", "tx_input_n": -1, "tx_output_n": 1, "spent_by": "011"},
+        ]
+    }
+    redeem_response = {
+        "hash": "011",
+        "inputs": [
+            {"prev_hash": "009", "output_index": 0, "script": "other-sigscript"},
+            {"prev_hash": "010", "output_index": 1, "script": "test-sigscript"},
         ]
     }
+    req_mock.side_effect = [address_response, redeem_response]
     assert 'test-sigscript' == extract_scriptsig_from_redeem_transaction(network, 'some_address')
+    assert [call[0][0] for call in req_mock.call_args_list] == [
+        f'https://api.blockcypher.com/v1/{network}/main/addrs/some_address?limit=50',
+        f'https://api.blockcypher.com/v1/{network}/main/txs/011?instart=0&limit=100&includeHex=false',
+    ]
 
     if network == 'btc':
+        req_mock.side_effect = [address_response, redeem_response]
         assert 'test-sigscript' == extract_scriptsig_from_redeem_transaction(network, 'some_address', testnet=True)
 
 
-@mark.parametrize('network', ('btc', 'doge', 'dash'))
 @patch('clove.utils.external_source.clove_req_json')
-def test_extract_scriptsig_from_redeem_transaction_blockcypher_no_redeem(req_mock, network):
-    # minimal version of required json response
-    req_mock.return_value = {
-        "txs": [
-            {
-                "hash": "010"
-            }
-        ]
-    }
-    assert extract_scriptsig_from_redeem_transaction(network, 'some_address') is None
+def test_extract_scriptsig_blockcypher_by_outpoint(req_mock):
+    req_mock.side_effect = [
+        {"outputs": [{"spent_by": "011"}]},
+        {"inputs": [{"prev_hash": "010", "output_index": 1, "script": "test-sigscript"}]},
+    ]
+    assert 'test-sigscript' == extract_scriptsig_from_redeem_transaction(
+        'btc', 'some_address', transaction_address='010', vout=1
+    )
+    assert req_mock.call_args_list[0][0][0] == (
+        'https://api.blockcypher.com/v1/btc/main/txs/010?outstart=1&limit=1&includeHex=false'
+    )
 
-    if network == 'btc':
-        assert extract_scriptsig_from_redeem_transaction(network, 'some_address', testnet=True) is None
+
+@patch('clove.utils.external_source.clove_req_json')
+def test_extract_scriptsig_blockcypher_pages_inputs(req_mock):
+    req_mock.side_effect = [
+        {"outputs": [{"spent_by": "011"}]},
+        {"vin_sz": 101, "inputs": [{"prev_hash": "009", "output_index": n, "script": "other"} for n in range(100)]},
+        {"vin_sz": 101, "inputs": [{"prev_hash": "010", "output_index": 1, "script": "test-sigscript"}]},
+    ]
+    assert 'test-sigscript' == extract_scriptsig_from_redeem_transaction(
+        'btc', 'some_address', transaction_address='010', vout=1
+    )
+    assert req_mock.call_args_list[2][0][0] == (
+        'https://api.blockcypher.com/v1/btc/main/txs/011?instart=100&limit=100&includeHex=false'
+    )
+
+    # other contracts of the batch redeem are not mistaken for this one
+    req_mock.side_effect = [
+        {"outputs": [{"spent_by": "011"}]},
+        {"vin_sz": 1, "inputs": [{"prev_hash": "009", "output_index": 0, "script": "other"}]},
+    ]
+    assert extract_scriptsig_from_redeem_transaction('btc', 'some_address', transaction_address='010', vout=1) is None
+
+
+@mark.parametrize('response', (
+    {"txrefs": [{"tx_hash": "010", "tx_input_n": -1, "tx_output_n": 0}]},
+    {"unconfirmed_txrefs": [{"tx_hash": "010", "tx_input_n": -1, "tx_output_n": 0}]},
+))
+@patch('clove.utils.external_source.clove_req_json')
+def test_extract_scriptsig_from_redeem_transaction_blockcypher_no_redeem(req_mock, response):
+    req_mock.return_value = response
+    assert extract_scriptsig_from_redeem_transaction('btc', 'some_address') is None
+    req_mock.assert_called_once()
+
+    req_mock.return_value = {"outputs": [{"value": 1000}]}
+    assert extract_scriptsig_from_redeem_transaction('btc', 'some_address', transaction_address='010', vout=0) is None
 
 
 @mark.parametrize('network', CRYPTOID_SUPPORTED_NETWORKS[:2])
@@ -80,6 +116,8 @@ def test_extract_scriptsig_from_redeem_transaction_cryptoid(req_mock, network):
     response2 = {
         "vin": [
             {
+                "txid": "hash2",
+                "vout": 0,
                 "scriptSig": {
                     "hex": "test-sigscript"
                 }
@@ -92,6 +130,31 @@ def test_extract_scriptsig_from_redeem_transaction_cryptoid(req_mock, network):
         'some_address',
         cryptoid_api_key='xxx'
     )
+    assert req_mock.call_args_list[0][0][0] == (
+        f'https://chainz.cryptoid.info/{network}/api.dws?q=multiaddr&n=2&active=some_address&key=xxx'
+    )
+
+
+@patch('clove.utils.external_source.clove_req_json')
+def test_extract_scriptsig_from_redeem_transaction_cryptoid_matches_contract_input(req_mock):
+    response1 = {"txs": [{"hash": "hash1"}, {"hash": "hash2"}]}
+    # redeem transaction spending other output first (e.g. batch redeem)
+    response2 = {
+        "vin": [
+            {"txid": "other", "vout": 1, "scriptSig": {"hex": "other-sigscript"}},
+            {"txid": "hash2", "vout": 0, "scriptSig": {"hex": "other-leg-sigscript"}},
+            {"txid": "hash2", "vout": 1, "scriptSig": {"hex": "test-sigscript"}},
+        ]
+    }
+    req_mock.side_effect = [response1, response2]
+    assert extract_scriptsig_from_redeem_transaction(
+        'ltc', 'some_address', cryptoid_api_key='xxx', transaction_address='hash2', vout=1,
+    ) == 'test-sigscript'
+
+    req_mock.side_effect = [response1, response2]
+    assert extract_scriptsig_from_redeem_transaction(
+        'ltc', 'some_address', cryptoid_api_key='xxx', transaction_address='hash2', vout=2,
+    ) is None
 
 
 @mark.parametrize('network', CRYPTOID_SUPPORTED_NETWORKS[:2])
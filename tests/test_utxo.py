@@ -0,0 +1,115 @@
+from bitcoin.core import script
+from pytest import raises
+
+from clove.network.bitcoin.utxo import Utxo, UtxoSet
+
+contract = (
+    '63a614977afed2fcdfea9d27fd3032b4a1bc20219007f18876a9143f8870a5633e4fdac612fba4752'
+    '5fef082bbe96167049b02d25ab17576a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b6888ac'
+)
+
+
+def test_utxo_has_no_instance_dict():
+    utxo = Utxo('6ecd66d88b1a976cde70ebbef1909edec5db80cff9b8b97024ea3805dbe28ab8', 1, 0.1, '76a9')
+    with raises(AttributeError):
+        utxo.unknown_field = 1
+
+
+def test_utxo_derived_fields_are_cached():
+    utxo = Utxo(
+        tx_id='6ecd66d88b1a976cde70ebbef1909edec5db80cff9b8b97024ea3805dbe28ab8',
+        vout=1,
+        value=0.1,
+        tx_script='76a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b88ac',
+    )
+    assert utxo.outpoint is utxo.outpoint
+    assert utxo.parsed_script is utxo.parsed_script
+    assert utxo.tx_in is not utxo.tx_in
+    assert utxo.unsigned_script_sig == []
+    assert utxo.parsed_contract is None
+
+
+def test_utxo_cache_is_cleared_after_change():
+    utxo = Utxo(
+        tx_id='6ecd66d88b1a976cde70ebbef1909edec5db80cff9b8b97024ea3805dbe28ab8',
+        vout=1,
+        value=0.1,
+        tx_script='76a914812ff3e5afea281eb3dd7fce9b077e4ec6fba08b88ac',
+        contract=contract,
+        refund=True,
+    )
+    outpoint = utxo.outpoint
+    assert utxo.unsigned_script_sig[0] == script.OP_FALSE
+
+    utxo.vout = 0
+    assert utxo.outpoint is not outpoint
+    assert utxo.outpoint.n == 0
+
+    utxo.refund = False
+    utxo.secret = 'aa' * 32
+    assert utxo.unsigned_script_sig[1] == script.OP_TRUE
+    assert utxo.parsed_contract == script.CScript.fromhex(contract)
+
+
+def test_utxo_is_hashable():
+    tx_id = '6ecd66d88b1a976cde70ebbef1909edec5db80cff9b8b97024ea3805dbe28ab8'
+    first = Utxo(tx_id, 1, 0.1, '76a9')
+    second = Utxo(tx_id, 1, 0.1, '76a9')
+    assert first == second
+    assert hash(first) == hash(second)
+    assert len({first, second, Utxo(tx_id, 0, 0.1, '76a9')}) == 2
+
+    # hash depends only on the outpoint, so the object can be found in a set after its value changes
+    utxos = {first}
+    first.value = 0.2
+    assert first in utxos
+
+
+def test_utxo_set_select():
+    utxo_set = UtxoSet()
+    utxo_set.add('11' * 32, 0, 100, '76a9')
+    utxo_set.add('22' * 32, 1, 300, '76a9')
+    utxo_set.add('33' * 32, 2, 200, 'a914')
+
+    assert len(utxo_set) == 3
+    assert utxo_set.total == 600
+    assert utxo_set.scripts == ['76a9', 'a914']
+
+    selected = utxo_set.select(450)
+    assert [utxo.tx_id for utxo in selected] == ['22' * 32, '33' * 32]
+    assert [utxo.vout for utxo in selected] == [1, 2]
+    assert [utxo.value for utxo in selected] == [0.000003, 0.000002]
+    assert selected[1].tx_script == 'a914'
+
+    assert utxo_set.select(600) is None
+
+
+def test_utxo_set_select_needing_many_outputs():
+    utxo_set = UtxoSet()
+    for vout in range(10):
+        utxo_set.add('11' * 32, vout, 100 + vout, '76a9')
+
+    assert [utxo.vout for utxo in utxo_set.select(500)] == [9, 8, 7, 6, 5]
+    assert len(utxo_set.select(utxo_set.total - 1)) == 10
+
+
+def test_utxo_set_iteration():
+    utxo_set = UtxoSet()
+    utxo_set.add('11' * 32, 3, 100, '76a9')
+    assert list(utxo_set) == [Utxo('11' * 32, 3, 0.000001, '76a9')]
+
+
+def test_utxo_requires_exactly_one_value():
+    with raises(ValueError):
+        Utxo('11' * 32, 0, tx_script='76a9')
+    with raises(ValueError):
+        Utxo('11' * 32, 0, 0.1, '76a9', satoshis=10000000)
+
+
+def test_utxo_value_in_satoshis():
+    utxo = Utxo('11' * 32, 0, 0.78956946, '76a9')
+    assert utxo.satoshis == 78956946
+    assert Utxo('11' * 32, 0, tx_script='76a9', satoshis=78956946) == utxo
+
+    utxo.value = 0.1
+    assert utxo.satoshis == 10000000
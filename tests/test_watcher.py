@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from bitcoin.core import b2x, script, x
+
+from clove.network import BitcoinTestNet
+from clove.network.bitcoin.contract import BitcoinContract
+from clove.utils.watcher import SecretWatcher
+
+
+class Clock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def script_sig(contract, *elements):
+    return b2x(script.CScript([b'\x30' * 71, b'\x02' * 33, *elements, x(contract.contract)]))
+
+
+def eth_contract(locktime, filtering_supported=True, event_indexer=None):
+    network = Mock(
+        name='network', ethereum_based=True, filtering_supported=filtering_supported, event_indexer=event_indexer
+    )
+    network.name = 'ethereum_classic'
+    network.get_redeem_event_details.side_effect = lambda event: {'secret': event['data'][2:]}
+    return Mock(network=network, locktime=locktime, secret_hash='977afed2fcdfea9d27fd3032b4a1bc20219007f1')
+
+
+def test_bitcoin_contract_is_not_checked_while_funded(btc_testnet_contract):
+    callback = Mock()
+    watcher = SecretWatcher(callback)
+    watcher.watch(btc_testnet_contract)
+
+    with patch.object(BitcoinContract, 'get_balance', return_value=0.01) as balance_mock, \
+            patch.object(BitcoinTestNet, 'get_spending_script_sig') as secret_mock:
+        assert watcher.poll_pending() == []
+    balance_mock.assert_called_once_with()
+    secret_mock.assert_not_called()
+    callback.assert_not_called()
+
+
+def test_bitcoin_secret_found(btc_testnet_contract):
+    callback = Mock()
+    watcher = SecretWatcher(callback)
+    watched = watcher.watch(btc_testnet_contract)
+
+    redeem_script_sig = script_sig(btc_testnet_contract, b'\xaa' * 32, script.OP_TRUE)
+    with patch.object(BitcoinContract, 'get_balance', return_value=0), \
+            patch.object(BitcoinTestNet, 'get_spending_script_sig', return_value=redeem_script_sig) as secret_mock:
+        assert watcher.poll_pending() == ['aa' * 32]
+    secret_mock.assert_called_once_with(
+        btc_testnet_contract.address, btc_testnet_contract.transaction_address, btc_testnet_contract.vout_index
+    )
+    callback.assert_called_once_with(btc_testnet_contract, 'aa' * 32)
+    assert not watched.active
+    assert watcher.queue == []
+
+
+def test_refunded_bitcoin_contract_is_dropped(btc_testnet_contract):
+    expired_callback = Mock()
+    clock = Clock(btc_testnet_contract.locktime + timedelta(minutes=1))
+    watcher = SecretWatcher(Mock(), expired_callback=expired_callback, clock=clock)
+    watched = watcher.watch(btc_testnet_contract)
+
+    # contract was spent with the refund branch
+    refund_script_sig = script_sig(btc_testnet_contract, script.OP_FALSE)
+    with patch.object(BitcoinContract, 'get_balance', return_value=0), \
+            patch.object(BitcoinTestNet, 'get_spending_script_sig', return_value=refund_script_sig):
+        assert watcher.poll_pending() == []
+    expired_callback.assert_called_once_with(btc_testnet_contract, 'refunded')
+    assert not watched.active
+    assert watcher.queue == []
+
+
+def test_bitcoin_contract_stays_watched_after_lookup_errors(btc_testnet_contract):
+    expired_callback = Mock()
+    clock = Clock(btc_testnet_contract.locktime + timedelta(minutes=1))
+    watcher = SecretWatcher(Mock(), expired_callback=expired_callback, clock=clock)
+    watched = watcher.watch(btc_testnet_contract)
+
+    with patch.object(BitcoinContract, 'get_balance', return_value=0), \
+            patch.object(BitcoinTestNet, 'get_spending_script_sig', side_effect=ValueError('explorer error')):
+        assert watcher.poll_pending() == []
+    assert watched.active
+    assert len(watcher.queue) == 1
+    assert watched.interval > watcher.min_interval
+
+    # spending transaction is not known yet or it's not recognized
+    for spending_script_sig in (None, script_sig(btc_testnet_contract)):
+        clock.now = watched.next_poll
+        with patch.object(BitcoinContract, 'get_balance', return_value=0), \
+                patch.object(BitcoinTestNet, 'get_spending_script_sig', return_value=spending_script_sig):
+            assert watcher.poll_pending() == []
+        assert watched.active
+    expired_callback.assert_not_called()
+
+
+def test_contract_expires_after_locktime():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    expired_callback = Mock()
+    watcher = SecretWatcher(Mock(), expired_callback=expired_callback, expire_margin=timedelta(hours=1), clock=clock)
+    contract = eth_contract(datetime(2018, 4, 13, 12), filtering_supported=False)
+    contract.find_redeem_transaction.return_value = None
+    watcher.watch(contract)
+
+    assert watcher.poll_pending() == []
+    expired_callback.assert_not_called()
+
+    clock.now = datetime(2018, 4, 13, 13, 1)
+    assert watcher.poll_pending() == []
+    expired_callback.assert_called_once_with(contract, 'expired')
+    assert watcher.queue == []
+
+
+def test_event_filter_is_reused():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    callback = Mock()
+    watcher = SecretWatcher(callback, clock=clock)
+    contract = eth_contract(datetime(2018, 4, 14, 12))
+    event_filter = contract.network.create_redeem_event_filter.return_value
+    event_filter.get_all_entries.return_value = []
+    event_filter.get_new_entries.side_effect = [[], [{'data': '0xbb'}]]
+    watcher.watch(contract)
+
+    for _ in range(3):
+        watcher.poll_pending()
+        clock.now += timedelta(hours=1)
+
+    contract.network.create_redeem_event_filter.assert_called_once_with(
+        contract.recipient_address, contract.secret_hash, contract.block_number
+    )
+    assert event_filter.get_new_entries.call_count == 2
+    callback.assert_called_once_with(contract, 'bb')
+
+
+def test_ethereum_without_filtering():
+    callback = Mock()
+    watcher = SecretWatcher(callback)
+    contract = eth_contract(datetime(2018, 4, 14, 12), filtering_supported=False)
+    contract.network.extract_secret_from_redeem_transaction.return_value = 'cc'
+    watcher.watch(contract)
+
+    assert watcher.poll_pending() == ['cc']
+    contract.network.extract_secret_from_redeem_transaction.assert_called_once_with(
+        contract.find_redeem_transaction.return_value
+    )
+
+
+def test_ethereum_with_event_indexer():
+    callback = Mock()
+    watcher = SecretWatcher(callback)
+    contract = eth_contract(datetime(2018, 4, 14, 12), event_indexer=Mock())
+    contract.find_secret.return_value = 'dd'
+    watcher.watch(contract)
+
+    assert watcher.poll_pending() == ['dd']
+    contract.network.create_redeem_event_filter.assert_not_called()
+
+
+def test_adaptive_interval():
+    clock = Clock(datetime(2018, 4, 13, 12))
+    watcher = SecretWatcher(
+        Mock(), min_interval=timedelta(seconds=10), max_interval=timedelta(seconds=60), backoff=2, clock=clock
+    )
+    contract = eth_contract(datetime(2018, 4, 13, 12, 2, 30))
+    contract.network.create_redeem_event_filter.return_value.get_all_entries.return_value = []
+    contract.network.create_redeem_event_filter.return_value.get_new_entries.return_value = []
+    watched = watcher.watch(contract)
+
+    intervals = []
+    for _ in range(6):
+        assert watcher.poll_pending() == []
+        intervals.append(watched.interval.total_seconds())
+        clock.now = watched.next_poll
+    # the last poll before the locktime is made on the locktime
+    assert intervals == [20, 40, 60, 30, 60, 60]
+    # contract is not polled before its time
+    clock.now -= timedelta(seconds=1)
+    assert watcher.pop_due() == {}
+
+
+def test_unsupported_network_is_dropped():
+    watcher = SecretWatcher(Mock())
+    contract = eth_contract(datetime(2018, 4, 14, 12))
+    contract.network.create_redeem_event_filter.side_effect = NotImplementedError
+    watcher.watch(contract)
+
+    assert watcher.poll_pending() == []
+    assert watcher.queue == []